@@ -1,4 +1,6 @@
-from app.agents.base import BaseAgent, AgentState
+from typing import Dict
+
+from app.agents.base import BaseAgent, AgentState, RunContext
 from app.agents.doc_agent import DocAgent
 from app.agents.incident_agent import IncidentAgent
 from app.agents.slack_agent import SlackAgent
@@ -9,17 +11,24 @@ AGENTS = {
     "slack": SlackAgent,
 }
 
+# One shared instance per agent; per-run state lives in RunContext
+_instances: Dict[str, BaseAgent] = {}
+
 
 def get_agent(agent_id: str) -> BaseAgent:
-    """Get an agent instance by ID"""
+    """Get the shared agent instance by ID"""
     if agent_id not in AGENTS:
         raise ValueError(f"Unknown agent: {agent_id}")
-    return AGENTS[agent_id]()
+    agent = _instances.get(agent_id)
+    if agent is None:
+        agent = _instances[agent_id] = AGENTS[agent_id]()
+    return agent
 
 
 __all__ = [
     "BaseAgent",
     "AgentState",
+    "RunContext",
     "DocAgent",
     "IncidentAgent",
     "SlackAgent",
@@ -1,10 +1,20 @@
+import asyncio
 import time
 from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import TypedDict, Optional, List, Any
+from typing import Awaitable, Callable, TypedDict, Optional, List, Any
 from sqlalchemy.orm import Session
+from langchain_core.messages import AIMessage
 
-from app.models import AgentRun, TokenUsage
+from app.core.config import settings
+from app.core.request_context import token_ledger
+from app.models import AgentRun
+from app.services import partitions, prometheus, tracing
+from app.services.cache import overview_cache
+from app.services.llm import DEFAULT_MODEL, estimate_cost, llm_pool
+from app.services.llm_cache import CachedResponse, llm_cache
 from app.schemas import AgentStep
 
 
@@ -19,15 +29,98 @@ class AgentState(TypedDict, total=False):
     tokens_used: int
 
 
+@dataclass
+class RunContext:
+    """Per-run state of an agent, so one agent instance can serve concurrent runs"""
+    db: Session
+    conversation_id: Optional[str]
+    start_time: float = field(default_factory=time.perf_counter)
+    steps: List[AgentStep] = field(default_factory=list)
+    tokens_used: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    # Parts of input_tokens read from / written to the provider's prompt cache
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+    cost_usd: float = 0.0
+    # TokenUsage rows of the run's LLM calls, written with the AgentRun by _save_run
+    token_usage: List[dict] = field(default_factory=list)
+    # Final graph state, set by _invoke_graph
+    final_state: Optional[dict] = None
+    # Set for streamed runs: node and token events are put here as they happen
+    events: Optional[asyncio.Queue] = None
+    # Answer in one fused LLM call, for agents that support it
+    fused: bool = False
+    # Spans of the run, stored with it by _save_run; None if tracing is off
+    spans: Optional[tracing.SpanRecorder] = None
+
+
+# Set by BaseAgent.run; graph nodes run in tasks that inherit it
+_run_context: ContextVar[Optional[RunContext]] = ContextVar("agent_run_context", default=None)
+
+# Name of the graph node being executed, set by the BaseAgent._node wrapper
+_current_node: ContextVar[Optional[str]] = ContextVar("agent_current_node", default=None)
+
+
 class BaseAgent(ABC):
-    """Base class for all LangGraph agents"""
+    """
+    Base class for all LangGraph agents.
+
+    Agents are process-wide singletons (see get_agent): the compiled graph
+    is built once per class and all per-run state lives in a RunContext
+    context variable rather than on the instance.
+    """
+
+    _compiled_graph = None
 
     def __init__(self, agent_id: str, name: str):
         self.agent_id = agent_id
         self.name = name
-        self._steps: List[AgentStep] = []
-        self._tokens_used: int = 0
-        self._start_time: float = 0
+
+    @property
+    def run_context(self) -> RunContext:
+        """State of the run in progress"""
+        context = _run_context.get()
+        if context is None:
+            raise RuntimeError(f"{self.name} used outside of run()")
+        return context
+
+    @property
+    def graph(self):
+        """The compiled LangGraph workflow, built on first use and cached per class"""
+        cls = type(self)
+        if cls.__dict__.get("_compiled_graph") is None:
+            cls._compiled_graph = self._create_graph()
+        return cls._compiled_graph
+
+    @abstractmethod
+    def _create_graph(self):
+        """Build and compile the LangGraph workflow"""
+        pass
+
+    async def _invoke_graph(self, initial_state: dict) -> dict:
+        """Run the compiled graph; the final state is kept on the run context"""
+        result = await self.graph.ainvoke(initial_state)
+        self.run_context.final_state = result
+        return result
+
+    def _node(self, name: str, fn: Callable[[Any], Awaitable[dict]]) -> Callable[[Any], Awaitable[dict]]:
+        """Wrap a graph node so streamed runs report when it starts, and it gets a span"""
+        async def node(state):
+            token = _current_node.set(name)
+            try:
+                self._emit("node_start", node=name)
+                with tracing.span(name, kind="node"):
+                    return await fn(state)
+            finally:
+                _current_node.reset(token)
+        return node
+
+    def _emit(self, event: str, **data):
+        """Send an event to the run's stream, if it is being streamed"""
+        context = _run_context.get()
+        if context is not None and context.events is not None:
+            context.events.put_nowait({"event": event, **data})
 
     def _log_step(
         self,
@@ -35,7 +128,8 @@ class BaseAgent(ABC):
         status: str = "completed",
         duration_ms: Optional[int] = None,
         input_preview: Optional[str] = None,
-        output_preview: Optional[str] = None
+        output_preview: Optional[str] = None,
+        metadata: Optional[dict] = None
     ):
         """Log a step in the agent's execution"""
         step = AgentStep(
@@ -43,9 +137,11 @@ class BaseAgent(ABC):
             status=status,
             duration_ms=duration_ms,
             input_preview=input_preview[:200] if input_preview else None,
-            output_preview=output_preview[:200] if output_preview else None
+            output_preview=output_preview[:200] if output_preview else None,
+            metadata=metadata
         )
-        self._steps.append(step)
+        self.run_context.steps.append(step)
+        self._emit("node_end", node=name, step=step.model_dump())
 
     def _save_run(
         self,
@@ -54,8 +150,12 @@ class BaseAgent(ABC):
         status: str = "completed",
         error: Optional[str] = None
     ) -> AgentRun:
-        """Save the agent run to the database"""
-        duration_ms = int((time.perf_counter() - self._start_time) * 1000)
+        """
+        Save the agent run and the token usage of its LLM calls to the
+        database, in one transaction and with one commit
+        """
+        context = self.run_context
+        duration_ms = int((time.perf_counter() - context.start_time) * 1000)
 
         agent_run = AgentRun(
             agent_id=self.agent_id,
@@ -63,12 +163,23 @@ class BaseAgent(ABC):
             status=status,
             duration_ms=duration_ms,
             error=error,
-            steps=[s.model_dump() for s in self._steps],
-            tokens_used=self._tokens_used
+            steps=[s.model_dump() for s in context.steps],
+            tokens_used=context.tokens_used,
+            trace_id=context.spans.trace_id if context.spans is not None else None,
+            spans=context.spans.to_json() if context.spans is not None else None
         )
+        prometheus.agent_runs_total.inc(agent=self.agent_id, status=status)
+        prometheus.agent_run_duration_seconds.observe(duration_ms / 1000, agent=self.agent_id)
+
         db.add(agent_run)
+        if context.token_usage:
+            # Flush to get the run's id for its token usage rows
+            db.flush()
+            for row in context.token_usage:
+                row["agent_run_id"] = agent_run.id
+            partitions.token_usage.insert(db.connection(), context.token_usage)
         db.commit()
-        db.refresh(agent_run)
+        overview_cache.invalidate()
         return agent_run
 
     def _track_tokens(
@@ -76,51 +187,185 @@ class BaseAgent(ABC):
         model: str,
         input_tokens: int,
         output_tokens: int,
-        conversation_id: Optional[str],
-        db: Session
+        cached: bool = False,
+        cache_read_tokens: int = 0,
+        cache_write_tokens: int = 0
     ):
-        """Track token usage and cost"""
+        """
+        Track token usage and cost. The usage row is kept on the run context
+        and written by _save_run. Replays from the response cache are
+        recorded at zero cost with ``cached`` set, so the savings show up in
+        usage stats, but don't count towards the run's tokens. Prompt-cache
+        reads and writes are part of ``input_tokens`` and priced as such.
+        """
+        context = self.run_context
         total_tokens = input_tokens + output_tokens
-        self._tokens_used += total_tokens
-
-        # Cost estimation (Claude 3.5 Sonnet pricing)
-        cost_per_input = 3.0 / 1_000_000  # $3 per 1M input tokens
-        cost_per_output = 15.0 / 1_000_000  # $15 per 1M output tokens
-        cost = (input_tokens * cost_per_input) + (output_tokens * cost_per_output)
-
-        token_usage = TokenUsage(
-            model=model,
-            input_tokens=input_tokens,
-            output_tokens=output_tokens,
-            total_tokens=total_tokens,
-            cost_usd=cost,
-            conversation_id=conversation_id
-        )
-        db.add(token_usage)
-        db.commit()
+        cost = 0.0 if cached else estimate_cost(input_tokens, output_tokens, cache_read_tokens, cache_write_tokens)
+
+        context.token_usage.append({
+            "model": model,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": total_tokens,
+            "cost_usd": cost,
+            "cached": cached,
+            "cache_read_tokens": cache_read_tokens,
+            "cache_write_tokens": cache_write_tokens,
+            "conversation_id": context.conversation_id,
+            "timestamp": datetime.now(timezone.utc),
+        })
+        if cached:
+            return
+
+        context.tokens_used += total_tokens
+        context.input_tokens += input_tokens
+        context.output_tokens += output_tokens
+        context.cache_read_tokens += cache_read_tokens
+        context.cache_write_tokens += cache_write_tokens
+        context.cost_usd += cost
+
+        prometheus.llm_tokens_total.inc(input_tokens, model=model, type="input")
+        prometheus.llm_tokens_total.inc(output_tokens, model=model, type="output")
+        if cache_read_tokens:
+            prometheus.llm_tokens_total.inc(cache_read_tokens, model=model, type="cache_read")
+        if cache_write_tokens:
+            prometheus.llm_tokens_total.inc(cache_write_tokens, model=model, type="cache_write")
+        prometheus.llm_cost_usd_total.inc(cost, model=model)
+
+        # Side channel for TokenTrackingMiddleware
+        ledger = token_ledger.get()
+        if ledger is not None:
+            ledger.add(model, input_tokens, output_tokens, cost)
+
+    async def _call_llm(
+        self,
+        messages: List[Any],
+        max_tokens: int,
+        model: str = DEFAULT_MODEL
+    ):
+        """
+        Call a model through the shared client pool and track the tokens it
+        used. The reply is streamed, so the call's span gets its time to
+        first token and output tokens per second; streamed runs also emit
+        its text as token events. Identical calls are answered from the
+        response cache unless the agent is excluded from it.
+        """
+        context = self.run_context
+        with tracing.span("llm", kind="llm", model=model) as span:
+            cache_key = None
+            if llm_cache.enabled_for(self.agent_id):
+                cache_key = llm_cache.key(model, messages, max_tokens=max_tokens)
+                cached = await llm_cache.get(cache_key)
+                if cached is not None:
+                    span.set(cached=True)
+                    self._emit("token", node=_current_node.get(), text=cached.content)
+                    self._track_tokens(model, cached.input_tokens, cached.output_tokens, cached=True)
+                    return AIMessage(content=cached.content)
+
+            response = None
+            usage = {}
+            node = _current_node.get()
+            async for chunk in llm_pool.astream(messages, model=model, max_tokens=max_tokens):
+                response = chunk if response is None else response + chunk
+                if chunk.usage_metadata:
+                    # message_start carries the input and cache tokens, the final
+                    # message_delta the cumulative output tokens. The delta may
+                    # repeat the input counts, so summing the chunks' usage (as
+                    # adding chunks does) would count them twice.
+                    if not usage:
+                        usage = dict(chunk.usage_metadata)
+                    else:
+                        usage["output_tokens"] = chunk.usage_metadata.get("output_tokens", 0)
+                        usage["total_tokens"] = usage.get("input_tokens", 0) + usage["output_tokens"]
+                if chunk.content and context.events is not None:
+                    self._emit("token", node=node, text=chunk.content)
+
+            if response is None:
+                # Empty stream
+                response = AIMessage(content="")
+            elif usage:
+                response.usage_metadata = usage
+
+            if usage:
+                details = usage.get("input_token_details") or {}
+                cache_read_tokens = details.get("cache_read") or 0
+                cache_write_tokens = details.get("cache_creation") or 0
+                self._track_tokens(
+                    model, usage.get("input_tokens", 0), usage.get("output_tokens", 0),
+                    cache_read_tokens=cache_read_tokens, cache_write_tokens=cache_write_tokens
+                )
+                if cache_read_tokens or cache_write_tokens:
+                    span.set(cache_read_tokens=cache_read_tokens, cache_write_tokens=cache_write_tokens)
+                # Decode rate: output tokens over the time after the first one
+                output_tokens = usage.get("output_tokens", 0)
+                generate_s = time.perf_counter() - span.start - span.attributes.get("ttft_ms", 0.0) / 1000
+                span.set(
+                    input_tokens=usage.get("input_tokens", 0),
+                    output_tokens=output_tokens,
+                    tokens_per_s=round(output_tokens / generate_s, 1) if generate_s > 0 else None
+                )
+
+        if cache_key is not None and isinstance(response.content, str) and response.content:
+            await llm_cache.put(cache_key, model, CachedResponse(
+                response.content, usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+            ))
+        return response
 
     async def run(
         self,
         input_text: str,
         conversation_id: Optional[str],
-        db: Session
+        db: Session,
+        events: Optional[asyncio.Queue] = None,
+        fused: Optional[bool] = None
     ) -> dict:
-        """Run the agent and return results"""
-        self._steps = []
-        self._tokens_used = 0
-        self._start_time = time.perf_counter()
+        """
+        Run the agent and return results, streaming events to ``events`` if
+        given. ``fused`` selects the single-call mode of agents that have
+        one; it defaults to whether the agent is listed in FUSED_AGENTS.
+        """
+        if fused is None:
+            fused = self.agent_id in settings.fused_agents
+        context = RunContext(db=db, conversation_id=conversation_id, events=events, fused=fused)
+        if settings.TRACING_ENABLED:
+            # Part of the request's trace, or a trace of its own outside of one
+            trace = tracing.current()
+            context.spans = tracing.SpanRecorder(
+                trace.trace_id if trace is not None else tracing.new_trace_id(), settings.TRACE_MAX_SPANS
+            )
+        token = _run_context.set(context)
 
         try:
-            result = await self._execute(input_text, conversation_id, db)
+            with tracing.recording(context.spans), tracing.span(self.agent_id, kind="agent"):
+                result = await self._execute(input_text, conversation_id, db)
             self._save_run(conversation_id, db, status="completed")
             return {
                 "response": result,
-                "steps": self._steps,
-                "tokens_used": self._tokens_used
+                "steps": context.steps,
+                "tokens_used": context.tokens_used,
+                "state": context.final_state,
+                "usage": {
+                    "input_tokens": context.input_tokens,
+                    "output_tokens": context.output_tokens,
+                    "total_tokens": context.tokens_used,
+                    "cache_read_tokens": context.cache_read_tokens,
+                    "cache_write_tokens": context.cache_write_tokens,
+                    "cost_usd": context.cost_usd,
+                }
             }
         except Exception as e:
-            self._save_run(conversation_id, db, status="failed", error=str(e))
+            # The error may be a failed commit of the completed run, which
+            # leaves the session needing a rollback before it can write again
+            db.rollback()
+            try:
+                self._save_run(conversation_id, db, status="failed", error=str(e))
+            except Exception as save_error:
+                # Don't let it replace the run's own error
+                db.rollback()
+                print(f"Failed to save {self.agent_id} run: {save_error}")
             raise
+        finally:
+            _run_context.reset(token)
 
     @abstractmethod
     async def _execute(
@@ -1,14 +1,17 @@
+import asyncio
 import time
 from typing import TypedDict, Optional, List, Annotated
 from operator import add
 from sqlalchemy.orm import Session
 
 from langgraph.graph import StateGraph, START, END
-from langchain_anthropic import ChatAnthropic
 from langchain_core.messages import HumanMessage, SystemMessage
 
 from app.agents.base import BaseAgent
 from app.core.config import settings
+from app.services import tracing
+from app.services.context_assembler import context_assembler
+from app.services.semantic_cache import semantic_cache
 
 
 class DocAgentState(TypedDict):
@@ -17,66 +20,118 @@ class DocAgentState(TypedDict):
     retrieved_docs: Annotated[List[str], add]
     context: str
     response: str
+    cache_hit: bool
+    query_embedding: Optional[List[float]]
 
 
 class DocAgent(BaseAgent):
     """RAG agent for answering questions from documents"""
 
+    # Knowledge collection the agent answers from
+    COLLECTION = "project-docs"
+
     def __init__(self):
         super().__init__("doc", "DocAgent")
-        self._db: Optional[Session] = None
-        self._conversation_id: Optional[str] = None
 
     def _create_graph(self):
         """Create the LangGraph workflow"""
         graph = StateGraph(DocAgentState)
 
         # Add nodes
-        graph.add_node("retrieve_docs", self._retrieve_docs)
-        graph.add_node("generate_response", self._generate_response)
-
-        # Add edges
-        graph.add_edge(START, "retrieve_docs")
+        graph.add_node("check_cache", self._node("check_cache", self._check_cache))
+        graph.add_node("retrieve_docs", self._node("retrieve_docs", self._retrieve_docs))
+        graph.add_node("generate_response", self._node("generate_response", self._generate_response))
+
+        # Add edges; a semantic cache hit already has the answer
+        graph.add_edge(START, "check_cache")
+        graph.add_conditional_edges(
+            "check_cache",
+            lambda state: END if state.get("cache_hit") else "retrieve_docs",
+            ["retrieve_docs", END]
+        )
         graph.add_edge("retrieve_docs", "generate_response")
         graph.add_edge("generate_response", END)
 
         return graph.compile()
 
+    async def _check_cache(self, state: DocAgentState) -> dict:
+        """Look for an answer to a similar earlier question"""
+        if not settings.SEMANTIC_CACHE_ENABLED:
+            return {"cache_hit": False}
+
+        start = time.perf_counter()
+        query = state["query"]
+
+        try:
+            # Embedding the query is CPU-bound; keep it off the event loop
+            hit, embedding = await asyncio.to_thread(semantic_cache.lookup, self.COLLECTION, query)
+        except Exception as e:
+            print(f"Semantic cache lookup failed: {e}")
+            hit, embedding = None, None
+
+        duration = int((time.perf_counter() - start) * 1000)
+        self._log_step(
+            "check_cache",
+            "completed",
+            duration,
+            input_preview=query,
+            output_preview=f"Hit ({hit.similarity:.3f}): {hit.cached_query}" if hit else "Miss"
+        )
+
+        if hit:
+            return {"cache_hit": True, "response": hit.answer}
+        return {"cache_hit": False, "query_embedding": embedding}
+
     async def _retrieve_docs(self, state: DocAgentState) -> dict:
-        """Retrieve relevant documents from vector store"""
+        """Retrieve relevant documents from vector store and assemble them into the context"""
         start = time.perf_counter()
         query = state["query"]
 
         # Use vector store
         try:
             from app.services import vector_store
-            results = vector_store.query_collection("project-docs", query, n_results=3)
-            docs = [r["content"] for r in results]
+            results = vector_store.query_collection(self.COLLECTION, query, n_results=3)
         except Exception as e:
             print(f"Vector store query failed: {e}")
-            docs = []
+            results = []
 
-        if not docs:
+        if not results:
             # Fallback to simple keyword search in database
             from app.models import KnowledgeChunk
-            chunks = self._db.query(KnowledgeChunk).filter(
+            chunks = self.run_context.db.query(KnowledgeChunk).filter(
                 KnowledgeChunk.content.ilike(f"%{query.split()[0]}%")
             ).limit(3).all()
-            docs = [c.content for c in chunks] if chunks else [
-                "No relevant documents found. Please provide more context or try a different query."
+            results = [
+                {"content": c.content, "source_file": c.source_file, "chunk_index": c.chunk_index}
+                for c in chunks
             ]
 
+        if results:
+            # Merge overlapping chunks, drop duplicates, fit the token budget
+            assembled = context_assembler.assemble(results)
+            context = assembled.text
+            metadata = assembled.summary()
+            output_preview = (
+                f"Retrieved {len(results)} documents, {len(assembled.blocks)} passages in context "
+                f"({assembled.tokens_saved} tokens saved)"
+            )
+            tracing.annotate(tokens_saved=assembled.tokens_saved)
+        else:
+            context = "No relevant documents found. Please provide more context or try a different query."
+            metadata = None
+            output_preview = "Retrieved 0 documents"
+
         duration = int((time.perf_counter() - start) * 1000)
         self._log_step(
             "retrieve_docs",
             "completed",
             duration,
             input_preview=query,
-            output_preview=f"Retrieved {len(docs)} documents"
+            output_preview=output_preview,
+            metadata=metadata
         )
 
-        context = "\n\n---\n\n".join(docs)
-        return {"retrieved_docs": docs, "context": context}
+        return {"retrieved_docs": [r["content"] for r in results], "context": context}
 
     async def _generate_response(self, state: DocAgentState) -> dict:
         """Generate response using Claude"""
@@ -95,12 +150,6 @@ class DocAgent(BaseAgent):
             )
             return {"response": response}
 
-        llm = ChatAnthropic(
-            model="claude-3-5-sonnet-20241022",
-            api_key=settings.ANTHROPIC_API_KEY,
-            max_tokens=1024
-        )
-
         system_prompt = """You are a helpful AI assistant that answers questions based on the provided context.
 Use only the information from the context to answer. If the context doesn't contain relevant information, say so.
 Be concise and direct in your responses."""
@@ -113,17 +162,15 @@ Be concise and direct in your responses."""
             HumanMessage(content=f"Context:\n{context}\n\nQuestion: {query}")
         ]
 
-        response = await llm.ainvoke(messages)
+        response = await self._call_llm(messages, max_tokens=1024)
 
-        # Track tokens
-        if hasattr(response, 'usage_metadata'):
-            self._track_tokens(
-                "claude-3-5-sonnet-20241022",
-                response.usage_metadata.get('input_tokens', 0),
-                response.usage_metadata.get('output_tokens', 0),
-                self._conversation_id,
-                self._db
-            )
+        if state.get("query_embedding") and response.content:
+            try:
+                await asyncio.to_thread(
+                    semantic_cache.store, self.COLLECTION, query, state["query_embedding"], response.content
+                )
+            except Exception as e:
+                print(f"Semantic cache store failed: {e}")
 
         duration = int((time.perf_counter() - start) * 1000)
         self._log_step(
@@ -143,17 +190,19 @@ Be concise and direct in your responses."""
         db: Session
     ) -> str:
         """Execute the DocAgent workflow"""
-        self._db = db
-        self._conversation_id = conversation_id
-
-        graph = self._create_graph()
-
         initial_state = {
             "query": input_text,
             "retrieved_docs": [],
             "context": "",
-            "response": ""
+            "response": "",
+            "cache_hit": False,
+            "query_embedding": None
         }
 
-        result = await graph.ainvoke(initial_state)
+        start = time.perf_counter()
+        result = await self._invoke_graph(initial_state)
+        if settings.SEMANTIC_CACHE_ENABLED:
+            semantic_cache.record_run(
+                self.COLLECTION, result["cache_hit"], (time.perf_counter() - start) * 1000
+            )
         return result["response"]
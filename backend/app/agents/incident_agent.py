@@ -1,13 +1,14 @@
 import time
-from typing import TypedDict, Optional, List
+from typing import TypedDict, Optional, List, Tuple
 from sqlalchemy.orm import Session
 
 from langgraph.graph import StateGraph, START, END
-from langchain_anthropic import ChatAnthropic
 from langchain_core.messages import HumanMessage, SystemMessage
 
 from app.agents.base import BaseAgent
 from app.core.config import settings
+from app.services import prometheus
+from app.services.incident_rules import RuleMatch, rule_classifier
 
 
 class IncidentAgentState(TypedDict):
@@ -17,36 +18,170 @@ class IncidentAgentState(TypedDict):
     category: str
     recommended_actions: List[str]
     analysis: str
+    # Rule tier match, if any (see app/services/incident_rules.py), made
+    # once per run and read by the router and the nodes
+    rule_match: Optional[RuleMatch]
+    rule: Optional[str]
+    rule_confidence: float
+    rule_actions: List[str]
+
+
+FUSED_PROMPT = """You are an expert DevOps engineer analyzing log snippets.
+Classify the log and propose remediation actions:
+1. Severity: critical, high, medium, or low
+2. Category: error, warning, performance, security, info
+3. Actions: 3-5 specific, technical remediation steps, ordered by priority
+
+Respond in this exact format:
+SEVERITY: [level]
+CATEGORY: [category]
+ANALYSIS: [brief explanation]
+ACTIONS:
+1. [action]
+2. [action]"""
+
+
+# Actions per category when no LLM proposes them
+DEFAULT_ACTIONS = {
+    "error": [
+        "Check application logs for stack traces",
+        "Review recent deployments",
+        "Verify database connections",
+        "Check service health endpoints"
+    ],
+    "warning": [
+        "Monitor for escalation",
+        "Review deprecated code usage",
+        "Schedule technical debt cleanup"
+    ],
+    "performance": [
+        "Check system resources (CPU, memory)",
+        "Review database query performance",
+        "Check network latency",
+        "Consider scaling resources"
+    ],
+    "security": [
+        "Review access logs",
+        "Check for unauthorized access attempts",
+        "Verify SSL certificates",
+        "Run security scan"
+    ],
+    "info": [
+        "No immediate action required",
+        "Log for reference"
+    ]
+}
+
+
+def parse_classification(content: str) -> dict:
+    """Severity, category and analysis from a SEVERITY/CATEGORY/ANALYSIS reply"""
+    severity = "medium"
+    category = "error"
+    analysis = content
+
+    for line in content.split("\n"):
+        if line.startswith("SEVERITY:"):
+            severity = line.split(":", 1)[1].strip().lower()
+        elif line.startswith("CATEGORY:"):
+            category = line.split(":", 1)[1].strip().lower()
+        elif line.startswith("ANALYSIS:"):
+            analysis = line.split(":", 1)[1].strip()
+
+    return {"severity": severity, "category": category, "analysis": analysis}
+
+
+def parse_actions(content: str) -> List[str]:
+    """Numbered or bulleted actions from a reply, or the whole reply if it has none"""
+    actions = []
+    for line in content.split("\n"):
+        line = line.strip()
+        if line and (line[0].isdigit() or line.startswith("-") or line.startswith("•")):
+            # Remove numbering/bullets
+            action = line.lstrip("0123456789.-•) ").strip()
+            if action:
+                actions.append(action)
+
+    return actions or [content]
+
+
+def parse_fused_reply(content: str) -> Tuple[dict, List[str]]:
+    """
+    Classification and actions from a FUSED_PROMPT reply. Without an
+    ACTIONS: section, numbered or bulleted lines anywhere in the reply are
+    taken as the actions; the list is empty if there are none.
+    """
+    head, _, actions_part = content.partition("ACTIONS:")
+    classification = parse_classification(head.strip())
+    if actions_part.strip():
+        return classification, parse_actions(actions_part.strip())
+    return classification, [action for action in parse_actions(content) if action != content]
 
 
 class IncidentAgent(BaseAgent):
-    """Agent for classifying log snippets and proposing remediation actions"""
+    """
+    Agent for classifying log snippets and proposing remediation actions.
+
+    In fused mode (see BaseAgent.run) logs the rule tier can't answer are
+    classified and get their actions from a single LLM call, which still
+    logs the classify and propose_actions steps.
+    """
 
     def __init__(self):
         super().__init__("incident", "IncidentAgent")
-        self._db: Optional[Session] = None
-        self._conversation_id: Optional[str] = None
 
     def _create_graph(self):
         """Create the LangGraph workflow"""
         graph = StateGraph(IncidentAgentState)
 
         # Add nodes
-        graph.add_node("classify", self._classify)
-        graph.add_node("propose_actions", self._propose_actions)
+        graph.add_node("classify", self._node("classify", self._classify))
+        graph.add_node("propose_actions", self._node("propose_actions", self._propose_actions))
+        graph.add_node("classify_and_propose", self._node("classify_and_propose", self._classify_and_propose))
 
         # Add edges
-        graph.add_edge(START, "classify")
+        graph.add_conditional_edges(START, self._route, ["classify", "classify_and_propose"])
         graph.add_edge("classify", "propose_actions")
         graph.add_edge("propose_actions", END)
+        graph.add_edge("classify_and_propose", END)
 
         return graph.compile()
 
+    def _route(self, state: IncidentAgentState) -> str:
+        """Fused runs skip the two-node path unless the rule tier answers"""
+        if not self.run_context.fused or not settings.ANTHROPIC_API_KEY:
+            return "classify"
+        match = state["rule_match"]
+        if match and match.confidence >= settings.INCIDENT_RULES_MIN_CONFIDENCE:
+            return "classify"
+        return "classify_and_propose"
+
     async def _classify(self, state: IncidentAgentState) -> dict:
-        """Classify the log snippet"""
+        """
+        Classify the log snippet. Logs a rule matches with enough confidence
+        are answered by the rule tier; only ambiguous ones go to the LLM.
+        """
         start = time.perf_counter()
         log_snippet = state["log_snippet"]
 
+        match = state["rule_match"]
+
+        if match and match.confidence >= settings.INCIDENT_RULES_MIN_CONFIDENCE:
+            severity = match.rule.severity
+            category = match.rule.category
+            analysis = f"Matched rule '{match.rule.name}' on \"{match.matched_text}\" (confidence {match.confidence:.2f})."
+
+            duration = int((time.perf_counter() - start) * 1000)
+            self._log_step(
+                "classify",
+                "completed",
+                duration,
+                input_preview=log_snippet[:100],
+                output_preview=f"Severity: {severity}, Category: {category}",
+                metadata={"tier": "rules", "rule": match.rule.name, "confidence": match.confidence}
+            )
+            prometheus.incident_tier_total.inc(node="classify", tier="rules")
+            return {"severity": severity, "category": category, "analysis": analysis}
+
         if not settings.ANTHROPIC_API_KEY:
             # Mock classification based on keywords
             log_lower = log_snippet.lower()
@@ -69,16 +204,12 @@ class IncidentAgent(BaseAgent):
                 "completed",
                 duration,
                 input_preview=log_snippet[:100],
-                output_preview=f"Severity: {severity}, Category: {category}"
+                output_preview=f"Severity: {severity}, Category: {category}",
+                metadata={"tier": "keywords"}
             )
+            prometheus.incident_tier_total.inc(node="classify", tier="keywords")
             return {"severity": severity, "category": category}
 
-        llm = ChatAnthropic(
-            model="claude-3-5-sonnet-20241022",
-            api_key=settings.ANTHROPIC_API_KEY,
-            max_tokens=512
-        )
-
         system_prompt = """You are an expert DevOps engineer analyzing log snippets.
 Classify the log based on:
 1. Severity: critical, high, medium, or low
@@ -94,31 +225,13 @@ ANALYSIS: [brief explanation]"""
             HumanMessage(content=f"Log snippet:\n{log_snippet}")
         ]
 
-        response = await llm.ainvoke(messages)
-
-        # Track tokens
-        if hasattr(response, 'usage_metadata'):
-            self._track_tokens(
-                "claude-3-5-sonnet-20241022",
-                response.usage_metadata.get('input_tokens', 0),
-                response.usage_metadata.get('output_tokens', 0),
-                self._conversation_id,
-                self._db
-            )
+        response = await self._call_llm(messages, max_tokens=512)
 
         # Parse response
-        content = response.content
-        severity = "medium"
-        category = "error"
-        analysis = content
-
-        for line in content.split("\n"):
-            if line.startswith("SEVERITY:"):
-                severity = line.split(":", 1)[1].strip().lower()
-            elif line.startswith("CATEGORY:"):
-                category = line.split(":", 1)[1].strip().lower()
-            elif line.startswith("ANALYSIS:"):
-                analysis = line.split(":", 1)[1].strip()
+        classification = parse_classification(response.content)
+        severity = classification["severity"]
+        category = classification["category"]
+        analysis = classification["analysis"]
 
         duration = int((time.perf_counter() - start) * 1000)
         self._log_step(
@@ -126,8 +239,10 @@ ANALYSIS: [brief explanation]"""
             "completed",
             duration,
             input_preview=log_snippet[:100],
-            output_preview=f"Severity: {severity}, Category: {category}"
+            output_preview=f"Severity: {severity}, Category: {category}",
+            metadata={"tier": "llm", "rule": state["rule"], "confidence": state["rule_confidence"]}
         )
+        prometheus.incident_tier_total.inc(node="classify", tier="llm")
 
         return {"severity": severity, "category": category, "analysis": analysis}
 
@@ -139,55 +254,38 @@ ANALYSIS: [brief explanation]"""
         category = state.get("category", "error")
         log_snippet = state["log_snippet"]
 
+        # Confident rule matches come with templated actions. A rule not
+        # trusted with the classification isn't trusted with the actions either
+        actions_confidence = max(settings.INCIDENT_RULES_ACTIONS_CONFIDENCE, settings.INCIDENT_RULES_MIN_CONFIDENCE)
+        if state.get("rule_actions") and state.get("rule_confidence", 0.0) >= actions_confidence:
+            recommended = state["rule_actions"]
+            duration = int((time.perf_counter() - start) * 1000)
+            self._log_step(
+                "propose_actions",
+                "completed",
+                duration,
+                input_preview=f"Severity: {severity}, Category: {category}",
+                output_preview=f"{len(recommended)} actions proposed",
+                metadata={"tier": "template", "rule": state["rule"]}
+            )
+            prometheus.incident_tier_total.inc(node="propose_actions", tier="template")
+            return {"recommended_actions": recommended}
+
         if not settings.ANTHROPIC_API_KEY:
             # Mock actions based on category
-            actions = {
-                "error": [
-                    "Check application logs for stack traces",
-                    "Review recent deployments",
-                    "Verify database connections",
-                    "Check service health endpoints"
-                ],
-                "warning": [
-                    "Monitor for escalation",
-                    "Review deprecated code usage",
-                    "Schedule technical debt cleanup"
-                ],
-                "performance": [
-                    "Check system resources (CPU, memory)",
-                    "Review database query performance",
-                    "Check network latency",
-                    "Consider scaling resources"
-                ],
-                "security": [
-                    "Review access logs",
-                    "Check for unauthorized access attempts",
-                    "Verify SSL certificates",
-                    "Run security scan"
-                ],
-                "info": [
-                    "No immediate action required",
-                    "Log for reference"
-                ]
-            }
-
-            recommended = actions.get(category, actions["info"])
+            recommended = DEFAULT_ACTIONS.get(category, DEFAULT_ACTIONS["info"])
             duration = int((time.perf_counter() - start) * 1000)
             self._log_step(
                 "propose_actions",
                 "completed",
                 duration,
                 input_preview=f"Severity: {severity}, Category: {category}",
-                output_preview=f"{len(recommended)} actions proposed"
+                output_preview=f"{len(recommended)} actions proposed",
+                metadata={"tier": "keywords"}
             )
+            prometheus.incident_tier_total.inc(node="propose_actions", tier="keywords")
             return {"recommended_actions": recommended}
 
-        llm = ChatAnthropic(
-            model="claude-3-5-sonnet-20241022",
-            api_key=settings.ANTHROPIC_API_KEY,
-            max_tokens=512
-        )
-
         system_prompt = f"""You are an expert DevOps engineer.
 Based on a {severity} severity {category} incident, propose specific remediation actions.
 List 3-5 actionable steps, ordered by priority.
@@ -198,30 +296,10 @@ Be specific and technical."""
             HumanMessage(content=f"Log: {log_snippet}\nSeverity: {severity}\nCategory: {category}")
         ]
 
-        response = await llm.ainvoke(messages)
-
-        # Track tokens
-        if hasattr(response, 'usage_metadata'):
-            self._track_tokens(
-                "claude-3-5-sonnet-20241022",
-                response.usage_metadata.get('input_tokens', 0),
-                response.usage_metadata.get('output_tokens', 0),
-                self._conversation_id,
-                self._db
-            )
+        response = await self._call_llm(messages, max_tokens=512)
 
         # Parse actions from response
-        actions = []
-        for line in response.content.split("\n"):
-            line = line.strip()
-            if line and (line[0].isdigit() or line.startswith("-") or line.startswith("•")):
-                # Remove numbering/bullets
-                action = line.lstrip("0123456789.-•) ").strip()
-                if action:
-                    actions.append(action)
-
-        if not actions:
-            actions = [response.content]
+        actions = parse_actions(response.content)
 
         duration = int((time.perf_counter() - start) * 1000)
         self._log_step(
@@ -229,11 +307,60 @@ Be specific and technical."""
             "completed",
             duration,
             input_preview=f"Severity: {severity}, Category: {category}",
-            output_preview=f"{len(actions)} actions proposed"
+            output_preview=f"{len(actions)} actions proposed",
+            metadata={"tier": "llm"}
         )
+        prometheus.incident_tier_total.inc(node="propose_actions", tier="llm")
 
         return {"recommended_actions": actions}
 
+    async def _classify_and_propose(self, state: IncidentAgentState) -> dict:
+        """Classify the log snippet and propose actions in one LLM call"""
+        start = time.perf_counter()
+        log_snippet = state["log_snippet"]
+
+        messages = [
+            SystemMessage(content=FUSED_PROMPT),
+            HumanMessage(content=f"Log snippet:\n{log_snippet}")
+        ]
+
+        response = await self._call_llm(messages, max_tokens=1024)
+
+        classification, actions = parse_fused_reply(response.content)
+        severity = classification["severity"]
+        category = classification["category"]
+        tier = "llm"
+        if not actions:
+            actions = DEFAULT_ACTIONS.get(category, DEFAULT_ACTIONS["info"])
+            tier = "keywords"
+
+        # Same trace as the two-node path; the call is timed on classify
+        duration = int((time.perf_counter() - start) * 1000)
+        self._log_step(
+            "classify",
+            "completed",
+            duration,
+            input_preview=log_snippet[:100],
+            output_preview=f"Severity: {severity}, Category: {category}",
+            metadata={
+                "tier": "llm", "mode": "fused",
+                "rule": state["rule"],
+                "confidence": state["rule_confidence"],
+            }
+        )
+        self._log_step(
+            "propose_actions",
+            "completed",
+            0,
+            input_preview=f"Severity: {severity}, Category: {category}",
+            output_preview=f"{len(actions)} actions proposed",
+            metadata={"tier": tier, "mode": "fused"}
+        )
+        prometheus.incident_tier_total.inc(node="classify", tier="llm")
+        prometheus.incident_tier_total.inc(node="propose_actions", tier=tier)
+
+        return {**classification, "recommended_actions": actions}
+
     async def _execute(
         self,
         input_text: str,
@@ -241,20 +368,20 @@ Be specific and technical."""
         db: Session
     ) -> str:
         """Execute the IncidentAgent workflow"""
-        self._db = db
-        self._conversation_id = conversation_id
-
-        graph = self._create_graph()
-
+        match = rule_classifier.classify(input_text)
         initial_state = {
             "log_snippet": input_text,
             "severity": "",
             "category": "",
             "recommended_actions": [],
-            "analysis": ""
+            "analysis": "",
+            "rule_match": match,
+            "rule": match.rule.name if match else None,
+            "rule_confidence": match.confidence if match else 0.0,
+            "rule_actions": match.actions if match else []
         }
 
-        result = await graph.ainvoke(initial_state)
+        result = await self._invoke_graph(initial_state)
 
         # Format response
         response = f"""## Incident Analysis
@@ -1,6 +1,7 @@
 from datetime import datetime, timezone
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
@@ -8,8 +9,9 @@ from app.core.database import get_db
 from app.models import AgentRun
 from app.schemas import (
     AgentInfo, AgentStats, AgentDetail, AgentListResponse,
-    AgentRunResponse, AgentRunListResponse, AgentStep
+    AgentRunResponse, AgentRunListResponse, AgentStep, AgentRunTrace, TraceSpan
 )
+from app.services import tracing
 
 router = APIRouter()
 
@@ -34,11 +36,13 @@ AGENT_DEFINITIONS = {
         description="Classifies log snippets and proposes remediation actions",
         type="classification",
         version="1.0.0",
-        graph_nodes=["START", "classify", "propose_actions", "END"],
+        graph_nodes=["START", "classify", "propose_actions", "classify_and_propose", "END"],
         graph_edges=[
             {"from": "START", "to": "classify"},
             {"from": "classify", "to": "propose_actions"},
-            {"from": "propose_actions", "to": "END"}
+            {"from": "propose_actions", "to": "END"},
+            {"from": "START", "to": "classify_and_propose"},
+            {"from": "classify_and_propose", "to": "END"}
         ]
     ),
     "slack": AgentInfo(
@@ -47,11 +51,16 @@ AGENT_DEFINITIONS = {
         description="Summarizes conversations and extracts action items",
         type="summarization",
         version="1.0.0",
-        graph_nodes=["START", "summarize", "extract_actions", "END"],
+        graph_nodes=["START", "summarize", "extract_actions", "map_segments", "reduce", "summarize_and_extract", "END"],
         graph_edges=[
             {"from": "START", "to": "summarize"},
             {"from": "summarize", "to": "extract_actions"},
-            {"from": "extract_actions", "to": "END"}
+            {"from": "extract_actions", "to": "END"},
+            {"from": "START", "to": "map_segments"},
+            {"from": "map_segments", "to": "reduce"},
+            {"from": "reduce", "to": "END"},
+            {"from": "START", "to": "summarize_and_extract"},
+            {"from": "summarize_and_extract", "to": "END"}
         ]
     )
 }
@@ -138,6 +147,7 @@ async def get_agent_runs(
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
     status: Optional[str] = None,
+    trace_id: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     if agent_id not in AGENT_DEFINITIONS:
@@ -147,6 +157,8 @@ async def get_agent_runs(
 
     if status:
         query = query.filter(AgentRun.status == status)
+    if trace_id:
+        query = query.filter(AgentRun.trace_id == trace_id)
 
     total = query.count()
     runs = query.order_by(AgentRun.created_at.desc()).offset(skip).limit(limit).all()
@@ -161,8 +173,37 @@ async def get_agent_runs(
             error=run.error,
             steps=[AgentStep(**s) for s in (run.steps or [])],
             tokens_used=run.tokens_used,
+            trace_id=run.trace_id,
             created_at=run.created_at
         ) for run in runs
     ]
 
     return AgentRunListResponse(items=items, total=total, skip=skip, limit=limit)
+
+
+@router.get("/runs/{run_id}/trace", response_model=AgentRunTrace)
+async def get_agent_run_trace(
+    run_id: str,
+    format: str = Query("json", pattern="^(json|text)$"),
+    db: Session = Depends(get_db)
+):
+    """
+    The spans of one agent run as a waterfall: depth-first, with each span's
+    self time and the self time per kind (agent, node, llm, vector, db).
+    ``format=text`` renders it as plain-text bars instead.
+    """
+    run = db.query(AgentRun).filter(AgentRun.id == run_id).first()
+    if not run:
+        raise HTTPException(status_code=404, detail="Agent run not found")
+
+    rows, breakdown = tracing.waterfall(run.spans or [])
+    if format == "text":
+        return PlainTextResponse(tracing.render_waterfall(rows) + "\n")
+    return AgentRunTrace(
+        run_id=run.id,
+        agent_id=run.agent_id,
+        trace_id=run.trace_id,
+        duration_ms=run.duration_ms,
+        spans=[TraceSpan(**row) for row in rows],
+        breakdown=breakdown
+    )
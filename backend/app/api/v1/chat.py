@@ -1,19 +1,27 @@
+import asyncio
+import json
 import time
 from datetime import datetime, timezone
+from typing import AsyncIterator, Optional, Set
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
-from app.models import Conversation, Message, AgentRun
-from app.schemas import ChatRequest, ChatResponse, AgentStep
+from app.core.database import SessionLocal, get_db
+from app.models import Conversation, Message, AgentRun, AgentJob
+from app.schemas import ChatRequest, ChatResponse, AgentStep, ChatJobRequest, ChatJobResponse
+from app.services import tracing
+from app.services.admission import AdmissionRejected, admission
+from app.services.cache import overview_cache
+from app.services.jobs import TERMINAL_STATUSES, check_callback_url, job_payload, job_runner
 
 router = APIRouter()
 
+# Streamed runs in progress; they finish and persist even if the client goes away
+_stream_tasks: Set[asyncio.Task] = set()
 
-@router.post("", response_model=ChatResponse)
-async def chat(data: ChatRequest, db: Session = Depends(get_db)):
-    start_time = time.perf_counter()
 
+def _resolve_agent(data: ChatRequest) -> str:
     # Default to doc agent if not specified
     agent_id = data.agent_id or "doc"
 
@@ -21,12 +29,26 @@ async def chat(data: ChatRequest, db: Session = Depends(get_db)):
     from app.api.v1.agents import AGENT_DEFINITIONS
     if agent_id not in AGENT_DEFINITIONS:
         raise HTTPException(status_code=400, detail=f"Unknown agent: {agent_id}")
+    return agent_id
+
 
-    # Get or create conversation
-    conversation_id = data.conversation_id
-    if conversation_id:
+async def _admit(agent_id: str) -> float:
+    """Wait for a run slot for the agent; 429 with Retry-After if it is overloaded"""
+    try:
+        return await admission.gate(agent_id).acquire()
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+def _open_conversation(data: ChatRequest, agent_id: str, db: Session, job: Optional[AgentJob] = None) -> Conversation:
+    """
+    Get or create the conversation and save the user message. For a queued
+    run, the conversation and message ids are stored on its job in the same
+    commit, so a retry of the job continues them.
+    """
+    if data.conversation_id:
         conversation = db.query(Conversation).filter(
-            Conversation.id == conversation_id
+            Conversation.id == data.conversation_id
         ).first()
         if not conversation:
             raise HTTPException(status_code=404, detail="Conversation not found")
@@ -37,66 +59,252 @@ async def chat(data: ChatRequest, db: Session = Depends(get_db)):
             status="active"
         )
         db.add(conversation)
-        db.commit()
-        db.refresh(conversation)
-        conversation_id = conversation.id
+        # Assign the id; committed with the user message
+        db.flush()
 
     # Save user message
     user_message = Message(
-        conversation_id=conversation_id,
+        conversation_id=conversation.id,
         role="user",
         content=data.message
     )
     db.add(user_message)
+    if job is not None:
+        db.flush()
+        job.conversation_id = conversation.id
+        job.message_id = user_message.id
     db.commit()
+    return conversation
+
+
+def _complete(db: Session, conversation: Conversation, agent_id: str, result: dict, start_time: float) -> ChatResponse:
+    """Save the assistant message and mark the conversation completed"""
+    duration_ms = int((time.perf_counter() - start_time) * 1000)
+
+    # Save assistant message
+    assistant_message = Message(
+        conversation_id=conversation.id,
+        role="assistant",
+        content=result["response"],
+        tokens=result.get("tokens_used", 0),
+        latency_ms=duration_ms
+    )
+    db.add(assistant_message)
+
+    # Update conversation
+    conversation.status = "completed"
+    conversation.updated_at = datetime.now(timezone.utc)
+    db.commit()
+    overview_cache.invalidate()
+
+    return ChatResponse(
+        response=result["response"],
+        conversation_id=conversation.id,
+        agent_id=agent_id,
+        steps=result.get("steps", []),
+        tokens_used=result.get("tokens_used", 0),
+        latency_ms=duration_ms
+    )
 
-    # Run the agent
+
+def _fail(db: Session, conversation: Conversation, agent_id: str, error: Exception, start_time: float):
+    """Mark the conversation failed and record the failed agent run"""
+    conversation.status = "failed"
+
+    # Create error agent run
+    agent_run = AgentRun(
+        agent_id=agent_id,
+        conversation_id=conversation.id,
+        status="failed",
+        error=str(error),
+        duration_ms=int((time.perf_counter() - start_time) * 1000)
+    )
+    db.add(agent_run)
+    db.commit()
+    overview_cache.invalidate()
+
+
+@router.post("", response_model=ChatResponse)
+async def chat(data: ChatRequest, db: Session = Depends(get_db)):
+    start_time = time.perf_counter()
+    agent_id = _resolve_agent(data)
+    admitted_at = await _admit(agent_id)
     try:
-        from app.agents import get_agent
-        agent = get_agent(agent_id)
-        result = await agent.run(data.message, conversation_id, db)
-
-        # Calculate timing
-        duration_ms = int((time.perf_counter() - start_time) * 1000)
-
-        # Save assistant message
-        assistant_message = Message(
-            conversation_id=conversation_id,
-            role="assistant",
-            content=result["response"],
-            tokens=result.get("tokens_used", 0),
-            latency_ms=duration_ms
-        )
-        db.add(assistant_message)
+        conversation = _open_conversation(data, agent_id, db)
 
-        # Update conversation
-        conversation.status = "completed"
-        conversation.updated_at = datetime.now(timezone.utc)
-        db.commit()
+        # Run the agent
+        try:
+            from app.agents import get_agent
+            agent = get_agent(agent_id)
+            result = await agent.run(data.message, conversation.id, db, fused=data.fused)
+            return _complete(db, conversation, agent_id, result, start_time)
 
-        return ChatResponse(
-            response=result["response"],
-            conversation_id=conversation_id,
-            agent_id=agent_id,
-            steps=result.get("steps", []),
-            tokens_used=result.get("tokens_used", 0),
-            latency_ms=duration_ms
-        )
+        except Exception as e:
+            # Save error and update conversation status
+            _fail(db, conversation, agent_id, e, start_time)
+            raise HTTPException(status_code=500, detail=f"Agent error: {str(e)}")
+    finally:
+        admission.gate(agent_id).release(admitted_at)
 
-    except Exception as e:
-        # Save error and update conversation status
-        conversation.status = "failed"
-        db.commit()
 
-        # Create error agent run
-        agent_run = AgentRun(
-            agent_id=agent_id,
-            conversation_id=conversation_id,
-            status="failed",
-            error=str(e),
-            duration_ms=int((time.perf_counter() - start_time) * 1000)
-        )
-        db.add(agent_run)
-        db.commit()
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
 
-        raise HTTPException(status_code=500, detail=f"Agent error: {str(e)}")
+
+@router.post("/stream")
+async def chat_stream(data: ChatRequest):
+    """
+    Run an agent and stream its progress as Server-Sent Events.
+
+    Events: ``start`` (conversation id), ``node_start`` / ``node_end`` per
+    graph node (``node_end`` carries the step), ``token`` for LLM output as
+    it arrives, then ``done`` with the final ChatResponse and token usage,
+    or ``error``. The run is persisted once at the end, as with POST /chat.
+    Admission happens before the stream starts, so overload is still a 429.
+    """
+    start_time = time.perf_counter()
+    agent_id = _resolve_agent(data)
+    admitted_at = await _admit(agent_id)
+
+    # The run outlives this handler (and get_db's session), so it owns a session
+    db = SessionLocal()
+    try:
+        conversation = _open_conversation(data, agent_id, db)
+    except Exception:
+        db.close()
+        admission.gate(agent_id).release(admitted_at)
+        raise
+    conversation_id = conversation.id
+
+    events: asyncio.Queue = asyncio.Queue()
+
+    async def run():
+        try:
+            from app.agents import get_agent
+            result = await get_agent(agent_id).run(data.message, conversation_id, db, events=events, fused=data.fused)
+            response = _complete(db, conversation, agent_id, result, start_time)
+            events.put_nowait({"event": "done", **response.model_dump(), "usage": result["usage"]})
+        except Exception as e:
+            _fail(db, conversation, agent_id, e, start_time)
+            events.put_nowait({"event": "error", "detail": f"Agent error: {str(e)}"})
+        finally:
+            db.close()
+            admission.gate(agent_id).release(admitted_at)
+            events.put_nowait(None)
+
+    task = asyncio.create_task(run())
+    _stream_tasks.add(task)
+    task.add_done_callback(_stream_tasks.discard)
+
+    async def stream() -> AsyncIterator[str]:
+        yield _sse("start", {"conversation_id": conversation_id, "agent_id": agent_id})
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            yield _sse(event.pop("event"), event)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def run_job(job: dict) -> dict:
+    """Job runner handler: run a queued POST /chat/jobs request like POST /chat"""
+    start_time = time.perf_counter()
+    agent_id = job["agent_id"]
+    data = ChatRequest(
+        message=job["message"], agent_id=agent_id, conversation_id=job["conversation_id"], fused=job["fused"]
+    )
+    db = SessionLocal()
+    try:
+        with tracing.use(tracing.TraceContext.parse(job.get("traceparent"))):
+            stored = db.get(AgentJob, job["id"])
+            conversation = None
+            if stored.message_id:
+                # A retry after a restart; the first run saved the user message
+                conversation = db.get(Conversation, stored.conversation_id)
+            if conversation is None:
+                conversation = _open_conversation(data, agent_id, db, job=stored)
+            try:
+                from app.agents import get_agent
+                result = await get_agent(agent_id).run(data.message, conversation.id, db, fused=data.fused)
+                response = _complete(db, conversation, agent_id, result, start_time)
+            except Exception as e:
+                _fail(db, conversation, agent_id, e, start_time)
+                raise
+        return {**response.model_dump(mode="json"), "usage": result["usage"]}
+    finally:
+        db.close()
+
+
+@router.post("/jobs", response_model=ChatJobResponse, status_code=202)
+async def create_chat_job(data: ChatJobRequest, db: Session = Depends(get_db)):
+    """
+    Queue an agent run and return its job id at once. The run is executed
+    by the in-process job workers; get the result by polling
+    GET /chat/jobs/{id}, from the GET /chat/jobs/{id}/events stream, or
+    from a POST to ``callback_url``.
+    """
+    agent_id = _resolve_agent(data)
+    if data.conversation_id and not db.query(Conversation).filter(
+        Conversation.id == data.conversation_id
+    ).first():
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    if data.callback_url:
+        error = check_callback_url(data.callback_url)
+        if error:
+            raise HTTPException(status_code=400, detail=error)
+
+    job = job_runner.submit(
+        agent_id, data.message,
+        conversation_id=data.conversation_id, fused=data.fused, callback_url=data.callback_url
+    )
+    return ChatJobResponse(**job_payload(job))
+
+
+def _get_job(job_id: str):
+    job = job_runner.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/jobs/{job_id}", response_model=ChatJobResponse)
+async def get_chat_job(job_id: str):
+    return ChatJobResponse(**job_payload(_get_job(job_id)))
+
+
+@router.get("/jobs/{job_id}/events")
+async def chat_job_events(job_id: str):
+    """
+    Server-Sent Events for a job: ``status`` with its current status and on
+    every change, then ``done`` with the finished job. Comments are sent
+    while it waits so proxies keep the connection open.
+    """
+    _get_job(job_id)
+    # Subscribe before reading the status so no change is missed in between
+    changes = job_runner.subscribe(job_id)
+
+    async def stream() -> AsyncIterator[str]:
+        try:
+            status = _get_job(job_id).status
+            yield _sse("status", {"id": job_id, "status": status})
+            while status not in TERMINAL_STATUSES:
+                try:
+                    status = await asyncio.wait_for(changes.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse("status", {"id": job_id, "status": status})
+            yield _sse("done", ChatJobResponse(**job_payload(_get_job(job_id))).model_dump(mode="json"))
+        finally:
+            job_runner.unsubscribe(job_id, changes)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
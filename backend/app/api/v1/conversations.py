@@ -10,6 +10,7 @@ from app.schemas import (
     ConversationCreate, ConversationResponse, ConversationDetail,
     ConversationListResponse, MessageResponse
 )
+from app.services.cache import overview_cache
 
 router = APIRouter()
 
@@ -118,6 +119,7 @@ async def create_conversation(data: ConversationCreate, db: Session = Depends(ge
     db.add(conversation)
     db.commit()
     db.refresh(conversation)
+    overview_cache.invalidate()
 
     return ConversationResponse(
         id=conversation.id,
@@ -1,14 +1,22 @@
+import asyncio
+import time
 from datetime import datetime, timezone
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Dict, Optional, List
 import uuid
 
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.admission import AdmissionRejected, admission
+from app.services.fingerprint import fingerprint
+
 router = APIRouter()
 
 # Simple in-memory storage for demo (or add Incident model)
 incidents_store = []
 
+
 class IncidentCreate(BaseModel):
     log_snippet: str
     severity: str
@@ -16,6 +24,7 @@ class IncidentCreate(BaseModel):
     recommended_actions: List[str]
     conversation_id: Optional[str] = None
 
+
 class IncidentResponse(BaseModel):
     id: str
     log_snippet: str
@@ -25,6 +34,7 @@ class IncidentResponse(BaseModel):
     conversation_id: Optional[str]
     created_at: str
 
+
 @router.post("", response_model=IncidentResponse)
 async def create_incident(data: IncidentCreate):
     incident = {
@@ -39,7 +49,119 @@ async def create_incident(data: IncidentCreate):
     incidents_store.append(incident)
     return incident
 
+
 @router.get("", response_model=List[IncidentResponse])
 async def list_incidents():
     return incidents_store[-50:]  # Last 50
 
+
+class IncidentBatchRequest(BaseModel):
+    log_snippets: List[str]
+    fused: Optional[bool] = None  # single-call IncidentAgent mode; defaults to FUSED_AGENTS
+
+
+class IncidentBatchItem(BaseModel):
+    index: int
+    fingerprint: str
+    duplicate_of: Optional[int] = None  # index of the input whose classification was reused
+    severity: Optional[str] = None
+    category: Optional[str] = None
+    recommended_actions: List[str] = []
+    error: Optional[str] = None
+    latency_ms: int  # from the start of the batch until this item's result was ready
+
+
+class IncidentBatchResponse(BaseModel):
+    items: List[IncidentBatchItem]
+    total: int
+    unique: int
+    dedup_ratio: float  # share of inputs answered without their own agent run
+    duration_ms: int
+    avg_latency_ms: float
+    max_latency_ms: int
+
+
+@router.post("/batch", response_model=IncidentBatchResponse)
+async def classify_batch(data: IncidentBatchRequest):
+    """
+    Classify many log snippets at once. Snippets are grouped by a normalized
+    fingerprint (timestamps, ids, IPs and numbers other than status and
+    error codes stripped) and IncidentAgent runs once per group, at most
+    INCIDENT_BATCH_CONCURRENCY at a time, each with its own session. Every input gets its group's classification.
+    Runs take slots of the incident agent's admission gate like /chat runs;
+    the batch gets 429 if the gate's queue is full, and groups shed while
+    it runs get an error.
+    """
+    if not data.log_snippets:
+        raise HTTPException(status_code=400, detail="log_snippets is empty")
+    if len(data.log_snippets) > settings.INCIDENT_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.INCIDENT_BATCH_MAX_SIZE} log snippets per batch"
+        )
+
+    # Runs go through the same admission gate as /chat; shed the batch
+    # at once if the gate couldn't take any of them
+    try:
+        admission.gate("incident").check()
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+    from app.agents import get_agent
+    agent = get_agent("incident")
+    start = time.perf_counter()
+
+    # First input of each fingerprint is the one classified
+    groups: Dict[str, int] = {}
+    fingerprints = []
+    for index, snippet in enumerate(data.log_snippets):
+        fp = fingerprint(snippet)
+        fingerprints.append(fp)
+        groups.setdefault(fp, index)
+
+    semaphore = asyncio.Semaphore(settings.INCIDENT_BATCH_CONCURRENCY)
+
+    async def classify(index: int) -> dict:
+        async with semaphore:
+            try:
+                async with admission.slot("incident"):
+                    db = SessionLocal()
+                    try:
+                        result = await agent.run(data.log_snippets[index], None, db, fused=data.fused)
+                    finally:
+                        db.close()
+                state = result["state"] or {}
+                outcome = {
+                    "severity": state.get("severity"),
+                    "category": state.get("category"),
+                    "recommended_actions": state.get("recommended_actions", []),
+                }
+            except Exception as e:
+                # Includes AdmissionRejected, for groups shed by the gate
+                outcome = {"error": str(e)}
+        outcome["latency_ms"] = int((time.perf_counter() - start) * 1000)
+        return outcome
+
+    indexes = list(groups.values())
+    outcomes = dict(zip(indexes, await asyncio.gather(*(classify(index) for index in indexes))))
+
+    items = []
+    for index, fp in enumerate(fingerprints):
+        first = groups[fp]
+        items.append(IncidentBatchItem(
+            index=index,
+            fingerprint=fp,
+            duplicate_of=first if first != index else None,
+            **outcomes[first]
+        ))
+
+    latencies = [item.latency_ms for item in items]
+    return IncidentBatchResponse(
+        items=items,
+        total=len(items),
+        unique=len(groups),
+        dedup_ratio=round(1 - len(groups) / len(items), 4),
+        duration_ms=int((time.perf_counter() - start) * 1000),
+        avg_latency_ms=round(sum(latencies) / len(latencies), 1),
+        max_latency_ms=max(latencies)
+    )
@@ -11,6 +11,7 @@ from app.schemas import (
     QueryRequest, QueryResponse, QueryResult
 )
 from app.services import document_processor, vector_store
+from app.services.semantic_cache import semantic_cache
 
 router = APIRouter()
 
@@ -70,6 +71,8 @@ async def create_collection(data: CollectionCreate, db: Session = Depends(get_db
     db.add(collection)
     db.commit()
     db.refresh(collection)
+    # Answers cached for an earlier collection of the same name don't apply
+    semantic_cache.invalidate(collection.name)
 
     return CollectionResponse(
         id=collection.id,
@@ -1,48 +1,76 @@
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
+from typing import List, Optional
 from fastapi import APIRouter, Depends, Query, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import Integer, case, cast, func, select
 
 from app.core.database import get_db
-from app.models import Conversation, AgentRun, RequestMetric, TokenUsage
-from app.schemas import OverviewMetrics, TimeseriesResponse, TimeseriesPoint, TokenStats
+from app.models import Conversation, AgentRun, RequestMetricRollup, RouteTemplate
+from app.schemas import (
+    OverviewMetrics, TimeseriesResponse, TimeseriesPoint, TokenStats, MetricsBufferStats,
+    LatencyQuantiles, LatencyResponse, MultiTimeseriesResponse, RouteStats, RouteStatsResponse,
+    LLMPoolStats, OverviewCacheStats, LLMCacheStats, SemanticCacheReport, AdmissionStats, JobRunnerStats
+)
 from app.api.v1.agents import AGENT_DEFINITIONS
+from app.services.admission import admission
+from app.services.cache import overview_cache
+from app.services.jobs import job_runner
+from app.services.latency import LatencyHistogram, latency_registry
+from app.services.llm import estimate_cost, llm_pool
+from app.services.llm_cache import llm_cache
+from app.services import partitions, timeseries
+from app.services.metrics_buffer import metrics_buffer
+from app.services.sampling import weight_of
+from app.services.semantic_cache import semantic_cache
 
 router = APIRouter()
 
 
 @router.get("/overview", response_model=OverviewMetrics)
 async def get_overview_metrics(db: Session = Depends(get_db)):
-    # Total conversations
-    total_conversations = db.query(func.count(Conversation.id)).scalar()
+    # Served from a short-TTL cache that chats and agent runs invalidate; request
+    # metrics (flushed every couple of seconds) are up to OVERVIEW_CACHE_TTL_S stale
+    return overview_cache.get(lambda: _compute_overview(db))
 
-    # Total requests (from metrics table)
-    total_requests = db.query(func.count(RequestMetric.id)).scalar()
+
+def _compute_overview(db: Session) -> OverviewMetrics:
+    """One conditional-aggregation query per table"""
+    # Conversations: total, completed and failed
+    conversation_totals = db.query(
+        func.count(Conversation.id),
+        func.sum(case((Conversation.status == "completed", 1), else_=0)),
+        func.sum(case((Conversation.status == "failed", 1), else_=0))
+    ).one()
+    total_conversations = conversation_totals[0] or 0
+    completed = conversation_totals[1] or 0
+    failed_conversations = conversation_totals[2] or 0
+
+    # Request totals from the hourly rollups (independent of request volume)
+    request_totals = db.query(
+        func.sum(RequestMetricRollup.count),
+        func.sum(RequestMetricRollup.error_count),
+        func.sum(RequestMetricRollup.latency_sum_ms)
+    ).filter(RequestMetricRollup.resolution == "hour").one()
+    total_requests = request_totals[0] or 0
+    failed_requests = request_totals[1] or 0
 
     # Success rate (conversations completed vs total)
-    completed = db.query(func.count(Conversation.id)).filter(
-        Conversation.status == "completed"
-    ).scalar()
     success_rate = round((completed / total_conversations) * 100, 1) if total_conversations > 0 else 100.0
 
     # Average latency from request metrics
-    avg_latency = db.query(func.avg(RequestMetric.duration_ms)).scalar() or 0.0
+    avg_latency = (request_totals[2] or 0.0) / total_requests if total_requests else 0.0
 
     # Error rate (failed conversations + failed requests)
-    failed_conversations = db.query(func.count(Conversation.id)).filter(
-        Conversation.status == "failed"
-    ).scalar()
-    failed_requests = db.query(func.count(RequestMetric.id)).filter(
-        RequestMetric.status_code >= 400
-    ).scalar()
     total_items = total_conversations + total_requests
     error_rate = round(((failed_conversations + failed_requests) / total_items) * 100, 1) if total_items > 0 else 0.0
 
-    # Token usage
-    tokens_used = db.query(func.sum(TokenUsage.total_tokens)).scalar() or 0
-
-    # Estimated cost
-    estimated_cost = db.query(func.sum(TokenUsage.cost_usd)).scalar() or 0.0
+    # Token usage and estimated cost, across all token_usage partitions
+    usage = partitions.token_usage.select_range(db.connection())
+    token_totals = db.execute(
+        select(func.sum(usage.c.total_tokens), func.sum(usage.c.cost_usd)).where(timeseries.sent_usage(usage.c))
+    ).one()
+    tokens_used = token_totals[0] or 0
+    estimated_cost = token_totals[1] or 0.0
 
     # Active agents (agents with at least one run)
     active_agents = len(AGENT_DEFINITIONS)
@@ -59,82 +87,254 @@ async def get_overview_metrics(db: Session = Depends(get_db)):
     )
 
 
+MAX_TIMESERIES_POINTS = 2000
+
+
+def _parse_period(period: str, bucket: Optional[str]):
+    try:
+        window = timeseries.parse_duration(period)
+        width = timeseries.parse_duration(bucket) if bucket else timeseries.default_bucket(window)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if window / width > MAX_TIMESERIES_POINTS:
+        raise HTTPException(status_code=400, detail=f"Too many buckets (max {MAX_TIMESERIES_POINTS})")
+    return window, width
+
+
 @router.get("/timeseries", response_model=TimeseriesResponse)
 async def get_timeseries(
-    metric: str = Query(..., description="Metric name: requests, errors, latency"),
-    period: str = Query("24h", description="Time period: 1h, 24h, 7d"),
+    metric: str = Query(..., description="Metric name: requests, errors, latency, tokens, cost, p95_latency"),
+    period: str = Query("24h", description="Time period, e.g. 1h, 24h, 7d"),
+    bucket: Optional[str] = Query(None, description="Bucket width, e.g. 5m, 1h (defaults by period)"),
     db: Session = Depends(get_db)
 ):
-    # Calculate time range
-    now = datetime.now(timezone.utc)
-    if period == "1h":
-        start_time = now - timedelta(hours=1)
-        bucket_minutes = 5
-    elif period == "24h":
-        start_time = now - timedelta(hours=24)
-        bucket_minutes = 60
-    elif period == "7d":
-        start_time = now - timedelta(days=7)
-        bucket_minutes = 360  # 6 hours
-    else:
-        start_time = now - timedelta(hours=24)
-        bucket_minutes = 60
-
-    # Generate time buckets
-    data = []
-    current = start_time
-    while current < now:
-        bucket_end = current + timedelta(minutes=bucket_minutes)
-
-        if metric == "requests":
-            value = db.query(func.count(RequestMetric.id)).filter(
-                RequestMetric.timestamp >= current,
-                RequestMetric.timestamp < bucket_end
-            ).scalar() or 0
-        elif metric == "errors":
-            value = db.query(func.count(RequestMetric.id)).filter(
-                RequestMetric.timestamp >= current,
-                RequestMetric.timestamp < bucket_end,
-                RequestMetric.status_code >= 400
-            ).scalar() or 0
-        elif metric == "latency":
-            value = db.query(func.avg(RequestMetric.duration_ms)).filter(
-                RequestMetric.timestamp >= current,
-                RequestMetric.timestamp < bucket_end
-            ).scalar() or 0
-        else:
-            value = 0
-
-        data.append(TimeseriesPoint(timestamp=current, value=float(value)))
-        current = bucket_end
+    window, width = _parse_period(period, bucket)
+    try:
+        series = timeseries.query_timeseries(db, [metric], window, width)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
+    data = [TimeseriesPoint(timestamp=ts, value=value) for ts, value in series[metric]]
     return TimeseriesResponse(metric=metric, period=period, data=data)
 
 
+@router.get("/timeseries/multi", response_model=MultiTimeseriesResponse)
+async def get_multi_timeseries(
+    metric: List[str] = Query(..., description="Repeat for several metrics"),
+    period: str = Query("24h", description="Time period, e.g. 1h, 24h, 7d"),
+    bucket: Optional[str] = Query(None, description="Bucket width, e.g. 5m, 1h (defaults by period)"),
+    db: Session = Depends(get_db)
+):
+    """Several metrics over the same buckets in one round trip"""
+    window, width = _parse_period(period, bucket)
+    try:
+        series = timeseries.query_timeseries(db, list(dict.fromkeys(metric)), window, width)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return MultiTimeseriesResponse(
+        period=period,
+        bucket_seconds=int(width.total_seconds()),
+        series={
+            name: [TimeseriesPoint(timestamp=ts, value=value) for ts, value in points]
+            for name, points in series.items()
+        }
+    )
+
+
 @router.get("/tokens", response_model=TokenStats)
 async def get_token_stats(db: Session = Depends(get_db)):
-    total_tokens = db.query(func.sum(TokenUsage.total_tokens)).scalar() or 0
-    total_cost = db.query(func.sum(TokenUsage.cost_usd)).scalar() or 0.0
+    usage = partitions.token_usage.select_range(db.connection())
 
-    # Group by model
-    by_model_query = db.query(
-        TokenUsage.model,
-        func.sum(TokenUsage.total_tokens).label("tokens"),
-        func.sum(TokenUsage.cost_usd).label("cost")
-    ).group_by(TokenUsage.model).all()
+    # Group by model; totals are summed from the (few) per-model rows.
+    # Cache replays are counted separately below, not as tokens used.
+    by_model_query = db.execute(
+        select(
+            usage.c.model,
+            func.sum(usage.c.total_tokens).label("tokens"),
+            func.sum(usage.c.cost_usd).label("cost")
+        ).where(timeseries.sent_usage(usage.c)).group_by(usage.c.model)
+    ).all()
+    total_tokens = sum(row.tokens or 0 for row in by_model_query)
+    total_cost = sum(row.cost or 0.0 for row in by_model_query)
 
     by_model = {
         row.model: {"tokens": row.tokens or 0, "cost": round(row.cost or 0, 4)}
         for row in by_model_query
     }
 
+    # Replays from the LLM response cache, priced as if they had been sent
+    cached = db.execute(
+        select(
+            func.count(),
+            func.sum(usage.c.input_tokens),
+            func.sum(usage.c.output_tokens)
+        ).where(usage.c.cached.is_(True))
+    ).one()
+    cached_input, cached_output = cached[1] or 0, cached[2] or 0
+
+    # Prompt caching, priced against sending the same prompts uncached
+    prompt_cache = db.execute(
+        select(func.sum(usage.c.cache_read_tokens), func.sum(usage.c.cache_write_tokens))
+    ).one()
+    cache_read, cache_write = prompt_cache[0] or 0, prompt_cache[1] or 0
+    prompt_cache_saved = (
+        estimate_cost(cache_read + cache_write, 0) - estimate_cost(cache_read + cache_write, 0, cache_read, cache_write)
+    )
+
     return TokenStats(
         total_tokens=total_tokens,
         total_cost_usd=round(total_cost, 4),
-        by_model=by_model
+        by_model=by_model,
+        cached_calls=cached[0],
+        cached_tokens=cached_input + cached_output,
+        saved_cost_usd=round(estimate_cost(cached_input, cached_output), 4),
+        prompt_cache_read_tokens=cache_read,
+        prompt_cache_write_tokens=cache_write,
+        prompt_cache_saved_usd=round(prompt_cache_saved, 4)
+    )
+
+
+@router.get("/routes", response_model=RouteStatsResponse)
+async def get_route_stats(
+    period: str = Query("24h", description="Time period, e.g. 1h, 24h, 7d"),
+    db: Session = Depends(get_db)
+):
+    """Per-route request counts, errors and latency from the raw request metrics"""
+    try:
+        start = datetime.now(timezone.utc).replace(tzinfo=None) - timeseries.parse_duration(period)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Indexed GROUP BY on the interned route id; templates are joined onto the (few) groups.
+    # Raw rows may be sampled, so counts and means are weighted by sample_weight.
+    requests = partitions.request_metrics.select_range(db.connection(), start)
+    weight = weight_of(requests.c)
+    per_route = select(
+        requests.c.route_id,
+        func.sum(weight).label("requests"),
+        func.sum(cast(requests.c.status_code >= 400, Integer) * weight).label("errors"),
+        (func.sum(requests.c.duration_ms * weight) / func.sum(weight)).label("avg_latency_ms")
+    ).where(requests.c.timestamp >= start).group_by(requests.c.route_id).subquery()
+
+    rows = db.execute(
+        select(per_route, RouteTemplate.template)
+        .outerjoin(RouteTemplate, RouteTemplate.id == per_route.c.route_id)
+        .order_by(per_route.c.requests.desc())
+    ).all()
+
+    return RouteStatsResponse(
+        period=period,
+        routes=[
+            RouteStats(
+                route=row.template or "<unknown>",
+                requests=row.requests,
+                errors=row.errors or 0,
+                avg_latency_ms=round(row.avg_latency_ms or 0, 1)
+            )
+            for row in rows
+        ]
     )
 
 
+@router.get("/buffer", response_model=MetricsBufferStats)
+async def get_buffer_stats():
+    """Counters for the request metrics write-behind buffer"""
+    return MetricsBufferStats(**metrics_buffer.stats())
+
+
+@router.get("/llm", response_model=LLMPoolStats)
+async def get_llm_pool_stats():
+    """Shared LLM client pool: per-model concurrency slot usage and wait times"""
+    return LLMPoolStats(**llm_pool.stats())
+
+
+@router.get("/admission", response_model=AdmissionStats)
+async def get_admission_stats():
+    """/chat admission control per agent: slots in use, queue depth, wait times and shed requests"""
+    return AdmissionStats(**admission.stats())
+
+
+@router.get("/jobs", response_model=JobRunnerStats)
+async def get_job_runner_stats():
+    """POST /chat/jobs worker pool: utilization, queue depth, queue and run times, callbacks"""
+    return JobRunnerStats(**job_runner.stats())
+
+
+@router.get("/overview-cache", response_model=OverviewCacheStats)
+async def get_overview_cache_stats():
+    """Hits, misses and invalidations of the cached /metrics/overview result"""
+    return OverviewCacheStats(**overview_cache.stats())
+
+
+@router.get("/llm-cache", response_model=LLMCacheStats)
+async def get_llm_cache_stats():
+    """Hits, misses and size of the exact-match LLM response cache"""
+    return LLMCacheStats(**llm_cache.stats())
+
+
+@router.get("/semantic-cache", response_model=SemanticCacheReport)
+async def get_semantic_cache_report():
+    """
+    DocAgent semantic cache per knowledge collection: hit rate, lookup cost
+    and the run time it saves. A negative net_saved_ms means lookups on
+    misses cost more than hits save; many near_misses suggest the threshold
+    could be lowered.
+    """
+    return SemanticCacheReport(collections=semantic_cache.report())
+
+
+def _quantile_label(q: float) -> str:
+    return "p" + f"{q * 100:g}"
+
+
+def _summarize_histogram(route: str, status_class: str, hist: LatencyHistogram, qs: List[float]) -> LatencyQuantiles:
+    return LatencyQuantiles(
+        route=route,
+        status_class=status_class,
+        count=hist.count,
+        mean_ms=round(hist.mean, 2),
+        max_ms=round(hist.max, 2),
+        quantiles={_quantile_label(q): round(hist.quantile(q), 2) for q in qs}
+    )
+
+
+@router.get("/latency", response_model=LatencyResponse)
+async def get_latency_quantiles(
+    q: List[float] = Query([0.5, 0.95, 0.99], description="Quantiles between 0 and 1"),
+    window: int = Query(15, ge=1, description="Window in minutes"),
+    route: Optional[str] = Query(None, description="Route template, e.g. /api/v1/chat"),
+    status_class: Optional[str] = Query(None, description="Status class, e.g. 2xx"),
+):
+    """Latency quantiles from the in-memory histograms (no database access)"""
+    if any(not 0 <= value <= 1 for value in q):
+        raise HTTPException(status_code=400, detail="Quantiles must be between 0 and 1")
+
+    window = min(window, latency_registry.retention_minutes)
+    series = latency_registry.merged(window, route=route, status=status_class)
+
+    overall = LatencyHistogram(latency_registry.relative_accuracy)
+    routes = []
+    for (route_name, status_name), hist in sorted(series.items()):
+        overall.merge(hist)
+        routes.append(_summarize_histogram(route_name, status_name, hist, q))
+
+    return LatencyResponse(
+        window_minutes=window,
+        overall=_summarize_histogram(route or "*", status_class or "*", overall, q),
+        routes=routes
+    )
+
+
+@router.get("/latency/snapshot")
+async def get_latency_snapshot():
+    """Raw per-minute histograms, mergeable across windows and processes"""
+    return {
+        "relative_accuracy": latency_registry.relative_accuracy,
+        "windows": latency_registry.snapshot()
+    }
+
+
 @router.get("/agents/{agent_id}")
 async def get_agent_metrics(agent_id: str, db: Session = Depends(get_db)):
     """Get aggregated metrics for a specific agent"""
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List, Set
 import json
 import os
 
@@ -10,6 +10,8 @@ class Settings(BaseSettings):
 
     # API Keys
     ANTHROPIC_API_KEY: str = ""
+    # Alternative API endpoint, e.g. a local fake server (app/scripts/fake_anthropic.py)
+    ANTHROPIC_BASE_URL: str = ""
 
     # Database
     DATABASE_URL: str = "sqlite:///./app.db"
@@ -29,6 +31,130 @@ class Settings(BaseSettings):
     # n8n
     N8N_URL: str = "http://localhost:5678"
 
+    # Request metrics write-behind buffer
+    METRICS_BUFFER_MAX_SIZE: int = 10000
+    METRICS_BATCH_SIZE: int = 500
+    METRICS_FLUSH_INTERVAL_S: float = 2.0
+    # Raw request paths are high-cardinality; rows always carry the route template id
+    METRICS_STORE_RAW_PATH: bool = False
+
+    # Sampling of raw request metric rows (errors and slow requests are always kept)
+    METRICS_SAMPLE_RATE: float = 1.0
+    METRICS_SLOW_REQUEST_MS: float = 1000.0
+    # JSON object of route glob (optionally prefixed by a method) -> keep rate,
+    # e.g. {"GET /api/v1/metrics/*": 0.01}
+    METRICS_SAMPLING_RULES: str = "{}"
+
+    @property
+    def metrics_sampling_rules(self) -> Dict[str, float]:
+        return json.loads(self.METRICS_SAMPLING_RULES or "{}")
+
+    # In-memory latency histograms
+    LATENCY_RETENTION_MINUTES: int = 60
+    LATENCY_RELATIVE_ACCURACY: float = 0.01
+
+    # Time-partitioned request_metrics / token_usage storage
+    METRICS_PARTITION_GRANULARITY: str = "week"  # day, week
+    METRICS_RETENTION_DAYS: int = 0  # 0 keeps everything
+
+    # Cached /metrics/overview (write paths invalidate it earlier)
+    OVERVIEW_CACHE_TTL_S: float = 5.0
+
+    # Shared LLM clients: one keep-alive connection pool for all agents
+    LLM_MAX_CONNECTIONS: int = 20
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    LLM_KEEPALIVE_EXPIRY_S: float = 60.0
+    LLM_MAX_CONCURRENCY_PER_MODEL: int = 8
+    LLM_TIMEOUT_S: float = 60.0
+    # Mark agents' system prompts as Anthropic prompt-cache breakpoints
+    PROMPT_CACHE_ENABLED: bool = True
+    # Anthropic doesn't cache shorter prefixes (1024 tokens for Sonnet and Opus, 2048 for Haiku)
+    PROMPT_CACHE_MIN_TOKENS: int = 1024
+
+    # Exact-match LLM response cache: in-memory LRU in front of a database tier
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_MEMORY_ENTRIES: int = 512
+    LLM_CACHE_TTL_S: float = 86400.0
+    LLM_CACHE_MAX_BYTES: int = 50_000_000
+    # Comma-separated agent ids whose LLM calls bypass the cache
+    LLM_CACHE_DISABLED_AGENTS: str = ""
+
+    @property
+    def llm_cache_disabled_agents(self) -> Set[str]:
+        return {a.strip() for a in self.LLM_CACHE_DISABLED_AGENTS.split(",") if a.strip()}
+
+    # Admission control for /chat: concurrent runs per agent, then a bounded
+    # wait queue; beyond that requests get 429 with Retry-After
+    ADMISSION_MAX_CONCURRENCY: int = 16
+    # JSON object of agent id -> concurrency, e.g. {"doc": 32, "slack": 4}
+    ADMISSION_MAX_CONCURRENCY_PER_AGENT: str = "{}"
+    ADMISSION_MAX_QUEUE: int = 32
+    ADMISSION_QUEUE_TIMEOUT_S: float = 30.0
+
+    @property
+    def admission_concurrency(self) -> Dict[str, int]:
+        return json.loads(self.ADMISSION_MAX_CONCURRENCY_PER_AGENT or "{}")
+
+    # POST /chat/jobs: in-process workers running queued agent runs
+    CHAT_JOB_WORKERS: int = 4
+    # Runs a job may start; restarts that interrupt it more often fail it
+    CHAT_JOB_MAX_ATTEMPTS: int = 3
+    CHAT_JOB_CALLBACK_TIMEOUT_S: float = 10.0
+    CHAT_JOB_CALLBACK_RETRIES: int = 3
+    # Comma-separated hosts callback_url may point at ("*.example.com" for
+    # subdomains); empty refuses callbacks
+    CHAT_JOB_CALLBACK_HOSTS: str = ""
+
+    @property
+    def chat_job_callback_hosts(self) -> Set[str]:
+        return {h.strip().lower() for h in self.CHAT_JOB_CALLBACK_HOSTS.split(",") if h.strip()}
+
+    # Span tracing of agent runs (nodes, LLM calls, vector queries, DB
+    # flushes), stored with each AgentRun; runs keep at most TRACE_MAX_SPANS
+    TRACING_ENABLED: bool = True
+    TRACE_MAX_SPANS: int = 200
+
+    # Comma-separated agent ids (incident, slack) that answer in one fused LLM
+    # call instead of one per graph node; requests can override it
+    FUSED_AGENTS: str = ""
+
+    @property
+    def fused_agents(self) -> Set[str]:
+        return {a.strip() for a in self.FUSED_AGENTS.split(",") if a.strip()}
+
+    # DocAgent semantic answer cache (cosine similarity of question embeddings)
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92
+    # JSON object of knowledge collection -> threshold, e.g. {"project-docs": 0.95}
+    SEMANTIC_CACHE_THRESHOLDS: str = "{}"
+
+    @property
+    def semantic_cache_thresholds(self) -> Dict[str, float]:
+        return json.loads(self.SEMANTIC_CACHE_THRESHOLDS or "{}")
+
+    # DocAgent context: retrieved chunks are merged, deduplicated and cut to
+    # the budget (estimated tokens); passages sharing at least the threshold
+    # of their word trigrams count as duplicates
+    DOC_CONTEXT_TOKEN_BUDGET: int = 1024
+    DOC_CONTEXT_DUPLICATE_THRESHOLD: float = 0.9
+
+    # POST /incidents/batch
+    INCIDENT_BATCH_MAX_SIZE: int = 1000
+    INCIDENT_BATCH_CONCURRENCY: int = 8
+
+    # IncidentAgent rule tier: logs matched by a rule at or above the confidence
+    # skip the classify LLM call; at or above the actions confidence they also
+    # get the rule's templated actions instead of the propose_actions call
+    INCIDENT_RULES_PATH: str = ""  # JSON rule set replacing the built-in rules
+    INCIDENT_RULES_MIN_CONFIDENCE: float = 0.85
+    INCIDENT_RULES_ACTIONS_CONFIDENCE: float = 0.9
+
+    # SlackAgent map-reduce: transcripts above the threshold (in estimated
+    # tokens) are split into segments summarized concurrently, then merged
+    SLACK_MAP_REDUCE_THRESHOLD_TOKENS: int = 4000
+    SLACK_SEGMENT_TOKENS: int = 2000
+    SLACK_MAP_CONCURRENCY: int = 8
+
     # Render-specific: detect if running on Render
     @property
     def is_production(self) -> bool:
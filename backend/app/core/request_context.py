@@ -0,0 +1,28 @@
+from contextvars import ContextVar
+from typing import Optional, Set
+
+
+class TokenLedger:
+    """Token usage accumulated by agents while serving a single request"""
+
+    def __init__(self):
+        self.input_tokens: int = 0
+        self.output_tokens: int = 0
+        self.cost_usd: float = 0.0
+        self.models: Set[str] = set()
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+    def add(self, model: str, input_tokens: int, output_tokens: int, cost_usd: float):
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        self.cost_usd += cost_usd
+        self.models.add(model)
+
+
+# Set by TokenTrackingMiddleware for the duration of a request. The ledger is a
+# mutable object so usage recorded from LangGraph node tasks (which run in a
+# copy of the context) is still visible to the middleware.
+token_ledger: ContextVar[Optional[TokenLedger]] = ContextVar("token_ledger", default=None)
@@ -1,19 +1,30 @@
+import asyncio
 import time
 from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 
 from app.core.config import settings
 from app.core.database import engine, Base
 from app.api.v1 import api_router
+from app.api.v1.chat import run_job
 from app.middleware.metrics import RequestMetricsMiddleware, TokenTrackingMiddleware
+from app.middleware.tracing import TraceContextMiddleware
+from app.services import prometheus
+from app.services.cache import overview_cache
+from app.services.jobs import job_runner
+from app.services.llm import llm_pool
+from app.services.metrics_buffer import metrics_buffer
+from app.services.partitions import retention_loop
 
 # Import models to ensure they are registered with Base
 from app.models import (  # noqa: F401
     Conversation, Message, AgentRun, Workflow, WorkflowExecution,
-    KnowledgeCollection, KnowledgeChunk, RequestMetric, TokenUsage
+    KnowledgeCollection, KnowledgeChunk, RequestMetric, RouteTemplate, TokenUsage, RequestMetricRollup,
+    LLMCacheEntry, AgentJob
 )
 
 
@@ -21,8 +32,16 @@ from app.models import (  # noqa: F401
 async def lifespan(app: FastAPI):
     # Startup: Create database tables
     Base.metadata.create_all(bind=engine)
+    metrics_buffer.start()
+    retention_task = asyncio.create_task(retention_loop())
+    job_runner.start(run_job)
     yield
-    # Shutdown: cleanup if needed
+    # Shutdown: stop job workers (interrupted jobs rerun on the next start),
+    # flush queued request metrics, close pooled LLM connections
+    retention_task.cancel()
+    await job_runner.stop()
+    await metrics_buffer.stop()
+    await llm_pool.aclose()
 
 
 app = FastAPI(
@@ -45,6 +64,9 @@ app.add_middleware(
 app.add_middleware(RequestMetricsMiddleware)
 app.add_middleware(TokenTrackingMiddleware)
 
+# Outermost, so the trace id is set for everything below
+app.add_middleware(TraceContextMiddleware)
+
 
 # Health check endpoint
 @app.get("/health", tags=["health"])
@@ -56,6 +78,12 @@ async def health_check():
     }
 
 
+# Prometheus scrape endpoint (in-process counters only, no database access)
+@app.get("/metrics", tags=["health"], include_in_schema=False)
+async def prometheus_metrics():
+    return Response(content=prometheus.registry.render(), media_type=prometheus.CONTENT_TYPE)
+
+
 # Seed endpoint (for demo purposes)
 @app.post("/api/v1/admin/seed", tags=["admin"])
 async def seed_demo_data():
@@ -63,6 +91,7 @@ async def seed_demo_data():
     from app.scripts.seed_demo_data import seed_demo_data as run_seed
     try:
         run_seed()
+        overview_cache.invalidate()
         return {"status": "success", "message": "Demo data seeded successfully"}
     except Exception as e:
         return {"status": "error", "message": str(e)}
@@ -1,115 +1,133 @@
 import time
-import json
-from typing import Callable
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.concurrency import iterate_in_threadpool
-from sqlalchemy.orm import Session
-
-from app.core.database import SessionLocal
-from app.models.metrics import RequestMetric, TokenUsage
-
-class RequestMetricsMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+from datetime import datetime, timezone
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.request_context import TokenLedger, token_ledger
+from app.services import prometheus
+from app.services.latency import latency_registry
+from app.services.metrics_buffer import metrics_buffer
+from app.services.sampling import request_sampler
+
+
+def route_template(scope: Scope) -> str:
+    """
+    The matched route's path template, e.g. /api/v1/conversations/{conversation_id}.
+
+    Unmatched requests (404s, scanners) collapse into a single series so they
+    can't blow up cardinality.
+    """
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+
+class RequestMetricsMiddleware:
+    """
+    Pure ASGI middleware that times every request.
+
+    The response is passed through untouched (no buffering), so streaming
+    responses keep working. The status code and time to first byte are taken
+    from the ``http.response.start`` message; the row is queued once the
+    last body message has been sent.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        # We filter out health checks, scrapes and options to reduce noise
+        if scope["type"] != "http" or scope["path"] in ("/health", "/metrics") or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
         start_time = time.perf_counter()
-        
-        # Process request
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                duration_ms = (time.perf_counter() - start_time) * 1000
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Process-Time-Ms", f"{duration_ms:.2f}")
+            await send(message)
+
         try:
-            response = await call_next(request)
-            status_code = response.status_code
-        except Exception as e:
-            status_code = 500
-            raise e
+            await self.app(scope, receive, send_wrapper)
         finally:
-            # Calculate duration
             duration_ms = (time.perf_counter() - start_time) * 1000
-            
-            # Log to DB (in a separate session/thread ideally, but here sync for simplicity)
-            # We filter out health checks and options to reduce noise
-            if request.url.path != "/health" and request.method != "OPTIONS":
-                self.log_request(
-                    path=request.url.path,
-                    method=request.method,
-                    status_code=status_code,
-                    duration_ms=duration_ms,
-                    user_agent=request.headers.get("user-agent"),
-                    request_id=str(request.state.request_id) if hasattr(request.state, "request_id") else ""
-                )
-                
-                # Add header
-                if 'response' in locals():
-                    response.headers["X-Process-Time-Ms"] = f"{duration_ms:.2f}"
-
-        return response
-
-    def log_request(self, path, method, status_code, duration_ms, user_agent, request_id):
-        try:
-            db = SessionLocal()
-            metric = RequestMetric(
-                request_id=request_id,
-                path=path,
-                method=method,
+            state = scope.get("state") or {}
+
+            route = route_template(scope)
+            latency_registry.record(route, status_code, duration_ms)
+            self.observe_request(route, scope["method"], status_code, duration_ms)
+
+            # Queue for batched persistence
+            self.log_request(
+                path=scope["path"],
+                route=route,
+                method=scope["method"],
                 status_code=status_code,
                 duration_ms=duration_ms,
-                user_agent=user_agent
-            )
-            db.add(metric)
-            db.commit()
-            db.close()
-        except Exception as e:
-            print(f"Failed to log request metric: {e}")
-
-
-class TokenTrackingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        response = await call_next(request)
-        
-        # Only check JSON responses from chat/agent endpoints
-        if (
-            response.headers.get("content-type") == "application/json" 
-            and ("/chat" in request.url.path or "/agent" in request.url.path)
-        ):
-            # We need to read the body, which consumes it, so we must reconstruct it
-            response_body = [chunk async for chunk in response.body_iterator]
-            response.body_iterator = iterate_in_threadpool(iter(response_body))
-            
-            try:
-                body_content = b"".join(response_body).decode()
-                data = json.loads(body_content)
-                
-                # Look for token usage data
-                # Expected format: { ..., "tokens_used": 123, "model": "claude-...", ... }
-                if isinstance(data, dict):
-                    tokens = data.get("tokens_used")
-                    model = data.get("model") or "unknown"
-                    cost = data.get("cost_usd")
-                    
-                    if tokens:
-                        self.log_tokens(
-                            model=model,
-                            total_tokens=tokens,
-                            cost_usd=cost,
-                            agent_run_id=data.get("agent_run_id"),
-                            conversation_id=data.get("conversation_id")
-                        )
-            except Exception:
-                pass  # Ignore parsing errors
-                
-        return response
-
-    def log_tokens(self, model, total_tokens, cost_usd, agent_run_id, conversation_id):
-        try:
-            db = SessionLocal()
-            usage = TokenUsage(
-                model=model,
-                total_tokens=total_tokens,
-                cost_usd=cost_usd,
-                agent_run_id=agent_run_id,
-                conversation_id=conversation_id
+                user_agent=Headers(scope=scope).get("user-agent"),
+                request_id=str(state["request_id"]) if "request_id" in state else "",
+                sample_weight=request_sampler.weight(route, scope["method"], status_code, duration_ms)
             )
-            db.add(usage)
-            db.commit()
-            db.close()
-        except Exception as e:
-            print(f"Failed to log token usage: {e}")
 
+    def observe_request(self, route, method, status_code, duration_ms):
+        # In-process Prometheus series, served by /metrics without touching the database
+        prometheus.http_requests_total.inc(route=route, method=method, status=status_code)
+        if status_code >= 400:
+            prometheus.http_request_errors_total.inc(route=route, method=method)
+        prometheus.http_request_duration_seconds.observe(duration_ms / 1000, route=route, method=method)
+
+    def log_request(self, path, route, method, status_code, duration_ms, user_agent, request_id, sample_weight=1):
+        # Queued for the write-behind buffer; persistence happens off the request path.
+        # Every row feeds the rollups, only sampled ones (weight > 0) are stored raw.
+        metrics_buffer.put({
+            "request_id": request_id,
+            "path": path,
+            "route": route,
+            "method": method,
+            "status_code": status_code,
+            "duration_ms": duration_ms,
+            "timestamp": datetime.now(timezone.utc),
+            "user_agent": user_agent,
+            "sample_weight": sample_weight,
+        })
+
+
+class TokenTrackingMiddleware:
+    """
+    Pure ASGI middleware that exposes per-request token usage.
+
+    Instead of re-parsing the JSON body, a TokenLedger is installed in a
+    context variable for chat/agent requests. BaseAgent._track_tokens adds to
+    it, and the totals are reported as response headers. Usage rows
+    themselves are persisted by the agent, so nothing is written here.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not ("/chat" in scope["path"] or "/agent" in scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        ledger = TokenLedger()
+        token = token_ledger.set(ledger)
+
+        async def send_wrapper(message: Message):
+            # Streaming responses start before the agent has run, so only
+            # report usage that has already been recorded
+            if message["type"] == "http.response.start" and ledger.total_tokens:
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Tokens-Used", str(ledger.total_tokens))
+                headers.append("X-Cost-Usd", f"{ledger.cost_usd:.6f}")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            token_ledger.reset(token)
@@ -0,0 +1,41 @@
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services import tracing
+
+
+class TraceContextMiddleware:
+    """
+    Pure ASGI middleware that puts every request in a trace.
+
+    The trace is continued from an incoming W3C ``traceparent`` header, or
+    started here. Its id becomes ``request.state.request_id`` (and so the
+    request metric's request_id) and is set for agent runs to record their
+    spans under. The request's own span is returned in ``traceparent`` so
+    callers can find the trace, e.g. with GET /agents/runs/{id}/trace.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = tracing.TraceContext.parse(Headers(scope=scope).get("traceparent"))
+        context = tracing.TraceContext(
+            incoming.trace_id if incoming else tracing.new_trace_id(),
+            tracing.new_span_id(),
+            incoming.sampled if incoming else True
+        )
+        scope.setdefault("state", {})["request_id"] = context.trace_id
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("traceparent", context.traceparent)
+            await send(message)
+
+        with tracing.use(context):
+            await self.app(scope, receive, send_wrapper)
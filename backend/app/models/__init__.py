@@ -2,7 +2,9 @@ from app.models.conversation import Conversation, Message
 from app.models.agent import AgentRun
 from app.models.workflow import Workflow, WorkflowExecution
 from app.models.knowledge import KnowledgeCollection, KnowledgeChunk
-from app.models.metrics import RequestMetric, TokenUsage
+from app.models.metrics import RequestMetric, RouteTemplate, TokenUsage, RequestMetricRollup
+from app.models.llm_cache import LLMCacheEntry
+from app.models.job import AgentJob
 
 __all__ = [
     "Conversation",
@@ -13,5 +15,9 @@ __all__ = [
     "KnowledgeCollection",
     "KnowledgeChunk",
     "RequestMetric",
+    "RouteTemplate",
     "TokenUsage",
+    "RequestMetricRollup",
+    "LLMCacheEntry",
+    "AgentJob",
 ]
@@ -20,6 +20,8 @@ class AgentRun(Base):
     error = Column(Text, nullable=True)
     steps = Column(JSON, nullable=True)  # Array of step objects
     tokens_used = Column(Integer, nullable=True, default=0)
+    trace_id = Column(String(32), nullable=True, index=True)  # W3C trace id of the request that ran it
+    spans = Column(JSON, nullable=True)  # Compact span list, see app.services.tracing
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
     # Relationships
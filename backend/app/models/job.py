@@ -0,0 +1,30 @@
+import uuid
+from datetime import datetime, timezone
+from sqlalchemy import Column, String, Text, Integer, Boolean, DateTime, JSON
+from app.core.database import Base
+
+
+def generate_uuid():
+    return str(uuid.uuid4())
+
+
+class AgentJob(Base):
+    """Queued agent run of POST /chat/jobs, executed by the in-process job runner (see app.services.jobs)"""
+    __tablename__ = "agent_jobs"
+
+    id = Column(String(36), primary_key=True, default=generate_uuid)
+    agent_id = Column(String(50), nullable=False)
+    message = Column(Text, nullable=False)
+    conversation_id = Column(String(36), nullable=True)  # set to the run's conversation once it starts
+    message_id = Column(String(36), nullable=True)  # user message saved by the first run; retries reuse it
+    fused = Column(Boolean, nullable=True)
+    callback_url = Column(String(2048), nullable=True)
+    traceparent = Column(String(55), nullable=True)  # trace of the submitting request, continued by the run
+    status = Column(String(20), nullable=False, default="queued", index=True)  # queued, running, completed, failed
+    attempts = Column(Integer, nullable=False, default=0)  # runs started; >1 after a restart interrupted one
+    result = Column(JSON, nullable=True)  # ChatResponse plus token usage
+    error = Column(Text, nullable=True)
+    callback_status = Column(String(255), nullable=True)  # delivered, skipped, or the last delivery error
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), index=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
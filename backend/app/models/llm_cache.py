@@ -0,0 +1,19 @@
+from datetime import datetime, timezone
+from sqlalchemy import Column, String, Text, Integer, DateTime
+from app.core.database import Base
+
+
+class LLMCacheEntry(Base):
+    """Persistent tier of the exact-match LLM response cache (see app.services.llm_cache)"""
+    __tablename__ = "llm_cache_entries"
+
+    key = Column(String(64), primary_key=True)  # sha256 of model, messages and parameters
+    model = Column(String(100), nullable=False)
+    content = Column(Text, nullable=False)
+    input_tokens = Column(Integer, nullable=False, default=0)
+    output_tokens = Column(Integer, nullable=False, default=0)
+    size_bytes = Column(Integer, nullable=False, default=0)
+    hits = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    last_used_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
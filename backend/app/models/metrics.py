@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime, timezone
-from sqlalchemy import Column, String, Integer, DateTime, Float
+from sqlalchemy import Boolean, Column, String, Integer, DateTime, Float, JSON, Index, UniqueConstraint
 from app.core.database import Base
 
 
@@ -9,19 +9,38 @@ def generate_uuid():
 
 
 class RequestMetric(Base):
+    """
+    Raw request metrics. New rows live in time partitions that copy this
+    schema (see app.services.partitions); this table keeps older rows.
+    """
     __tablename__ = "request_metrics"
 
     id = Column(String(36), primary_key=True, default=generate_uuid)
     request_id = Column(String(36), nullable=False)
-    path = Column(String(255), nullable=False)
+    route_id = Column(Integer, nullable=True, index=True)  # RouteTemplate.id
+    path = Column(String(255), nullable=True)  # raw path, only kept with METRICS_STORE_RAW_PATH
     method = Column(String(10), nullable=False)
     status_code = Column(Integer, nullable=False)
     duration_ms = Column(Float, nullable=False)
     timestamp = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     user_agent = Column(String(500), nullable=True)
+    sample_weight = Column(Integer, nullable=True, default=1)  # requests this row stands for
+
+
+class RouteTemplate(Base):
+    """Interned route templates, e.g. /api/v1/conversations/{conversation_id}"""
+    __tablename__ = "route_templates"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    template = Column(String(255), nullable=False, unique=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
 
 class TokenUsage(Base):
+    """
+    LLM token usage per call. New rows live in time partitions that copy
+    this schema (see app.services.partitions); this table keeps older rows.
+    """
     __tablename__ = "token_usage"
 
     id = Column(String(36), primary_key=True, default=generate_uuid)
@@ -30,6 +49,29 @@ class TokenUsage(Base):
     output_tokens = Column(Integer, nullable=False, default=0)
     total_tokens = Column(Integer, nullable=False, default=0)
     cost_usd = Column(Float, nullable=True)
+    cached = Column(Boolean, nullable=True, default=False)  # replayed from the LLM response cache, cost 0
+    # Part of input_tokens read from / written to the provider's prompt cache
+    cache_read_tokens = Column(Integer, nullable=True, default=0)
+    cache_write_tokens = Column(Integer, nullable=True, default=0)
     agent_run_id = Column(String(36), nullable=True)
     conversation_id = Column(String(36), nullable=True)
     timestamp = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+
+class RequestMetricRollup(Base):
+    """Pre-aggregated request metrics per time bucket, route and status class"""
+    __tablename__ = "request_metric_rollups"
+    __table_args__ = (
+        UniqueConstraint("resolution", "bucket_start", "route", "status_class", name="uq_request_metric_rollup"),
+        Index("ix_request_metric_rollups_resolution_bucket", "resolution", "bucket_start"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    resolution = Column(String(10), nullable=False)  # minute, hour
+    bucket_start = Column(DateTime, nullable=False)
+    route = Column(String(255), nullable=False)
+    status_class = Column(String(3), nullable=False)  # 2xx, 4xx, 5xx
+    count = Column(Integer, nullable=False, default=0)
+    error_count = Column(Integer, nullable=False, default=0)
+    latency_sum_ms = Column(Float, nullable=False, default=0.0)
+    latency_histogram = Column(JSON, nullable=True)  # LatencyHistogram.to_dict()
@@ -4,6 +4,7 @@ from app.schemas.conversation import (
 )
 from app.schemas.agent import (
     AgentStep, AgentRunCreate, AgentRunResponse, AgentRunListResponse,
+    TraceSpan, AgentRunTrace,
     AgentInfo, AgentStats, AgentDetail, AgentListResponse
 )
 from app.schemas.workflow import (
@@ -15,9 +16,12 @@ from app.schemas.knowledge import (
     ChunkResponse, QueryRequest, QueryResult, QueryResponse
 )
 from app.schemas.metrics import (
-    OverviewMetrics, TimeseriesPoint, TimeseriesResponse, TokenStats
+    OverviewMetrics, TimeseriesPoint, TimeseriesResponse, TokenStats, MetricsBufferStats,
+    LatencyQuantiles, LatencyResponse, MultiTimeseriesResponse, RouteStats, RouteStatsResponse,
+    LLMModelPoolStats, LLMPoolStats, OverviewCacheStats, LLMCacheStats, SemanticCacheStats, SemanticCacheReport,
+    AgentAdmissionStats, AdmissionStats, JobRunnerStats
 )
-from app.schemas.chat import ChatRequest, ChatResponse
+from app.schemas.chat import ChatRequest, ChatResponse, ChatJobRequest, ChatJobResult, ChatJobResponse
 
 __all__ = [
     # Conversation
@@ -25,6 +29,7 @@ __all__ = [
     "ConversationCreate", "ConversationResponse", "ConversationDetail", "ConversationListResponse",
     # Agent
     "AgentStep", "AgentRunCreate", "AgentRunResponse", "AgentRunListResponse",
+    "TraceSpan", "AgentRunTrace",
     "AgentInfo", "AgentStats", "AgentDetail", "AgentListResponse",
     # Workflow
     "WorkflowCreate", "WorkflowResponse", "WorkflowDetail",
@@ -33,7 +38,10 @@ __all__ = [
     "CollectionCreate", "CollectionResponse", "CollectionListResponse",
     "ChunkResponse", "QueryRequest", "QueryResult", "QueryResponse",
     # Metrics
-    "OverviewMetrics", "TimeseriesPoint", "TimeseriesResponse", "TokenStats",
+    "OverviewMetrics", "TimeseriesPoint", "TimeseriesResponse", "TokenStats", "MetricsBufferStats",
+    "LatencyQuantiles", "LatencyResponse", "MultiTimeseriesResponse", "RouteStats", "RouteStatsResponse",
+    "LLMModelPoolStats", "LLMPoolStats", "OverviewCacheStats", "LLMCacheStats", "SemanticCacheStats", "SemanticCacheReport",
+    "AgentAdmissionStats", "AdmissionStats", "JobRunnerStats",
     # Chat
-    "ChatRequest", "ChatResponse",
+    "ChatRequest", "ChatResponse", "ChatJobRequest", "ChatJobResult", "ChatJobResponse",
 ]
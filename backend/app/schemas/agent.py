@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional, List, Any
+from typing import Optional, List, Any, Dict
 from pydantic import BaseModel
 
 
@@ -9,6 +9,8 @@ class AgentStep(BaseModel):
     duration_ms: Optional[int] = None
     input_preview: Optional[str] = None
     output_preview: Optional[str] = None
+    # Node-specific details, e.g. which tier answered
+    metadata: Optional[dict] = None
 
 
 class AgentRunCreate(BaseModel):
@@ -25,6 +27,7 @@ class AgentRunResponse(BaseModel):
     error: Optional[str] = None
     steps: Optional[List[AgentStep]] = None
     tokens_used: Optional[int] = None
+    trace_id: Optional[str] = None
     created_at: datetime
 
     class Config:
@@ -38,6 +41,29 @@ class AgentRunListResponse(BaseModel):
     limit: int
 
 
+class TraceSpan(BaseModel):
+    id: str
+    parent: Optional[str] = None
+    name: str
+    kind: str  # agent, node, llm, vector, db
+    start_ms: float  # offset from the start of the run
+    ms: float
+    self_ms: float  # time not spent in child spans
+    depth: int
+    attrs: Optional[dict] = None
+
+
+class AgentRunTrace(BaseModel):
+    run_id: str
+    agent_id: str
+    trace_id: Optional[str] = None
+    duration_ms: Optional[int] = None
+    # Spans depth-first, children in start order: a waterfall top to bottom
+    spans: List[TraceSpan]
+    # Self time per span kind, in ms
+    breakdown: Dict[str, float]
+
+
 class AgentInfo(BaseModel):
     id: str
     name: str
@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import Optional, List
 from pydantic import BaseModel
 from app.schemas.agent import AgentStep
@@ -7,6 +8,8 @@ class ChatRequest(BaseModel):
     message: str
     agent_id: Optional[str] = None
     conversation_id: Optional[str] = None
+    # Single-call mode of the incident and slack agents; defaults to FUSED_AGENTS
+    fused: Optional[bool] = None
 
 
 class ChatResponse(BaseModel):
@@ -16,3 +19,29 @@ class ChatResponse(BaseModel):
     steps: List[AgentStep] = []
     tokens_used: int = 0
     latency_ms: int = 0
+
+
+class ChatJobRequest(ChatRequest):
+    # POSTed the finished job (a ChatJobResponse) if set
+    callback_url: Optional[str] = None
+
+
+class ChatJobResult(ChatResponse):
+    usage: Optional[dict] = None
+
+
+class ChatJobResponse(BaseModel):
+    id: str
+    agent_id: str
+    status: str  # queued, running, completed, failed
+    conversation_id: Optional[str] = None
+    attempts: int = 0
+    result: Optional[ChatJobResult] = None
+    error: Optional[str] = None
+    callback_url: Optional[str] = None
+    callback_status: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    queue_ms: Optional[int] = None
+    run_ms: Optional[int] = None
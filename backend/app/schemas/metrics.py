@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Dict
 from pydantic import BaseModel
 
 
@@ -25,7 +25,154 @@ class TimeseriesResponse(BaseModel):
     data: List[TimeseriesPoint]
 
 
+class MultiTimeseriesResponse(BaseModel):
+    period: str
+    bucket_seconds: int
+    series: Dict[str, List[TimeseriesPoint]]
+
+
 class TokenStats(BaseModel):
     total_tokens: int
     total_cost_usd: float
     by_model: dict
+    # Calls replayed from the LLM response cache (included in total_tokens at zero cost)
+    cached_calls: int = 0
+    cached_tokens: int = 0
+    saved_cost_usd: float = 0.0
+    # Prompt tokens read from / written to the provider's prompt cache, and
+    # what reads saved net of the write premium
+    prompt_cache_read_tokens: int = 0
+    prompt_cache_write_tokens: int = 0
+    prompt_cache_saved_usd: float = 0.0
+
+
+class RouteStats(BaseModel):
+    route: str
+    requests: int
+    errors: int
+    avg_latency_ms: float
+
+
+class RouteStatsResponse(BaseModel):
+    period: str
+    routes: List[RouteStats]
+
+
+class MetricsBufferStats(BaseModel):
+    queued: int
+    max_size: int
+    enqueued: int
+    dropped: int
+    flushed: int
+    batches: int
+    flush_errors: int
+    sampled_out: int
+
+
+class LLMModelPoolStats(BaseModel):
+    limit: int
+    in_flight: int
+    waiting: int
+    utilization: float
+    calls: int
+    avg_wait_ms: float
+    max_wait_ms: float
+
+
+class LLMPoolStats(BaseModel):
+    clients: int
+    max_connections: int
+    max_keepalive_connections: int
+    models: Dict[str, LLMModelPoolStats]
+
+
+class AgentAdmissionStats(BaseModel):
+    limit: int
+    max_queue: int
+    in_flight: int
+    queued: int
+    admitted: int
+    shed_queue_full: int
+    shed_timeout: int
+    avg_wait_ms: float
+    max_wait_ms: float
+    avg_run_ms: float
+
+
+class AdmissionStats(BaseModel):
+    agents: Dict[str, AgentAdmissionStats]
+
+
+class JobRunnerStats(BaseModel):
+    workers: int
+    busy: int
+    utilization: float
+    avg_utilization: float
+    queued: int
+    recovered: int
+    completed: int
+    failed: int
+    avg_queue_ms: float
+    avg_run_ms: float
+    callbacks_delivered: int
+    callbacks_failed: int
+
+
+class OverviewCacheStats(BaseModel):
+    ttl_s: float
+    hits: int
+    misses: int
+    hit_rate: float
+    invalidations: int
+
+
+class LLMCacheStats(BaseModel):
+    memory_hits: int
+    db_hits: int
+    misses: int
+    hit_rate: float
+    stores: int
+    evictions: int
+    bytes_served: int
+    memory_entries: int
+    memory_bytes: int
+    db_bytes: int
+
+
+class SemanticCacheStats(BaseModel):
+    collection: str
+    threshold: float
+    lookups: int
+    hits: int
+    misses: int
+    errors: int
+    hit_rate: float
+    near_misses: int  # misses just below the threshold
+    avg_hit_similarity: float
+    avg_lookup_ms: float
+    avg_hit_run_ms: float
+    avg_miss_run_ms: float
+    saved_ms: float  # run time saved by hits
+    overhead_ms: float  # lookup time added to misses
+    net_saved_ms: float
+    stores: int
+    invalidations: int
+
+
+class SemanticCacheReport(BaseModel):
+    collections: List[SemanticCacheStats]
+
+
+class LatencyQuantiles(BaseModel):
+    route: str
+    status_class: str
+    count: int
+    mean_ms: float
+    max_ms: float
+    quantiles: Dict[str, float]
+
+
+class LatencyResponse(BaseModel):
+    window_minutes: int
+    overall: LatencyQuantiles
+    routes: List[LatencyQuantiles]
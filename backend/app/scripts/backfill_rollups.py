@@ -0,0 +1,87 @@
+"""
+Rebuild the request metric rollup tables from the raw request_metrics rows.
+
+Run from the backend directory (preferably with the API stopped, since the
+live metrics buffer also writes rollups):
+    python -m app.scripts.backfill_rollups
+"""
+
+import sys
+import os
+from typing import Dict, Tuple
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import select
+from starlette.routing import Match
+
+from app.core.database import engine, Base
+from app.models import RequestMetricRollup, RouteTemplate
+from app.services import partitions, rollups
+
+
+def _route_matcher():
+    """Map raw paths of historical rows onto the app's route templates"""
+    from app.main import app
+
+    cache: Dict[Tuple[str, str], str] = {}
+
+    def template_for(method: str, path: str) -> str:
+        key = (method, path)
+        if key not in cache:
+            scope = {"type": "http", "method": method, "path": path}
+            cache[key] = "<unmatched>"
+            for route in app.routes:
+                match, _ = route.matches(scope)
+                if match == Match.FULL:
+                    cache[key] = route.path
+                    break
+        return cache[key]
+
+    return template_for
+
+
+def backfill_rollups(batch_size: int = 5000) -> int:
+    """Recompute every rollup row from request_metrics. Returns rows scanned."""
+    Base.metadata.create_all(bind=engine)
+    template_for = _route_matcher()
+    scanned = 0
+    deltas: Dict = {}
+    with engine.begin() as conn:
+        conn.execute(RequestMetricRollup.__table__.delete())
+        table = partitions.request_metrics.select_range(conn)
+
+        # Rows carry their interned route template; older rows only have the raw path
+        result = conn.execution_options(yield_per=batch_size).execute(
+            select(
+                table.c.timestamp, table.c.path, table.c.method, table.c.status_code, table.c.duration_ms,
+                table.c.sample_weight, RouteTemplate.template
+            )
+            .outerjoin(RouteTemplate, RouteTemplate.id == table.c.route_id)
+            .where(table.c.timestamp.isnot(None))
+        )
+        for partition in result.partitions():
+            rows = [
+                {
+                    "timestamp": row.timestamp,
+                    "route": row.template or (template_for(row.method, row.path) if row.path else "<unmatched>"),
+                    "status_code": row.status_code,
+                    "duration_ms": row.duration_ms,
+                    "sample_weight": row.sample_weight,
+                }
+                for row in partition
+            ]
+            # Raw rows may be sampled; each one stands for sample_weight requests
+            rollups.aggregate(rows, deltas, weighted=True)
+            scanned += len(rows)
+
+        rollups.apply(conn, deltas)
+
+    return scanned
+
+
+if __name__ == "__main__":
+    print("Backfilling request metric rollups...")
+    count = backfill_rollups()
+    print(f"Rolled up {count} request metrics")
@@ -0,0 +1,86 @@
+"""
+Microbenchmark of per-request agent setup, plus a concurrency check of the
+shared agent instances.
+
+Run from the backend directory:
+    python -m app.scripts.bench_agents
+"""
+
+import sys
+import os
+import asyncio
+import time
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.agents import AGENTS, get_agent
+from app.core.config import settings
+from app.core.database import Base
+
+ITERATIONS = 200
+CONCURRENT_RUNS = 50
+
+INPUTS = {
+    "incident": "ERROR: Connection timeout to database after 30s",
+    "slack": "alice: let's ship on friday\nbob: ok, I'll update the docs",
+}
+
+
+def measure(setup) -> float:
+    """Mean milliseconds per call"""
+    setup()
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        setup()
+    return (time.perf_counter() - start) / ITERATIONS * 1000
+
+
+def bench_setup():
+    print(f"Per-request agent setup ({ITERATIONS} iterations)")
+    for agent_id, agent_cls in AGENTS.items():
+        # Before: a new agent per chat and a graph compiled on every run
+        before = measure(lambda: agent_cls()._create_graph())
+        # After: the shared instance and its cached compiled graph
+        after = measure(lambda: get_agent(agent_id).graph)
+        print(f"  {agent_id:<10} new + compile {before:8.3f} ms   shared + cached {after:8.4f} ms")
+
+
+async def bench_concurrency():
+    """Interleave many mock-mode runs on the shared instances and check none of their steps mix"""
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    async def run_one(agent_id: str):
+        db = Session()
+        try:
+            return agent_id, await get_agent(agent_id).run(INPUTS[agent_id], None, db)
+        finally:
+            db.close()
+
+    jobs = [run_one(agent_id) for agent_id in INPUTS for _ in range(CONCURRENT_RUNS)]
+    start = time.perf_counter()
+    results = await asyncio.gather(*jobs)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    expected = {
+        "incident": ["classify", "propose_actions"],
+        "slack": ["summarize", "extract_actions"],
+    }
+    mixed = sum(
+        1 for agent_id, result in results
+        if [step.name for step in result["steps"]] != expected[agent_id]
+    )
+    print(f"\n{len(jobs)} concurrent mock runs in {elapsed:.1f} ms, runs with foreign steps: {mixed}")
+
+
+if __name__ == "__main__":
+    # Mock mode: no LLM calls, so only the agent machinery is measured
+    settings.ANTHROPIC_API_KEY = ""
+    bench_setup()
+    asyncio.run(bench_concurrency())
@@ -0,0 +1,115 @@
+"""
+Side-by-side benchmark of the two-node and fused (single-call) modes of
+IncidentAgent and SlackAgent, using the local fake Anthropic server
+(app/scripts/fake_anthropic.py) started in-process.
+
+Run from the backend directory:
+    python -m app.scripts.bench_fused
+"""
+
+import sys
+import os
+import asyncio
+import time
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import uvicorn
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.agents import get_agent
+from app.core.config import settings
+from app.core.database import Base
+from app.scripts.fake_anthropic import create_app
+from app.services.llm import llm_pool
+
+PORT = 8791
+LATENCY_MS = 200.0
+MS_PER_1K_INPUT_TOKENS = 100.0
+RUNS = 10
+
+# Inputs the shortcuts (rule tier, map-reduce) leave to the LLM
+INPUTS = {
+    "incident": (
+        "ERROR payment webhook handler raised an unexpected exception\n"
+        "Traceback (most recent call last):\n"
+        '  File "/app/payments/webhooks.py", line 88, in handle\n'
+        "    order = Order.objects.get(external_id=payload['id'])\n"
+        "payments.models.Order.DoesNotExist: Order matching query does not exist"
+    ),
+    "slack": "\n".join(
+        f"{person}: {line}"
+        for person, line in [
+            ("alice", "can we move the release to friday?"),
+            ("bob", "the migration script still fails on staging, looking into it"),
+            ("carol", "I'll update the runbook once the rollback is tested"),
+            ("alice", "agreed, let's keep the feature flag off until QA signs off"),
+            ("dave", "latency on the search endpoint is back under 200ms"),
+            ("bob", "I can pair with you on the flaky integration tests tomorrow"),
+        ] * 20
+    ),
+}
+
+
+async def run_mode(Session, fake, agent_id: str, fused: bool) -> dict:
+    agent = get_agent(agent_id)
+    requests_before = fake.state.requests
+    durations = []
+    input_tokens = 0
+    steps = None
+    for _ in range(RUNS):
+        db = Session()
+        try:
+            start = time.perf_counter()
+            result = await agent.run(INPUTS[agent_id], None, db, fused=fused)
+            durations.append((time.perf_counter() - start) * 1000)
+        finally:
+            db.close()
+        input_tokens += result["usage"]["input_tokens"]
+        steps = [step.name for step in result["steps"]]
+    return {
+        "avg_ms": sum(durations) / len(durations),
+        "calls": (fake.state.requests - requests_before) / RUNS,
+        "input_tokens": input_tokens / RUNS,
+        "steps": steps,
+    }
+
+
+async def main():
+    fake = create_app(LATENCY_MS, MS_PER_1K_INPUT_TOKENS)
+    server = uvicorn.Server(uvicorn.Config(fake, host="127.0.0.1", port=PORT, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    print(f"{RUNS} runs per mode, {LATENCY_MS:g} ms + {MS_PER_1K_INPUT_TOKENS:g} ms per 1k prompt tokens "
+          f"simulated model latency")
+    for agent_id in INPUTS:
+        # Warm up the graph and the pooled connections
+        await run_mode(Session, fake, agent_id, fused=False)
+        two_node = await run_mode(Session, fake, agent_id, fused=False)
+        fused = await run_mode(Session, fake, agent_id, fused=True)
+        print(f"\n{agent_id}")
+        for name, stats in (("two-node", two_node), ("fused", fused)):
+            print(f"  {name:<9} {stats['avg_ms']:7.1f} ms/run  {stats['calls']:.0f} calls  "
+                  f"{stats['input_tokens']:6.0f} input tokens  steps {stats['steps']}")
+        print(f"  fused: {1 - fused['avg_ms'] / two_node['avg_ms']:.0%} less latency, "
+              f"{1 - fused['input_tokens'] / two_node['input_tokens']:.0%} fewer input tokens")
+
+    await llm_pool.aclose()
+    server.should_exit = True
+    await server_task
+
+
+if __name__ == "__main__":
+    settings.ANTHROPIC_API_KEY = "fake"
+    settings.ANTHROPIC_BASE_URL = f"http://127.0.0.1:{PORT}"
+    settings.LLM_CACHE_ENABLED = False
+    asyncio.run(main())
@@ -0,0 +1,143 @@
+"""
+Benchmark of the IncidentAgent rule tier on a labeled sample: every log is
+run through the agent with the rule tier off (LLM only) and on, against the
+local fake Anthropic server (app/scripts/fake_anthropic.py) started
+in-process. Reports LLM calls avoided, latency saved and how often the rule
+tier agreed with the labels.
+
+Run from the backend directory:
+    python -m app.scripts.bench_incident_rules
+"""
+
+import sys
+import os
+import asyncio
+import time
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import uvicorn
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.agents import get_agent
+from app.core.config import settings
+from app.core.database import Base
+from app.scripts.fake_anthropic import create_app
+from app.services.llm import llm_pool
+
+PORT = 8789
+LATENCY_MS = 100.0
+
+# (log snippet, severity, category)
+SAMPLE = [
+    ("2024-01-15 10:30:00 ERROR java.lang.OutOfMemoryError: Java heap space", "critical", "error"),
+    ("kernel: Out of memory: Killed process 4121 (python3)", "critical", "error"),
+    ("Container api-7f9c OOMKilled, restarting (exit code 137)", "critical", "error"),
+    ("worker[223]: segmentation fault (core dumped)", "critical", "error"),
+    ("panic: runtime error: invalid memory address or nil pointer dereference", "critical", "error"),
+    ("write /var/lib/docker/overlay2: no space left on device", "critical", "performance"),
+    ("ALERT disk usage on /dev/sda1 at 97%", "critical", "performance"),
+    ("ERROR psycopg2.OperationalError: connection refused to postgres at 10.0.0.5:5432", "high", "error"),
+    ("FATAL: sorry, too many connections for role app", "high", "error"),
+    ("sqlalchemy.exc.TimeoutError: QueuePool limit reached, connection pool exhausted", "high", "error"),
+    ("redis connection timeout after 5000ms", "high", "error"),
+    ('10.0.0.1 - - "POST /api/orders HTTP/1.1" status=502 Bad Gateway', "high", "error"),
+    ("upstream returned 503 Service Unavailable for GET /health", "high", "error"),
+    ("sshd[881]: Failed password for root from 203.0.113.7 port 22", "high", "security"),
+    ("auth failed for user admin: invalid credentials (attempt 12)", "high", "security"),
+    ("GET /admin 403 Forbidden user=guest", "high", "security"),
+    ("x509: certificate has expired or is not yet valid", "high", "security"),
+    ("SSL handshake failed: certificate verify failed", "high", "security"),
+    ("WARNING: datetime.utcnow() is deprecated and scheduled for removal", "low", "warning"),
+    ("DeprecationWarning: pkg_resources is deprecated as an API", "low", "warning"),
+    ("slow query: SELECT * FROM orders took 4200ms", "medium", "performance"),
+    ("request GET /search took 3.2s (p99 latency budget 500ms)", "medium", "performance"),
+    ("2024-01-15 10:30:00 INFO Server started on port 8000", "low", "info"),
+    ("INFO scheduler: job cleanup finished in 120ms", "low", "info"),
+    # Ambiguous: no confident rule, these still need the LLM
+    ("ERROR payment webhook handler raised an unexpected exception", "high", "error"),
+    ("WARN retrying message 42 from queue orders", "medium", "warning"),
+    ("user 7731 reported checkout button does nothing", "medium", "error"),
+    ("ERROR upstream timeout while calling inventory service", "high", "performance"),
+    ("feature flag new-checkout toggled by ops", "low", "info"),
+    ("WARN request to /api/report took 2500ms", "medium", "performance"),
+]
+
+
+async def run_sample(Session, fake) -> dict:
+    agent = get_agent("incident")
+    requests_before = fake.state.requests
+    durations = []
+    rule_answers = []
+    start = time.perf_counter()
+    for log, severity, category in SAMPLE:
+        db = Session()
+        try:
+            run_start = time.perf_counter()
+            result = await agent.run(log, None, db)
+            durations.append((time.perf_counter() - run_start) * 1000)
+        finally:
+            db.close()
+        classify = next(step for step in result["steps"] if step.name == "classify")
+        if classify.metadata and classify.metadata.get("tier") == "rules":
+            state = result["state"]
+            rule_answers.append((state["severity"], state["category"]) == (severity, category))
+    return {
+        "llm_calls": fake.state.requests - requests_before,
+        "total_ms": (time.perf_counter() - start) * 1000,
+        "avg_ms": sum(durations) / len(durations),
+        "rule_answers": len(rule_answers),
+        "rule_correct": sum(rule_answers),
+    }
+
+
+async def main():
+    fake = create_app(LATENCY_MS)
+    server = uvicorn.Server(uvicorn.Config(fake, host="127.0.0.1", port=PORT, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    min_confidence = settings.INCIDENT_RULES_MIN_CONFIDENCE
+    actions_confidence = settings.INCIDENT_RULES_ACTIONS_CONFIDENCE
+
+    # Before: every log goes through both LLM calls
+    settings.INCIDENT_RULES_MIN_CONFIDENCE = settings.INCIDENT_RULES_ACTIONS_CONFIDENCE = 2.0
+    before = await run_sample(Session, fake)
+    settings.INCIDENT_RULES_MIN_CONFIDENCE = min_confidence
+    settings.INCIDENT_RULES_ACTIONS_CONFIDENCE = actions_confidence
+    after = await run_sample(Session, fake)
+
+    print(f"{len(SAMPLE)} labeled logs, {LATENCY_MS:g} ms simulated model latency, "
+          f"rule confidence >= {min_confidence}, templated actions >= {actions_confidence}")
+    for name, stats in (("LLM only", before), ("rule tier", after)):
+        print(f"  {name:<10} LLM calls {stats['llm_calls']:4d}   total {stats['total_ms']:8.1f} ms"
+              f"   avg {stats['avg_ms']:7.1f} ms/log")
+
+    avoided = before["llm_calls"] - after["llm_calls"]
+    print(f"\nLLM calls avoided: {avoided} of {before['llm_calls']} ({avoided / before['llm_calls']:.0%})")
+    print(f"Latency saved: {before['total_ms'] - after['total_ms']:.1f} ms "
+          f"({1 - after['total_ms'] / before['total_ms']:.0%})")
+    if after["rule_answers"]:
+        print(f"Rule tier answered {after['rule_answers']} of {len(SAMPLE)} logs, "
+              f"{after['rule_correct']} matching the labels "
+              f"({after['rule_correct'] / after['rule_answers']:.0%})")
+
+    await llm_pool.aclose()
+    server.should_exit = True
+    await server_task
+
+
+if __name__ == "__main__":
+    settings.ANTHROPIC_API_KEY = "fake"
+    settings.ANTHROPIC_BASE_URL = f"http://127.0.0.1:{PORT}"
+    # Identical logs would otherwise be answered from the response cache on the second pass
+    settings.LLM_CACHE_ENABLED = False
+    asyncio.run(main())
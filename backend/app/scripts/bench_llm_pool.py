@@ -0,0 +1,91 @@
+"""
+Benchmark of per-call LLM clients against the shared pool, using the local
+fake Anthropic server (app/scripts/fake_anthropic.py) started in-process.
+
+Run from the backend directory:
+    python -m app.scripts.bench_llm_pool
+"""
+
+import sys
+import os
+import asyncio
+import time
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import uvicorn
+from langchain_anthropic import ChatAnthropic
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from app.core.config import settings
+from app.scripts.fake_anthropic import create_app
+from app.services.llm import DEFAULT_MODEL, llm_pool
+
+PORT = 8788
+CALLS = 100
+CONCURRENCY = 20
+LATENCY_MS = 20.0
+
+MESSAGES = [
+    SystemMessage(content="You are an expert DevOps engineer analyzing log snippets.\nClassify the log"),
+    HumanMessage(content="Log snippet:\nERROR: Connection timeout to database after 30s"),
+]
+
+
+async def run_calls(call) -> float:
+    """Seconds to make CALLS calls, CONCURRENCY at a time"""
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def one():
+        async with semaphore:
+            await call()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(CALLS)))
+    return time.perf_counter() - start
+
+
+async def main():
+    fake = create_app(LATENCY_MS)
+    server = uvicorn.Server(uvicorn.Config(fake, host="127.0.0.1", port=PORT, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    async def per_call():
+        # Before: a new ChatAnthropic (and connection pool) for every node
+        llm = ChatAnthropic(model=DEFAULT_MODEL, api_key=settings.ANTHROPIC_API_KEY,
+                            base_url=settings.ANTHROPIC_BASE_URL, max_tokens=512)
+        try:
+            await llm.ainvoke(MESSAGES)
+        finally:
+            # Left open, every client's idle keep-alive connection stays with
+            # the fake server and slows down the phases after this one
+            await llm._async_client.close()
+
+    async def pooled():
+        await llm_pool.ainvoke(MESSAGES, model=DEFAULT_MODEL, max_tokens=512)
+
+    print(f"{CALLS} calls, {CONCURRENCY} concurrent, {LATENCY_MS:g} ms simulated model latency")
+    for name, call in (("per-call client", per_call), ("shared pool", pooled)):
+        fake.state.connections.clear()
+        elapsed = await run_calls(call)
+        print(
+            f"  {name:<16} {elapsed * 1000:8.1f} ms total  {elapsed / CALLS * 1000:6.2f} ms/call"
+            f"  connections opened: {len(fake.state.connections)}"
+        )
+
+    model_stats = llm_pool.stats()["models"][DEFAULT_MODEL]
+    print(f"\nPool: {model_stats['calls']} calls, cap {model_stats['limit']}, "
+          f"avg wait {model_stats['avg_wait_ms']:.2f} ms, max wait {model_stats['max_wait_ms']:.2f} ms")
+
+    await llm_pool.aclose()
+    server.should_exit = True
+    await server_task
+
+
+if __name__ == "__main__":
+    settings.ANTHROPIC_API_KEY = "fake"
+    settings.ANTHROPIC_BASE_URL = f"http://127.0.0.1:{PORT}"
+    asyncio.run(main())
@@ -0,0 +1,118 @@
+import sys
+import os
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+from typing import Callable
+
+# Add backend directory to path so we can import app modules
+# Assumes running from backend directory
+sys.path.append(os.getcwd())
+
+import httpx
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.concurrency import iterate_in_threadpool
+
+from app.middleware.metrics import RequestMetricsMiddleware, TokenTrackingMiddleware
+from app.services.metrics_buffer import metrics_buffer
+
+REQUESTS = 2000
+
+
+class LegacyRequestMetricsMiddleware(BaseHTTPMiddleware):
+    """The previous BaseHTTPMiddleware implementation, for comparison"""
+
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        start_time = time.perf_counter()
+        response = await call_next(request)
+        duration_ms = (time.perf_counter() - start_time) * 1000
+        metrics_buffer.put({
+            "request_id": "",
+            "path": request.url.path,
+            "route": request.url.path,
+            "method": request.method,
+            "status_code": response.status_code,
+            "duration_ms": duration_ms,
+            "timestamp": datetime.now(timezone.utc),
+            "user_agent": request.headers.get("user-agent"),
+        })
+        response.headers["X-Process-Time-Ms"] = f"{duration_ms:.2f}"
+        return response
+
+
+class LegacyTokenTrackingMiddleware(BaseHTTPMiddleware):
+    """The previous body-buffering implementation, without the DB write"""
+
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        response = await call_next(request)
+        if (
+            response.headers.get("content-type") == "application/json"
+            and ("/chat" in request.url.path or "/agent" in request.url.path)
+        ):
+            response_body = [chunk async for chunk in response.body_iterator]
+            response.body_iterator = iterate_in_threadpool(iter(response_body))
+            try:
+                json.loads(b"".join(response_body).decode())
+            except Exception:
+                pass
+        return response
+
+
+def build_app(metrics_cls=None, tokens_cls=None) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/chat")
+    async def chat():
+        return {"response": "x" * 2000, "steps": [{"name": "step"}] * 10, "tokens_used": 123}
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for _ in range(20):
+                yield b"data: chunk\n\n"
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    if metrics_cls:
+        app.add_middleware(metrics_cls)
+    if tokens_cls:
+        app.add_middleware(tokens_cls)
+    return app
+
+
+async def measure(app: FastAPI, method: str, path: str) -> float:
+    """Mean microseconds per request through an in-process ASGI transport"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(50):
+            await client.request(method, path)
+
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            await client.request(method, path)
+        return (time.perf_counter() - start) / REQUESTS * 1_000_000
+
+
+async def bench():
+    variants = {
+        "no middleware": build_app(),
+        "BaseHTTPMiddleware (before)": build_app(LegacyRequestMetricsMiddleware, LegacyTokenTrackingMiddleware),
+        "pure ASGI (after)": build_app(RequestMetricsMiddleware, TokenTrackingMiddleware),
+    }
+
+    for method, path in [("POST", "/chat"), ("GET", "/stream")]:
+        print(f"\n{method} {path} ({REQUESTS} requests)")
+        baseline = None
+        for name, app in variants.items():
+            us = await measure(app, method, path)
+            baseline = us if baseline is None else baseline
+            print(f"  {name:<30} {us:8.1f} us/req   overhead {us - baseline:+8.1f} us")
+
+    # Queued rows are never flushed here; the queue just fills and drops
+    print(f"\nMetrics buffer: {metrics_buffer.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(bench())
@@ -0,0 +1,97 @@
+"""
+Cost of IncidentAgent and SlackAgent runs with and without prompt caching of
+their system prompts, using the local fake Anthropic server
+(app/scripts/fake_anthropic.py) started in-process, which reports cache
+reads and writes like the Messages API.
+
+Both modes cost the same while the agents' system prompts stay below
+PROMPT_CACHE_MIN_TOKENS: prompts that short aren't marked for caching, as
+the API wouldn't cache them.
+
+Run from the backend directory:
+    python -m app.scripts.bench_prompt_cache
+"""
+
+import sys
+import os
+import asyncio
+import time
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import uvicorn
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.agents import get_agent
+from app.core.config import settings
+from app.core.database import Base
+from app.scripts.bench_fused import INPUTS
+from app.scripts.fake_anthropic import create_app
+from app.services.llm import llm_pool
+
+PORT = 8792
+LATENCY_MS = 200.0
+MS_PER_1K_INPUT_TOKENS = 100.0
+RUNS = 10
+
+
+async def run_mode(Session, agent_id: str, prompt_cache: bool) -> dict:
+    settings.PROMPT_CACHE_ENABLED = prompt_cache
+    agent = get_agent(agent_id)
+    totals = {"input_tokens": 0, "cache_read_tokens": 0, "cache_write_tokens": 0, "cost_usd": 0.0}
+    durations = []
+    for _ in range(RUNS):
+        db = Session()
+        try:
+            start = time.perf_counter()
+            result = await agent.run(INPUTS[agent_id], None, db)
+            durations.append((time.perf_counter() - start) * 1000)
+        finally:
+            db.close()
+        for key in totals:
+            totals[key] += result["usage"][key]
+    return {
+        "avg_ms": sum(durations) / len(durations),
+        **{key: value / RUNS for key, value in totals.items()},
+    }
+
+
+async def main():
+    fake = create_app(LATENCY_MS, MS_PER_1K_INPUT_TOKENS)
+    server = uvicorn.Server(uvicorn.Config(fake, host="127.0.0.1", port=PORT, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    print(f"{RUNS} runs per mode, {LATENCY_MS:g} ms + {MS_PER_1K_INPUT_TOKENS:g} ms per 1k uncached prompt "
+          f"tokens simulated model latency")
+    for agent_id in INPUTS:
+        # Warm up the graph and the pooled connections
+        await run_mode(Session, agent_id, prompt_cache=False)
+        uncached = await run_mode(Session, agent_id, prompt_cache=False)
+        cached = await run_mode(Session, agent_id, prompt_cache=True)
+        print(f"\n{agent_id}")
+        for name, stats in (("uncached", uncached), ("cached", cached)):
+            print(f"  {name:<9} {stats['avg_ms']:7.1f} ms/run  {stats['input_tokens']:6.0f} input tokens  "
+                  f"{stats['cache_read_tokens']:6.0f} read  {stats['cache_write_tokens']:4.0f} written  "
+                  f"${stats['cost_usd']:.6f}/run")
+        print(f"  prompt cache: cost {cached['cost_usd'] / uncached['cost_usd'] - 1:+.0%}, "
+              f"latency {cached['avg_ms'] / uncached['avg_ms'] - 1:+.0%}")
+
+    await llm_pool.aclose()
+    server.should_exit = True
+    await server_task
+
+
+if __name__ == "__main__":
+    settings.ANTHROPIC_API_KEY = "fake"
+    settings.ANTHROPIC_BASE_URL = f"http://127.0.0.1:{PORT}"
+    settings.LLM_CACHE_ENABLED = False
+    asyncio.run(main())
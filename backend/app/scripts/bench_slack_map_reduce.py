@@ -0,0 +1,106 @@
+"""
+Benchmark of SlackAgent on transcripts of growing length, single pass against
+map-reduce, using the local fake Anthropic server
+(app/scripts/fake_anthropic.py) started in-process with latency that grows
+with the prompt length.
+
+Run from the backend directory:
+    python -m app.scripts.bench_slack_map_reduce
+"""
+
+import sys
+import os
+import asyncio
+import random
+import time
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import uvicorn
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.agents import get_agent
+from app.core.config import settings
+from app.core.database import Base
+from app.scripts.fake_anthropic import create_app
+from app.services.llm import estimate_tokens, llm_pool
+
+PORT = 8790
+LATENCY_MS = 200.0
+MS_PER_1K_INPUT_TOKENS = 100.0
+TRANSCRIPT_TOKENS = (2_000, 8_000, 16_000, 32_000)
+
+PEOPLE = ["alice", "bob", "carol", "dave"]
+LINES = [
+    "can we move the release to friday?",
+    "the migration script still fails on staging, looking into it",
+    "I'll update the runbook once the rollback is tested",
+    "agreed, let's keep the feature flag off until QA signs off",
+    "latency on the search endpoint is back under 200ms",
+    "who owns the on-call handover doc?",
+    "let's drop the legacy export, nobody uses it",
+    "I can pair with you on the flaky integration tests tomorrow",
+]
+
+
+def transcript(tokens: int) -> str:
+    rng = random.Random(tokens)
+    lines = []
+    while estimate_tokens("\n".join(lines)) < tokens:
+        lines.append(f"{rng.choice(PEOPLE)}: {rng.choice(LINES)}")
+    return "\n".join(lines)
+
+
+async def main():
+    fake = create_app(LATENCY_MS, MS_PER_1K_INPUT_TOKENS)
+    server = uvicorn.Server(uvicorn.Config(fake, host="127.0.0.1", port=PORT, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    agent = get_agent("slack")
+    threshold = settings.SLACK_MAP_REDUCE_THRESHOLD_TOKENS
+
+    # Warm up the graph and the pooled connections
+    db = Session()
+    try:
+        await agent.run(transcript(100), None, db)
+    finally:
+        db.close()
+
+    print(f"{LATENCY_MS:g} ms + {MS_PER_1K_INPUT_TOKENS:g} ms per 1k prompt tokens simulated model latency, "
+          f"segments of {settings.SLACK_SEGMENT_TOKENS} tokens, {settings.SLACK_MAP_CONCURRENCY} concurrent")
+    for tokens in TRANSCRIPT_TOKENS:
+        text = transcript(tokens)
+        line = f"  {tokens:>6} tokens"
+        # Before: the whole transcript in one summarize and one extract_actions call
+        for name, limit in (("single pass", 10 ** 9), ("map-reduce", threshold)):
+            settings.SLACK_MAP_REDUCE_THRESHOLD_TOKENS = limit
+            requests_before = fake.state.requests
+            db = Session()
+            try:
+                start = time.perf_counter()
+                await agent.run(text, None, db)
+                elapsed = (time.perf_counter() - start) * 1000
+            finally:
+                db.close()
+            line += f"   {name} {elapsed:7.1f} ms ({fake.state.requests - requests_before:2d} calls)"
+        print(line)
+    settings.SLACK_MAP_REDUCE_THRESHOLD_TOKENS = threshold
+
+    await llm_pool.aclose()
+    server.should_exit = True
+    await server_task
+
+
+if __name__ == "__main__":
+    settings.ANTHROPIC_API_KEY = "fake"
+    settings.ANTHROPIC_BASE_URL = f"http://127.0.0.1:{PORT}"
+    settings.LLM_CACHE_ENABLED = False
+    asyncio.run(main())
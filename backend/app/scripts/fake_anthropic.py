@@ -0,0 +1,215 @@
+"""
+Local fake of the Anthropic Messages API, for exercising the agents and the
+pooled LLM clients without network access or API costs.
+
+Replies are canned per agent prompt (so the agents' response parsing still
+works) and usage is estimated at ~4 characters per token. Streaming requests
+get the Messages API event stream, one text delta per word. Prompt caching
+is emulated: the prompt up to the last ``cache_control`` block is reported
+as cache_creation_input_tokens the first time it is seen and as
+cache_read_input_tokens after that, if it is at least MIN_CACHE_TOKENS
+long (the real API's minimum for Sonnet; shorter prefixes aren't cached).
+
+Run from the backend directory:
+    python -m app.scripts.fake_anthropic --port 8787 --latency-ms 200
+
+Then start the API against it:
+    ANTHROPIC_API_KEY=fake ANTHROPIC_BASE_URL=http://127.0.0.1:8787 uvicorn app.main:app
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+import json
+import re
+import uuid
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+CLASSIFY_REPLY = """SEVERITY: high
+CATEGORY: error
+ANALYSIS: The service could not reach a dependency and requests are failing."""
+
+ACTIONS_REPLY = """1. Check the health of the failing dependency
+2. Review recent deploys and configuration changes
+3. Increase connection timeouts while the root cause is investigated"""
+
+FUSED_INCIDENT_REPLY = CLASSIFY_REPLY + "\nACTIONS:\n" + ACTIONS_REPLY
+
+EXTRACT_REPLY = """ACTION ITEMS:
+- Update the documentation
+- Schedule the release
+
+KEY DECISIONS:
+- Ship on Friday"""
+
+SECTIONS_REPLY = """SUMMARY:
+The team discussed the upcoming release and agreed on a plan and owners.
+
+ACTION ITEMS:
+- Update the documentation
+- Schedule the release
+
+KEY DECISIONS:
+- Ship on Friday"""
+
+SUMMARY_REPLY = "The team discussed the upcoming release and agreed on a plan and owners."
+
+ANSWER_REPLY = "Based on the provided context, here is a concise answer to the question."
+
+# Shortest prompt-cache prefix the API caches
+MIN_CACHE_TOKENS = 1024
+
+
+def _text(content) -> str:
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") for block in content if isinstance(block, dict))
+
+
+def _cache_prefix(body: dict) -> str:
+    """The prompt text up to and including its last cache_control block, or ''"""
+    blocks = []
+    system = body.get("system")
+    if isinstance(system, list):
+        blocks += system
+    elif system:
+        blocks.append({"type": "text", "text": system})
+    for message in body.get("messages", []):
+        content = message.get("content", "")
+        blocks += content if isinstance(content, list) else [{"type": "text", "text": content}]
+    breakpoints = [i for i, block in enumerate(blocks) if isinstance(block, dict) and block.get("cache_control")]
+    last = breakpoints[-1] if breakpoints else -1
+    return _text(blocks[:last + 1])
+
+
+def _reply_for(system: str) -> str:
+    if "SUMMARY:" in system:
+        return SECTIONS_REPLY
+    if "ACTIONS:" in system:
+        return FUSED_INCIDENT_REPLY
+    if "Classify the log" in system:
+        return CLASSIFY_REPLY
+    if "remediation actions" in system:
+        return ACTIONS_REPLY
+    if "action items and decisions" in system:
+        return EXTRACT_REPLY
+    if "summarizing conversations" in system:
+        return SUMMARY_REPLY
+    return ANSWER_REPLY
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _stream_message(message: dict, reply: str, latency_ms: float):
+    """The Messages API streaming events for a reply, one text delta per word"""
+    usage = message.pop("usage")
+    # Like the Messages API, message_start has the input and cache tokens and
+    # an output count of 1; the final message_delta repeats the input and
+    # cache tokens along with the cumulative output tokens
+    yield _sse("message_start", {
+        "type": "message_start",
+        "message": {**message, "content": [], "stop_reason": None,
+                    "usage": {**usage, "output_tokens": 1}},
+    })
+    yield _sse("content_block_start", {
+        "type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""},
+    })
+    pieces = re.findall(r"\S+\s*|\s+", reply)
+    for piece in pieces:
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000 / len(pieces))
+        yield _sse("content_block_delta", {
+            "type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": piece},
+        })
+    yield _sse("content_block_stop", {"type": "content_block_stop", "index": 0})
+    yield _sse("message_delta", {
+        "type": "message_delta",
+        "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+        "usage": usage,
+    })
+    yield _sse("message_stop", {"type": "message_stop"})
+
+
+def create_app(latency_ms: float = 0.0, ms_per_1k_input_tokens: float = 0.0) -> FastAPI:
+    """
+    ``latency_ms`` is added to every call; ``ms_per_1k_input_tokens`` adds
+    latency that grows with the prompt, like a real model's prefill.
+    """
+    app = FastAPI(title="Fake Anthropic API")
+    app.state.requests = 0
+    # Prompt-cache prefixes seen, per model
+    app.state.prompt_cache = set()
+    # Client (host, port) pairs seen, i.e. TCP connections opened to us
+    app.state.connections = set()
+
+    @app.post("/v1/messages")
+    async def create_message(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        if request.client:
+            app.state.connections.add((request.client.host, request.client.port))
+        system = _text(body.get("system", ""))
+        prompt = system + "".join(_text(m.get("content", "")) for m in body.get("messages", []))
+        reply = _reply_for(system)
+        message = {
+            "id": f"msg_{uuid.uuid4().hex[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model"),
+            "content": [{"type": "text", "text": reply}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {
+                "input_tokens": _tokens(prompt),
+                "output_tokens": _tokens(reply),
+                "cache_creation_input_tokens": 0,
+                "cache_read_input_tokens": 0,
+            },
+        }
+        # Like the API, input_tokens excludes the cached prefix
+        prefix = _cache_prefix(body)
+        if prefix and _tokens(prefix) >= MIN_CACHE_TOKENS:
+            prefix_tokens = min(_tokens(prefix), message["usage"]["input_tokens"])
+            key = (body.get("model"), prefix)
+            field = "cache_read_input_tokens" if key in app.state.prompt_cache else "cache_creation_input_tokens"
+            app.state.prompt_cache.add(key)
+            message["usage"][field] = prefix_tokens
+            message["usage"]["input_tokens"] -= prefix_tokens
+
+        # Cache reads skip prefill
+        prefill_tokens = message["usage"]["input_tokens"] + message["usage"]["cache_creation_input_tokens"]
+        latency = latency_ms + ms_per_1k_input_tokens * prefill_tokens / 1000
+        if body.get("stream"):
+            # Latency is spread over the text deltas
+            return StreamingResponse(_stream_message(message, reply, latency), media_type="text/event-stream")
+        if latency:
+            await asyncio.sleep(latency / 1000)
+        return message
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local fake of the Anthropic Messages API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Simulated model latency per call")
+    parser.add_argument("--ms-per-1k-input-tokens", type=float, default=0.0,
+                        help="Simulated latency added per 1000 prompt tokens")
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(args.latency_ms, args.ms_per_1k_input_tokens), host=args.host, port=args.port)
@@ -0,0 +1,110 @@
+"""
+Bring a database created by an older version of the backend in line with
+the models. The app's startup only creates missing tables (create_all);
+columns added to existing tables since, and NOT NULL constraints the models
+dropped, need this script:
+
+- request_metrics / token_usage and each of their partitions get the
+  model's columns, constraints and indexes, so the UNION over them in
+  range reads stays aligned. SQLite can't alter constraints, so tables with
+  a NOT NULL column the model no longer has are rebuilt and their rows
+  copied over.
+- agent_runs and agent_jobs get the columns added since they were created.
+
+Run from the backend directory, with the API stopped, after upgrading:
+    python -m app.scripts.migrate_schema
+"""
+
+import sys
+import os
+from typing import List
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import Table, inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from app.core.database import engine
+from app.models import AgentJob, AgentRun
+from app.services import partitions
+
+
+def add_missing_columns(conn: Connection, table: Table) -> List[str]:
+    """Add the model's columns (and indexes) an existing table was created without"""
+    inspector = inspect(conn)
+    if not inspector.has_table(table.name):
+        return []
+    quote = conn.dialect.identifier_preparer.quote
+    columns = {column["name"] for column in inspector.get_columns(table.name)}
+    added = []
+    for column in table.columns:
+        if column.name not in columns:
+            conn.execute(text(
+                f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} "
+                f"{column.type.compile(conn.dialect)}"
+            ))
+            added.append(f"{table.name}.{column.name}")
+    for index in table.indexes:
+        conn.execute(CreateIndex(index, if_not_exists=True))
+    return added
+
+
+def relax_not_null(conn: Connection, table: Table) -> List[str]:
+    """Drop NOT NULL constraints the model no longer has"""
+    inspector = inspect(conn)
+    if not inspector.has_table(table.name):
+        return []
+    columns = {column["name"]: column for column in inspector.get_columns(table.name)}
+    relaxed = [
+        column.name for column in table.columns
+        if column.name in columns and column.nullable and not columns[column.name]["nullable"]
+    ]
+    if not relaxed:
+        return []
+    quote = conn.dialect.identifier_preparer.quote
+    if conn.dialect.name == "sqlite":
+        rebuild(conn, table, [name for name in columns if name in table.c])
+    else:
+        for name in relaxed:
+            conn.execute(text(f"ALTER TABLE {quote(table.name)} ALTER COLUMN {quote(name)} DROP NOT NULL"))
+    return [f"{table.name}.{name}" for name in relaxed]
+
+
+def rebuild(conn: Connection, table: Table, columns: List[str]):
+    """Recreate a table with the current schema, copying the given columns' rows over"""
+    quote = conn.dialect.identifier_preparer.quote
+    old_name = f"{table.name}__old"
+    conn.execute(text(f"ALTER TABLE {quote(table.name)} RENAME TO {quote(old_name)}"))
+    # Indexes follow the renamed table but keep their names
+    for index in inspect(conn).get_indexes(old_name):
+        conn.execute(text(f"DROP INDEX {quote(index['name'])}"))
+    conn.execute(CreateTable(table))
+    column_list = ", ".join(quote(name) for name in columns)
+    conn.execute(text(
+        f"INSERT INTO {quote(table.name)} ({column_list}) SELECT {column_list} FROM {quote(old_name)}"
+    ))
+    conn.execute(text(f"DROP TABLE {quote(old_name)}"))
+
+
+def migrate_schema() -> List[str]:
+    """Migrate every table in one transaction; returns what was changed"""
+    changes = []
+    with engine.begin() as conn:
+        for partitioned in (partitions.request_metrics, partitions.token_usage):
+            for table in partitioned.tables(conn):
+                # Relax first: a SQLite rebuild also adds the missing columns
+                changes += [f"relaxed {name}" for name in relax_not_null(conn, table)]
+                changes += [f"added {name}" for name in add_missing_columns(conn, table)]
+        for model in (AgentRun, AgentJob):
+            changes += [f"added {name}" for name in add_missing_columns(conn, model.__table__)]
+    return changes
+
+
+if __name__ == "__main__":
+    print("Migrating the database schema...")
+    changes = migrate_schema()
+    for change in changes:
+        print(f"  {change}")
+    print(f"{len(changes)} changes" if changes else "Schema is up to date")
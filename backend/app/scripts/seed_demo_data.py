@@ -10,14 +10,19 @@ import os
 import random
 from datetime import datetime, timezone, timedelta
 
+from sqlalchemy import func, select
+
 # Add backend directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from app.core.database import SessionLocal, engine, Base
 from app.models import (
     Conversation, Message, AgentRun, Workflow, WorkflowExecution,
-    RequestMetric, TokenUsage
+    RequestMetric, TokenUsage, RequestMetricRollup
 )
+from app.scripts.backfill_rollups import backfill_rollups
+from app.services import partitions
+from app.services.routes import to_raw_rows
 
 
 def seed_demo_data():
@@ -39,7 +44,11 @@ def seed_demo_data():
         db.query(Conversation).delete()
         db.query(Workflow).delete()
         db.query(RequestMetric).delete()
+        db.query(RequestMetricRollup).delete()
         db.query(TokenUsage).delete()
+        # Partitions are dropped whole rather than emptied row by row
+        partitions.request_metrics.drop_before(db.connection(), datetime.max)
+        partitions.token_usage.drop_before(db.connection(), datetime.max)
         db.commit()
 
         # Seed Workflows
@@ -186,16 +195,16 @@ def seed_demo_data():
                 # Create token usage record
                 input_tokens = random.randint(50, 200)
                 output_tokens = assistant_tokens
-                db.add(TokenUsage(
-                    model="claude-3-5-sonnet-20241022",
-                    input_tokens=input_tokens,
-                    output_tokens=output_tokens,
-                    total_tokens=input_tokens + output_tokens,
-                    cost_usd=(input_tokens * 0.000003) + (output_tokens * 0.000015),
-                    agent_run_id=agent_run.id,
-                    conversation_id=conv.id,
-                    timestamp=timestamp
-                ))
+                partitions.token_usage.insert(db.connection(), [{
+                    "model": "claude-3-5-sonnet-20241022",
+                    "input_tokens": input_tokens,
+                    "output_tokens": output_tokens,
+                    "total_tokens": input_tokens + output_tokens,
+                    "cost_usd": (input_tokens * 0.000003) + (output_tokens * 0.000015),
+                    "agent_run_id": agent_run.id,
+                    "conversation_id": conv.id,
+                    "timestamp": timestamp
+                }])
 
         db.commit()
 
@@ -209,6 +218,7 @@ def seed_demo_data():
             "/api/v1/knowledge/query",
         ]
 
+        metric_rows = []
         for days_ago in range(7, -1, -1):
             # Create 50-200 requests per day
             num_requests = random.randint(50, 200)
@@ -224,24 +234,35 @@ def seed_demo_data():
                 # 95% success rate for API requests
                 status_code = 200 if random.random() < 0.95 else random.choice([400, 404, 500])
 
-                db.add(RequestMetric(
-                    request_id=f"req-{random.randint(10000, 99999)}",
-                    path=random.choice(api_paths),
-                    method=random.choice(["GET", "POST"]),
-                    status_code=status_code,
-                    duration_ms=random.uniform(50, 500) if status_code == 200 else random.uniform(10, 100),
-                    timestamp=timestamp,
-                    user_agent="Mozilla/5.0 (AI Command Center Dashboard)"
-                ))
-
+                path = random.choice(api_paths)
+                metric_rows.append({
+                    "request_id": f"req-{random.randint(10000, 99999)}",
+                    "path": path,
+                    "route": path,  # the demo paths have no parameters
+                    "method": random.choice(["GET", "POST"]),
+                    "status_code": status_code,
+                    "duration_ms": random.uniform(50, 500) if status_code == 200 else random.uniform(10, 100),
+                    "timestamp": timestamp,
+                    "user_agent": "Mozilla/5.0 (AI Command Center Dashboard)"
+                })
+
+        partitions.request_metrics.insert(db.connection(), to_raw_rows(db.connection(), metric_rows))
         db.commit()
 
+        # Dashboards read request metrics from the rollup tables
+        print("  Building request metric rollups...")
+        backfill_rollups()
+
         # Print summary
         conv_count = db.query(Conversation).count()
         msg_count = db.query(Message).count()
         run_count = db.query(AgentRun).count()
-        metric_count = db.query(RequestMetric).count()
-        token_count = db.query(TokenUsage).count()
+        metric_count = db.execute(
+            select(func.count()).select_from(partitions.request_metrics.select_range(db.connection()))
+        ).scalar()
+        token_count = db.execute(
+            select(func.count()).select_from(partitions.token_usage.select_range(db.connection()))
+        ).scalar()
 
         print(f"\nDemo data seeded successfully!")
         print(f"  - Conversations: {conv_count}")
@@ -0,0 +1,171 @@
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.services import prometheus
+
+
+class AdmissionRejected(Exception):
+    """An agent run was shed: its agent's wait queue is full or the wait timed out"""
+
+    def __init__(self, agent_id: str, reason: str, retry_after: int):
+        super().__init__(f"{agent_id} is overloaded ({reason}), retry in {retry_after}s")
+        self.agent_id = agent_id
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AgentGate:
+    """Concurrency limit and bounded FIFO wait queue for one agent's runs"""
+
+    def __init__(self, agent_id: str, limit: int, max_queue: int, queue_timeout: float):
+        self.agent_id = agent_id
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+        self.wait_s_total = 0.0
+        self.wait_s_max = 0.0
+        self.runs = 0
+        self.run_s_total = 0.0
+
+    def _bind_loop(self):
+        # Semaphores belong to one event loop; start over on a new one (tests, scripts)
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.limit)
+            self.in_flight = 0
+            self.waiting = 0
+
+    def check(self):
+        """Raise AdmissionRejected, as acquire() would, if every slot is taken and the wait queue is full"""
+        self._bind_loop()
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self._shed("queue_full")
+
+    def retry_after(self) -> int:
+        """Seconds until a retry is likely to be admitted: the queue ahead drained at the average run time"""
+        avg_run_s = self.run_s_total / self.runs if self.runs else 1.0
+        return max(1, math.ceil(avg_run_s * (self.waiting + 1) / self.limit))
+
+    def _shed(self, reason: str):
+        if reason == "queue_full":
+            self.shed_queue_full += 1
+        else:
+            self.shed_timeout += 1
+        prometheus.admission_shed_total.inc(agent=self.agent_id, reason=reason)
+        raise AdmissionRejected(self.agent_id, reason, self.retry_after())
+
+    async def acquire(self) -> float:
+        """
+        Wait for a run slot, or raise AdmissionRejected at once if all slots
+        are taken and the queue is full. Returns the admission time, to pass
+        to release().
+        """
+        self._bind_loop()
+        start = time.perf_counter()
+        if not self._semaphore.locked():
+            # A slot is free: taken without suspending
+            await self._semaphore.acquire()
+        elif self.waiting >= self.max_queue:
+            self._shed("queue_full")
+        else:
+            self.waiting += 1
+            self._report()
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._shed("timeout")
+            finally:
+                self.waiting -= 1
+        admitted_at = time.perf_counter()
+        wait_s = admitted_at - start
+
+        self.admitted += 1
+        self.wait_s_total += wait_s
+        self.wait_s_max = max(self.wait_s_max, wait_s)
+        self.in_flight += 1
+        prometheus.admission_wait_seconds.observe(wait_s, agent=self.agent_id)
+        self._report()
+        return admitted_at
+
+    def release(self, admitted_at: float):
+        self.in_flight -= 1
+        self.runs += 1
+        self.run_s_total += time.perf_counter() - admitted_at
+        self._semaphore.release()
+        self._report()
+
+    def _report(self):
+        prometheus.admission_in_flight.set(self.in_flight, agent=self.agent_id)
+        prometheus.admission_queue_depth.set(self.waiting, agent=self.agent_id)
+
+    def stats(self) -> Dict:
+        return {
+            "limit": self.limit,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": self.waiting,
+            "admitted": self.admitted,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_timeout": self.shed_timeout,
+            "avg_wait_ms": self.wait_s_total / self.admitted * 1000 if self.admitted else 0.0,
+            "max_wait_ms": self.wait_s_max * 1000,
+            "avg_run_ms": self.run_s_total / self.runs * 1000 if self.runs else 0.0,
+        }
+
+
+class AdmissionController:
+    """
+    Per-agent admission control for agent runs started by the API.
+
+    Each agent gets a concurrency limit and a bounded wait queue. Requests
+    beyond both are shed immediately (HTTP 429 with Retry-After) instead of
+    piling up as LLM calls and database writers, and queued requests give up
+    after a timeout, so accepted work keeps a bounded latency under overload.
+    """
+
+    def __init__(self, default_limit: int, limits: Dict[str, int], max_queue: int, queue_timeout: float):
+        self.default_limit = default_limit
+        self.limits = limits
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._gates: Dict[str, AgentGate] = {}
+
+    def gate(self, agent_id: str) -> AgentGate:
+        gate = self._gates.get(agent_id)
+        if gate is None:
+            limit = self.limits.get(agent_id, self.default_limit)
+            gate = self._gates[agent_id] = AgentGate(agent_id, limit, self.max_queue, self.queue_timeout)
+        return gate
+
+    @asynccontextmanager
+    async def slot(self, agent_id: str):
+        """Hold a run slot for an agent for the duration of the block"""
+        gate = self.gate(agent_id)
+        admitted_at = await gate.acquire()
+        try:
+            yield
+        finally:
+            gate.release(admitted_at)
+
+    def stats(self) -> Dict:
+        return {"agents": {agent_id: gate.stats() for agent_id, gate in self._gates.items()}}
+
+
+admission = AdmissionController(
+    settings.ADMISSION_MAX_CONCURRENCY,
+    settings.admission_concurrency,
+    settings.ADMISSION_MAX_QUEUE,
+    settings.ADMISSION_QUEUE_TIMEOUT_S,
+)
@@ -0,0 +1,66 @@
+import threading
+import time
+from typing import Callable, Dict, Generic, Optional, TypeVar
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+
+class CachedValue(Generic[T]):
+    """
+    A single computed value cached for a short TTL.
+
+    Write paths call ``invalidate()``, which bumps a version number; a value
+    computed under an older version is recomputed on the next read even if
+    its TTL hasn't expired. The TTL bounds staleness for writes that don't
+    invalidate. A value being computed while an invalidation comes in is
+    stored under the old version, so the next read recomputes it again.
+    """
+
+    def __init__(self, ttl_s: float):
+        self.ttl_s = ttl_s
+        self._value: Optional[T] = None
+        self._value_version = -1
+        self._expires_at = 0.0
+        self._version = 0
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, compute: Callable[[], T]) -> T:
+        version = self._version
+        if self._value_version == version and time.monotonic() < self._expires_at:
+            self.hits += 1
+            return self._value
+
+        self.misses += 1
+        value = compute()
+        with self._lock:
+            self._value = value
+            self._value_version = version
+            self._expires_at = time.monotonic() + self.ttl_s
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+            self.invalidations += 1
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "ttl_s": self.ttl_s,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+# Dashboard overview, invalidated by chats and agent runs; request metric
+# flushes (which include the dashboard's own polling) only age out with the TTL
+overview_cache: CachedValue = CachedValue(settings.OVERVIEW_CACHE_TTL_S)
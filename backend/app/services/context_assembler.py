@@ -0,0 +1,178 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.services.llm import estimate_tokens
+
+SEPARATOR = "\n\n---\n\n"
+
+# Longest and shortest text shared by the end of one chunk and the start of
+# the next that counts as splitter overlap (chunk_document uses 50 characters)
+MAX_OVERLAP_CHARS = 400
+MIN_OVERLAP_CHARS = 16
+
+
+@dataclass
+class ContextBlock:
+    """Consecutive chunks of one source file, merged into one passage"""
+    source_file: str
+    first_index: int
+    last_index: int
+    text: str
+    # Vector distance of the best chunk in the block; lower is more relevant,
+    # None for chunks that didn't come from a similarity search
+    distance: Optional[float]
+    chunks: int = 1
+
+
+@dataclass
+class AssembledContext:
+    text: str
+    blocks: List[ContextBlock] = field(default_factory=list)
+    chunks_in: int = 0
+    merged: int = 0  # chunks folded into the chunk before them
+    duplicates: int = 0  # passages dropped as near-duplicates
+    dropped: int = 0  # passages left out for the token budget
+    truncated: bool = False
+    tokens_before: int = 0  # the chunks joined verbatim
+    tokens_after: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(self.tokens_before - self.tokens_after, 0)
+
+    def summary(self) -> Dict:
+        """Step metadata for the agent trace"""
+        return {
+            "chunks": self.chunks_in,
+            "passages": len(self.blocks),
+            "merged": self.merged,
+            "duplicates": self.duplicates,
+            "dropped": self.dropped,
+            "truncated": self.truncated,
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+def _overlap(left: str, right: str) -> int:
+    """Length of the longest end of ``left`` that ``right`` starts with"""
+    for size in range(min(len(left), len(right), MAX_OVERLAP_CHARS), MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _shingles(text: str) -> set:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < 3:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + 3]) for i in range(len(words) - 2)}
+
+
+def _similarity(left: set, right: set) -> float:
+    """Overlap coefficient: 1.0 when one passage's word trigrams all occur in the other"""
+    if not left or not right:
+        return 0.0
+    return len(left & right) / min(len(left), len(right))
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """Cut text to about ``max_tokens`` at a word boundary"""
+    limit = max_tokens * 4
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(" ", 0, limit)
+    return text[:cut if cut > limit // 2 else limit].rstrip() + " …"
+
+
+class ContextAssembler:
+    """
+    Builds the RAG prompt context from retrieved chunks.
+
+    Chunks of the same source file that are adjacent (consecutive
+    chunk_index) or overlap are merged into one passage, so the splitter's
+    overlap is sent once. Passages that repeat another one nearly word for
+    word are dropped. The rest are added most relevant first until the
+    token budget is spent; the most relevant passage is truncated rather
+    than left out if it alone exceeds the budget.
+    """
+
+    def __init__(self, token_budget: int, duplicate_threshold: float):
+        self.token_budget = token_budget
+        self.duplicate_threshold = duplicate_threshold
+
+    def _merge(self, chunks: List[Dict], result: AssembledContext) -> List[ContextBlock]:
+        by_source: Dict[str, List[Dict]] = {}
+        for chunk in chunks:
+            by_source.setdefault(chunk.get("source_file") or "unknown", []).append(chunk)
+
+        blocks = []
+        for source_file, source_chunks in by_source.items():
+            block = None
+            for chunk in sorted(source_chunks, key=lambda c: c.get("chunk_index") or 0):
+                index = chunk.get("chunk_index") or 0
+                text = chunk["content"].strip()
+                distance = chunk.get("similarity_score")
+                if block is not None and index <= block.last_index + 1:
+                    overlap = len(text) if text in block.text else _overlap(block.text, text)
+                    if overlap or index == block.last_index + 1:
+                        if overlap < len(text):
+                            block.text += text[overlap:] if overlap else "\n" + text
+                        block.last_index = max(block.last_index, index)
+                        block.chunks += 1
+                        if distance is not None and (block.distance is None or distance < block.distance):
+                            block.distance = distance
+                        result.merged += 1
+                        continue
+                block = ContextBlock(source_file, index, index, text, distance)
+                blocks.append(block)
+        return blocks
+
+    def assemble(self, chunks: List[Dict]) -> AssembledContext:
+        """
+        Assemble chunks (dicts with content, source_file, chunk_index and
+        similarity_score, as returned by vector_store.query_collection)
+        """
+        result = AssembledContext(
+            text="",
+            chunks_in=len(chunks),
+            tokens_before=estimate_tokens(SEPARATOR.join(chunk["content"] for chunk in chunks)),
+        )
+        blocks = self._merge(chunks, result)
+        # Most relevant first; chunks without a distance keep retrieval order behind them
+        blocks.sort(key=lambda b: (b.distance is None, b.distance or 0.0))
+
+        kept: List[ContextBlock] = []
+        kept_shingles: List[set] = []
+        for block in blocks:
+            shingles = _shingles(block.text)
+            if any(_similarity(shingles, other) >= self.duplicate_threshold for other in kept_shingles):
+                result.duplicates += 1
+                continue
+            kept.append(block)
+            kept_shingles.append(shingles)
+
+        used = 0
+        separator_tokens = estimate_tokens(SEPARATOR)
+        for block in kept:
+            cost = estimate_tokens(block.text) + (separator_tokens if result.blocks else 0)
+            if used + cost <= self.token_budget:
+                result.blocks.append(block)
+                used += cost
+            elif not result.blocks:
+                block.text = _truncate(block.text, self.token_budget)
+                result.blocks.append(block)
+                result.truncated = True
+                used += estimate_tokens(block.text)
+            else:
+                result.dropped += 1
+
+        result.text = SEPARATOR.join(block.text for block in result.blocks)
+        result.tokens_after = estimate_tokens(result.text)
+        return result
+
+
+context_assembler = ContextAssembler(settings.DOC_CONTEXT_TOKEN_BUDGET, settings.DOC_CONTEXT_DUPLICATE_THRESHOLD)
@@ -6,6 +6,7 @@ from sqlalchemy.orm import Session
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from app.models import KnowledgeChunk, KnowledgeCollection
 from app.services import vector_store
+from app.services.semantic_cache import semantic_cache
 
 
 def load_document(file_path: str) -> str:
@@ -95,6 +96,8 @@ def process_and_store(file_path: str, collection_name: str, db: Session) -> int:
     
     # 5. Add to Vector Store
     vector_store.add_documents(collection_name, documents, metadatas, ids)
+    # Cached answers may be out of date now
+    semantic_cache.invalidate(collection_name)
     
     # 6. Add to Database
     db.add_all(chunk_objs)
@@ -0,0 +1,60 @@
+import hashlib
+import re
+
+# Numbers kept as they are: HTTP statuses, exit codes and error codes tell
+# otherwise identical lines apart ("HTTP 500" vs "HTTP 401")
+_CODE_BEFORE = re.compile(
+    r"(?:\bstatus(?: code)?|\bhttp(?:/[\d.]+)?|\bcode|\bexit(?: code| status)?|\berrno|\berr(?:or)?)[ =:\"'#(]*$",
+    re.IGNORECASE
+)
+_CODE_AFTER = re.compile(
+    r"\s+(?:Bad Request|Unauthorized|Forbidden|Not Found|Conflict|Too Many Requests|Internal Server Error"
+    r"|Bad Gateway|Service Unavailable|Gateway Timeout)\b",
+    re.IGNORECASE
+)
+
+
+def _is_code(match: re.Match) -> bool:
+    if "." in match.group() or len(match.group()) > 5:
+        return False
+    text = match.string
+    return bool(
+        _CODE_BEFORE.search(text, max(0, match.start() - 20), match.start())
+        or _CODE_AFTER.match(text, match.end())
+    )
+
+
+# Variable parts of log lines, replaced in this order (timestamps before the
+# numbers inside them, hex ids before plain numbers)
+_PATTERNS = [
+    # 2024-01-15T10:30:00.123Z, 2024-01-15 10:30:00,123, 2024/01/15
+    (re.compile(r"\d{4}[-/]\d{2}[-/]\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2})?(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?)?"), "<ts>"),
+    # Jan 15 10:30:00 (syslog)
+    (re.compile(r"\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+\d{1,2}\s+\d{2}:\d{2}:\d{2}\b"), "<ts>"),
+    # 10:30:00.123
+    (re.compile(r"\b\d{2}:\d{2}:\d{2}(?:[.,]\d+)?\b"), "<ts>"),
+    (re.compile(r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b"), "<id>"),
+    (re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b"), "<ip>"),
+    (re.compile(r"\b[0-9a-fA-F]{1,4}(?::[0-9a-fA-F]{0,4}){2,7}\b"), "<ip>"),
+    (re.compile(r"\b0x[0-9a-fA-F]+\b"), "<hex>"),
+    # Hashes, trace ids, container ids: long hex runs with at least one digit
+    (re.compile(r"\b(?=[0-9a-fA-F]*\d)[0-9a-fA-F]{8,}\b"), "<id>"),
+    (re.compile(r"\d+(?:\.\d+)?"), lambda m: m.group() if _is_code(m) else "<n>"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+def normalize_log(snippet: str) -> str:
+    """
+    Log snippet with timestamps, ids, IPs and numbers replaced by
+    placeholders; status, exit and error codes are kept
+    """
+    text = snippet.strip()
+    for pattern, placeholder in _PATTERNS:
+        text = pattern.sub(placeholder, text)
+    return text.lower()
+
+
+def fingerprint(snippet: str) -> str:
+    """Stable fingerprint of a log snippet; snippets differing only in variable parts share it"""
+    return hashlib.sha1(normalize_log(snippet).encode()).hexdigest()[:16]
@@ -0,0 +1,215 @@
+import json
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from app.core.config import settings
+
+
+@dataclass
+class Rule:
+    name: str
+    patterns: List[str]
+    severity: str
+    category: str
+    confidence: float
+    # Templated remediation; "{match}" is replaced by the matched text
+    actions: List[str] = field(default_factory=list)
+
+
+@dataclass
+class RuleMatch:
+    rule: Rule
+    confidence: float
+    matched_text: str
+    matched_rules: List[str]
+
+    @property
+    def actions(self) -> List[str]:
+        return [action.replace("{match}", self.matched_text) for action in self.rule.actions]
+
+
+DEFAULT_RULES = [
+    Rule(
+        "out_of_memory",
+        [r"out of memory", r"\bOOM(?:Killed)?\b", r"java\.lang\.OutOfMemoryError", r"cannot allocate memory"],
+        "critical", "error", 0.95,
+        [
+            "Identify the process that ran out of memory ({match}) and check its memory limits",
+            "Look for memory leaks or unbounded caches in recent changes",
+            "Raise the memory limit or scale out while investigating",
+        ],
+    ),
+    Rule(
+        "crash",
+        [r"segmentation fault", r"\bSIGSEGV\b", r"\bpanic:", r"core dumped", r"fatal error"],
+        "critical", "error", 0.9,
+        [
+            "Collect the core dump or panic stack trace",
+            "Check whether a recent deploy introduced the crash and roll back if so",
+            "Restart the affected service and watch for repeat crashes",
+        ],
+    ),
+    Rule(
+        "disk_full",
+        [r"no space left on device", r"disk (?:usage|full).{0,30}?\b(?:9\d|100)\s*%", r"\bENOSPC\b"],
+        "critical", "performance", 0.95,
+        [
+            "Free space on the affected volume (logs, temp files, old artifacts)",
+            "Find what is filling the disk and add rotation or retention",
+            "Expand the volume or add disk usage alerting below 90%",
+        ],
+    ),
+    Rule(
+        "database_connection",
+        [
+            r"(?:connection|connect) (?:refused|reset|timed? ?out)\b.{0,40}"
+            r"(?:database|postgres|mysql|redis|:5432|:3306|:6379)",
+            r"(?:database|postgres|mysql|redis|db)\b.{0,40}(?:connection (?:refused|reset|timed? ?out)|connection timeout)",
+            r"too many connections", r"connection pool exhausted",
+        ],
+        "high", "error", 0.9,
+        [
+            "Check that the database is up and accepting connections",
+            "Check connection pool usage and the database's max_connections",
+            "Look for long-running queries or locks holding connections",
+            "Verify network connectivity and security groups between the service and the database",
+        ],
+    ),
+    Rule(
+        "server_error",
+        [
+            r"\b(?:status|HTTP|code)[ =:]*5\d\d\b",
+            r"\b5\d\d (?:Internal Server Error|Bad Gateway|Service Unavailable|Gateway Timeout)",
+        ],
+        "high", "error", 0.85,
+        [
+            "Find the failing endpoint and its error rate in the request metrics",
+            "Check application logs for the stack traces behind the 5xx responses",
+            "Check the health of upstream dependencies",
+        ],
+    ),
+    Rule(
+        "auth_failure",
+        [
+            r"(?:authentication|login|auth) failed", r"failed (?:login|password)", r"invalid (?:credentials|token|password)",
+            r"\bunauthorized\b", r"permission denied", r"brute.?force",
+            # Only as HTTP statuses, not any 401 or 403 in a log line
+            r'\b(?:status|HTTP(?:/[\d.]+)?|code)[ =:"]*40[13]\b', r"\b40[13] (?:Unauthorized|Forbidden)\b",
+        ],
+        "high", "security", 0.85,
+        [
+            "Review access logs for the source of the failed attempts",
+            "Block or rate-limit offending IPs if the attempts are abusive",
+            "Verify credentials and tokens have not been leaked or expired",
+        ],
+    ),
+    Rule(
+        "certificate",
+        [r"certificate (?:has )?expired", r"ssl(?:error)?\b.{0,40}(?:handshake|verify|certificate)", r"x509"],
+        "high", "security", 0.9,
+        [
+            "Check the certificate's expiry date and chain",
+            "Renew or redeploy the certificate",
+            "Add expiry monitoring for certificates",
+        ],
+    ),
+    Rule(
+        "slow",
+        [r"slow (?:query|request|response)", r"took \d+(?:\.\d+)?\s*(?:ms|s)\b"],
+        "medium", "performance", 0.85,
+        [
+            "Check CPU, memory and I/O on the affected hosts",
+            "Review slow queries and missing indexes",
+            "Check latency of downstream dependencies",
+        ],
+    ),
+    Rule(
+        "timeout",
+        [r"latency", r"\btimed? ?out\b", r"timeout"],
+        "medium", "performance", 0.7,
+    ),
+    Rule(
+        "deprecation",
+        [r"deprecat(?:ed|ion)"],
+        "low", "warning", 0.9,
+        [
+            "Find the deprecated usage and plan its replacement",
+            "Track the removal date of the deprecated feature",
+        ],
+    ),
+    Rule(
+        "warning",
+        [r"\bWARN(?:ING)?\b"],
+        "medium", "warning", 0.6,
+    ),
+    Rule(
+        "error",
+        [r"\bERROR\b", r"\bexception\b", r"\bfailed\b", r"\bCRITICAL\b", r"\bFATAL\b", r"traceback"],
+        "high", "error", 0.55,
+    ),
+    Rule(
+        "info",
+        # INFO/DEBUG level lines that mention no failure
+        [r"^(?!.*\b(?:error|exception|fail(?:ed|ure)?|fatal|critical|timeout)\b)\s*(?:\S+\s+){0,3}(?:INFO|DEBUG)\b"],
+        "low", "info", 0.9,
+        ["No immediate action required", "Log for reference"],
+    ),
+]
+
+
+class RuleClassifier:
+    """
+    Tiered pre-classifier for IncidentAgent.
+
+    All rules' patterns are compiled into one alternation, so a log no rule
+    matches (the common case) is rejected in a single scan. A log that does
+    match is then searched with each rule's own pattern: the alternation
+    stops at the first alternative matching at a position, which would hide
+    overlapping matches of the other rules. The best-scoring matching rule
+    wins. If another matching rule close to it in confidence disagrees on
+    the category, the log is ambiguous and the confidence is lowered, which
+    sends it to the LLM.
+    """
+
+    AMBIGUITY_MARGIN = 0.3
+    AMBIGUITY_PENALTY = 0.2
+
+    def __init__(self, rules: List[Rule]):
+        self.rules = rules
+        flags = re.IGNORECASE | re.MULTILINE
+        self._patterns = [
+            re.compile("|".join(f"(?:{p})" for p in rule.patterns), flags) for rule in rules
+        ]
+        self._pattern = re.compile("|".join(f"(?:{p.pattern})" for p in self._patterns), flags)
+
+    def classify(self, text: str) -> Optional[RuleMatch]:
+        """The best matching rule, or None if no rule matches"""
+        if not self._pattern.search(text):
+            return None
+        matched: List[Tuple[Rule, str]] = []
+        for rule, pattern in zip(self.rules, self._patterns):
+            m = pattern.search(text)
+            if m:
+                matched.append((rule, m.group()))
+
+        rules = sorted(matched, key=lambda r: -r[0].confidence)
+        best, best_text = rules[0]
+        confidence = best.confidence
+        if any(
+            rule.category != best.category and best.confidence - rule.confidence < self.AMBIGUITY_MARGIN
+            for rule, _ in rules[1:]
+        ):
+            confidence -= self.AMBIGUITY_PENALTY
+        return RuleMatch(best, round(confidence, 3), best_text, [rule.name for rule, _ in rules])
+
+
+def load_rules(path: str) -> List[Rule]:
+    """Rules from a JSON file (a list of Rule fields), or the defaults if no path is set"""
+    if not path:
+        return DEFAULT_RULES
+    with open(path) as f:
+        return [Rule(**rule) for rule in json.load(f)]
+
+
+rule_classifier = RuleClassifier(load_rules(settings.INCIDENT_RULES_PATH))
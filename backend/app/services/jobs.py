@@ -0,0 +1,342 @@
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import AgentJob
+from app.services import prometheus, tracing
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    # SQLite hands back naive datetimes
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def job_payload(job: AgentJob) -> Dict:
+    """A job's public fields, as returned by GET /chat/jobs/{id} and POSTed to its callback URL"""
+    created_at, started_at, finished_at = _utc(job.created_at), _utc(job.started_at), _utc(job.finished_at)
+    return {
+        "id": job.id,
+        "agent_id": job.agent_id,
+        "status": job.status,
+        "conversation_id": job.conversation_id,
+        "attempts": job.attempts,
+        "result": job.result,
+        "error": job.error,
+        "callback_url": job.callback_url,
+        "callback_status": job.callback_status,
+        "created_at": created_at,
+        "started_at": started_at,
+        "finished_at": finished_at,
+        "queue_ms": int((started_at - created_at).total_seconds() * 1000) if started_at else None,
+        "run_ms": int((finished_at - started_at).total_seconds() * 1000) if finished_at and started_at else None,
+    }
+
+
+def check_callback_url(url: str) -> Optional[str]:
+    """
+    Why a job may not POST to ``url``, or None if it may. Only http(s) URLs
+    on CHAT_JOB_CALLBACK_HOSTS are used, so callbacks can't be pointed at
+    internal services.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return "callback_url must be an http or https URL"
+    host = parts.hostname.lower()
+    for allowed in settings.chat_job_callback_hosts:
+        if host == allowed or (allowed.startswith("*.") and host.endswith(allowed[1:])):
+            return None
+    return f"callback_url host {host} is not an allowed callback host"
+
+
+class JobRunner:
+    """
+    In-process worker pool for queued agent runs (POST /chat/jobs).
+
+    Jobs are rows in the agent_jobs table, so they survive restarts: on
+    start, jobs still queued are queued again and jobs a shutdown
+    interrupted mid-run are retried, up to CHAT_JOB_MAX_ATTEMPTS runs; a
+    retry continues the conversation and user message of the first run.
+    Workers take job ids from an asyncio queue and run them through the
+    handler given to start(). Results can be polled, followed through
+    subscribe(), or pushed to the job's callback URL.
+    """
+
+    def __init__(self, workers: int, max_attempts: int, callback_timeout: float, callback_retries: int):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.callback_timeout = callback_timeout
+        self.callback_retries = callback_retries
+        self._handler: Optional[Callable[[Dict], Awaitable[Dict]]] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._callbacks: Set[asyncio.Task] = set()
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._started_at: Optional[float] = None
+        self.busy = 0
+        self.busy_s_total = 0.0
+        self.recovered = 0
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.queue_s_total = 0.0
+        self.run_s_total = 0.0
+        self.callbacks_delivered = 0
+        self.callbacks_failed = 0
+
+    def start(self, handler: Callable[[Dict], Awaitable[Dict]]):
+        """Start the workers; ``handler`` runs a job (its fields as a dict) and returns its result"""
+        if self._tasks:
+            return
+        self._handler = handler
+        self._queue = asyncio.Queue()
+        self._started_at = time.perf_counter()
+        for job_id in self._recover():
+            self._queue.put_nowait(job_id)
+        self._report()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Stop the workers; jobs they were running stay 'running' and are retried on the next start"""
+        tasks = self._tasks + list(self._callbacks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._callbacks.clear()
+
+    def _recover(self) -> List[str]:
+        """Ids of the jobs to queue again after a restart, oldest first"""
+        db = SessionLocal()
+        try:
+            jobs = db.query(AgentJob).filter(
+                AgentJob.status.in_(["queued", "running"])
+            ).order_by(AgentJob.created_at).all()
+            job_ids = []
+            for job in jobs:
+                if job.status == "running" and job.attempts >= self.max_attempts:
+                    job.status = "failed"
+                    job.error = f"Interrupted by restarts {job.attempts} times"
+                    job.finished_at = datetime.now(timezone.utc)
+                    continue
+                job.status = "queued"
+                job_ids.append(job.id)
+            db.commit()
+            self.recovered += len(job_ids)
+            return job_ids
+        finally:
+            db.close()
+
+    def submit(
+        self,
+        agent_id: str,
+        message: str,
+        conversation_id: Optional[str] = None,
+        fused: Optional[bool] = None,
+        callback_url: Optional[str] = None
+    ) -> AgentJob:
+        """Store a job and queue it; its run continues the current trace"""
+        if self._queue is None:
+            raise RuntimeError("Job runner is not started")
+        db = SessionLocal()
+        try:
+            job = AgentJob(
+                agent_id=agent_id,
+                message=message,
+                conversation_id=conversation_id,
+                fused=fused,
+                callback_url=callback_url,
+                traceparent=tracing.current_traceparent(),
+                status="queued"
+            )
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+            db.expunge(job)
+        finally:
+            db.close()
+        self._queue.put_nowait(job.id)
+        self._report()
+        return job
+
+    def get(self, job_id: str) -> Optional[AgentJob]:
+        db = SessionLocal()
+        try:
+            job = db.get(AgentJob, job_id)
+            if job is not None:
+                db.expunge(job)
+            return job
+        finally:
+            db.close()
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        """A queue receiving the job's status changes ('running', then 'completed' or 'failed')"""
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(job_id)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[job_id]
+
+    def _publish(self, job_id: str, status: str):
+        for queue in self._subscribers.get(job_id, ()):
+            queue.put_nowait(status)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            self._report()
+            try:
+                await self._execute(job_id)
+            except Exception as e:
+                print(f"Agent job {job_id} error: {e}")
+
+    async def _execute(self, job_id: str):
+        db = SessionLocal()
+        try:
+            job = db.get(AgentJob, job_id)
+            if job is None or job.status != "queued":
+                return
+            job.status = "running"
+            job.attempts += 1
+            job.started_at = datetime.now(timezone.utc)
+            db.commit()
+            fields = {
+                "id": job.id,
+                "agent_id": job.agent_id,
+                "message": job.message,
+                "conversation_id": job.conversation_id,
+                "fused": job.fused,
+                "traceparent": job.traceparent,
+            }
+            queue_s = (_utc(job.started_at) - _utc(job.created_at)).total_seconds()
+        finally:
+            db.close()
+
+        self._publish(job_id, "running")
+        prometheus.agent_job_queue_seconds.observe(queue_s, agent=fields["agent_id"])
+        self.started += 1
+        self.queue_s_total += queue_s
+        self.busy += 1
+        self._report()
+        start = time.perf_counter()
+        try:
+            result = await self._handler(fields)
+            update = {"status": "completed", "result": result, "error": None}
+        except Exception as e:
+            update = {"status": "failed", "result": None, "error": str(e)}
+        finally:
+            run_s = time.perf_counter() - start
+            self.busy -= 1
+            self.busy_s_total += run_s
+            self.run_s_total += run_s
+            self._report()
+
+        db = SessionLocal()
+        try:
+            job = db.get(AgentJob, job_id)
+            for key, value in update.items():
+                setattr(job, key, value)
+            if update["result"]:
+                job.conversation_id = update["result"].get("conversation_id")
+            job.finished_at = datetime.now(timezone.utc)
+            db.commit()
+            latency_s = (_utc(job.finished_at) - _utc(job.created_at)).total_seconds()
+            callback_url = job.callback_url
+        finally:
+            db.close()
+
+        if update["status"] == "completed":
+            self.completed += 1
+        else:
+            self.failed += 1
+        prometheus.agent_jobs_total.inc(agent=fields["agent_id"], status=update["status"])
+        prometheus.agent_job_latency_seconds.observe(latency_s, agent=fields["agent_id"])
+        self._publish(job_id, update["status"])
+
+        if callback_url:
+            task = asyncio.create_task(self._deliver(job_id, callback_url))
+            self._callbacks.add(task)
+            task.add_done_callback(self._callbacks.discard)
+
+    async def _deliver(self, job_id: str, callback_url: str):
+        """POST the finished job to its callback URL, retrying with backoff"""
+        payload = json.loads(json.dumps(job_payload(self.get(job_id)), default=str))
+        # Checked again in case the allowed hosts changed since the job was queued
+        status = check_callback_url(callback_url)
+        if status is None and self.callback_retries < 1:
+            # CHAT_JOB_CALLBACK_RETRIES=0 turns delivery off
+            status = "skipped"
+        async with httpx.AsyncClient(timeout=self.callback_timeout) as client:
+            for attempt in range(self.callback_retries if status is None else 0):
+                try:
+                    response = await client.post(callback_url, json=payload)
+                    if response.status_code < 400:
+                        status = "delivered"
+                        break
+                    status = f"HTTP {response.status_code}"
+                except httpx.HTTPError as e:
+                    status = f"{type(e).__name__}: {e}"[:255]
+                if attempt + 1 < self.callback_retries:
+                    await asyncio.sleep(2 ** attempt)
+
+        if status == "delivered":
+            self.callbacks_delivered += 1
+        elif status != "skipped":
+            self.callbacks_failed += 1
+            print(f"Agent job {job_id} callback to {callback_url} failed: {status}")
+        prometheus.agent_job_callbacks_total.inc(status=status if status in ("delivered", "skipped") else "failed")
+
+        db = SessionLocal()
+        try:
+            job = db.get(AgentJob, job_id)
+            job.callback_status = status
+            db.commit()
+        finally:
+            db.close()
+
+    def _report(self):
+        prometheus.agent_job_queue_depth.set(self._queue.qsize() if self._queue is not None else 0)
+        prometheus.agent_job_workers_busy.set(self.busy)
+        prometheus.agent_job_worker_utilization.set(self.busy / self.workers if self.workers else 0.0)
+
+    def stats(self) -> Dict:
+        finished = self.completed + self.failed
+        uptime_s = time.perf_counter() - self._started_at if self._started_at is not None else 0.0
+        return {
+            "workers": self.workers,
+            "busy": self.busy,
+            "utilization": self.busy / self.workers if self.workers else 0.0,
+            # Share of worker time spent running jobs since start
+            "avg_utilization": self.busy_s_total / (uptime_s * self.workers) if uptime_s and self.workers else 0.0,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "recovered": self.recovered,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_queue_ms": self.queue_s_total / self.started * 1000 if self.started else 0.0,
+            "avg_run_ms": self.run_s_total / finished * 1000 if finished else 0.0,
+            "callbacks_delivered": self.callbacks_delivered,
+            "callbacks_failed": self.callbacks_failed,
+        }
+
+
+job_runner = JobRunner(
+    settings.CHAT_JOB_WORKERS,
+    settings.CHAT_JOB_MAX_ATTEMPTS,
+    settings.CHAT_JOB_CALLBACK_TIMEOUT_S,
+    settings.CHAT_JOB_CALLBACK_RETRIES,
+)
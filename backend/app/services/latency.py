@@ -0,0 +1,194 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+
+
+class LatencyHistogram:
+    """
+    Log-bucketed histogram with a bounded relative error (DDSketch style).
+
+    A value v falls into bucket ceil(log_gamma(v)), so every quantile is
+    reported within ``relative_accuracy`` of the true value. Recording is
+    O(1) and two histograms with the same accuracy merge exactly by adding
+    bucket counts, which keeps quantiles correct across time windows and
+    across processes.
+    """
+
+    MIN_VALUE = 1e-3  # values below 1 microsecond (in ms) share the zero bucket
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, value: float, count: int = 1):
+        self.count += count
+        self.sum += value * count
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if value <= self.MIN_VALUE:
+            self.zero_count += count
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge histograms with different accuracy")
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q: float) -> float:
+        """Estimate the q-quantile (0 <= q <= 1)"""
+        if self.count == 0:
+            return 0.0
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+
+        seen = self.zero_count
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                # Midpoint of the bucket (gamma^(i-1), gamma^i] in relative terms
+                value = 2 * self._gamma ** index / (self._gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else 0.0,
+            "max": self.max,
+            "zero_count": self.zero_count,
+            "buckets": {str(k): v for k, v in self.buckets.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyHistogram":
+        hist = cls(data.get("relative_accuracy", 0.01))
+        hist.count = data.get("count", 0)
+        hist.sum = data.get("sum", 0.0)
+        hist.min = data.get("min", 0.0) if hist.count else math.inf
+        hist.max = data.get("max", 0.0)
+        hist.zero_count = data.get("zero_count", 0)
+        hist.buckets = {int(k): v for k, v in (data.get("buckets") or {}).items()}
+        return hist
+
+
+SeriesKey = Tuple[str, str]  # (route template, status class)
+
+
+def status_class(status_code: int) -> str:
+    return f"{status_code // 100}xx"
+
+
+class LatencyRegistry:
+    """
+    In-memory latency histograms per (route, status class), kept in
+    one-minute windows for the last ``retention_minutes``.
+
+    Queries merge the windows they cover, so nothing is read from the
+    request_metrics table.
+    """
+
+    def __init__(self, retention_minutes: int = 60, relative_accuracy: float = 0.01):
+        self.retention_minutes = retention_minutes
+        self.relative_accuracy = relative_accuracy
+        self._windows: "OrderedDict[int, Dict[SeriesKey, LatencyHistogram]]" = OrderedDict()
+
+    def record(self, route: str, status_code: int, duration_ms: float, now: Optional[float] = None):
+        minute = int((now if now is not None else time.time()) // 60)
+        window = self._windows.get(minute)
+        if window is None:
+            window = self._windows[minute] = {}
+            self._expire(minute)
+
+        key = (route, status_class(status_code))
+        hist = window.get(key)
+        if hist is None:
+            hist = window[key] = LatencyHistogram(self.relative_accuracy)
+        hist.record(duration_ms)
+
+    def _expire(self, current_minute: int):
+        while self._windows:
+            oldest = next(iter(self._windows))
+            if oldest > current_minute - self.retention_minutes:
+                break
+            del self._windows[oldest]
+
+    def merged(
+        self,
+        window_minutes: int,
+        route: Optional[str] = None,
+        status: Optional[str] = None,
+        now: Optional[float] = None
+    ) -> Dict[SeriesKey, LatencyHistogram]:
+        """Merge the last ``window_minutes`` windows into one histogram per series"""
+        current = int((now if now is not None else time.time()) // 60)
+        result: Dict[SeriesKey, LatencyHistogram] = {}
+        for minute, window in self._windows.items():
+            if minute <= current - window_minutes:
+                continue
+            for key, hist in window.items():
+                if route and key[0] != route:
+                    continue
+                if status and key[1] != status:
+                    continue
+                if key not in result:
+                    result[key] = LatencyHistogram(self.relative_accuracy)
+                result[key].merge(hist)
+        return result
+
+    def snapshot(self) -> List[dict]:
+        """Serializable per-minute histograms, for merging in another process"""
+        return [
+            {
+                "minute": minute * 60,
+                "route": key[0],
+                "status_class": key[1],
+                "histogram": hist.to_dict(),
+            }
+            for minute, window in self._windows.items()
+            for key, hist in window.items()
+        ]
+
+    def load(self, entries: Iterable[dict]):
+        """Merge a snapshot (e.g. from another worker) into this registry"""
+        for entry in entries:
+            minute = int(entry["minute"] // 60)
+            window = self._windows.setdefault(minute, {})
+            key = (entry["route"], entry["status_class"])
+            hist = LatencyHistogram.from_dict(entry["histogram"])
+            if key in window:
+                window[key].merge(hist)
+            else:
+                window[key] = hist
+        self._windows = OrderedDict(sorted(self._windows.items()))
+
+
+latency_registry = LatencyRegistry(
+    retention_minutes=settings.LATENCY_RETENTION_MINUTES,
+    relative_accuracy=settings.LATENCY_RELATIVE_ACCURACY,
+)
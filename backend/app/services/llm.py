@@ -0,0 +1,257 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import anthropic
+import httpx
+from langchain_anthropic import ChatAnthropic
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, SystemMessage
+
+from app.core.config import settings
+from app.services import prometheus, tracing
+
+DEFAULT_MODEL = "claude-3-5-sonnet-20241022"
+
+# Claude 3.5 Sonnet pricing
+COST_PER_INPUT_TOKEN = 3.0 / 1_000_000  # $3 per 1M input tokens
+COST_PER_OUTPUT_TOKEN = 15.0 / 1_000_000  # $15 per 1M output tokens
+# Prompt caching: writing a prefix to the cache costs 25% more than plain
+# input, reading it back 10% of the input price
+COST_PER_CACHE_WRITE_TOKEN = COST_PER_INPUT_TOKEN * 1.25
+COST_PER_CACHE_READ_TOKEN = COST_PER_INPUT_TOKEN * 0.1
+
+
+def estimate_cost(
+    input_tokens: int,
+    output_tokens: int,
+    cache_read_tokens: int = 0,
+    cache_write_tokens: int = 0
+) -> float:
+    """
+    Estimated USD cost of an LLM call. ``input_tokens`` is the whole prompt,
+    including the tokens read from or written to the prompt cache.
+    """
+    uncached_tokens = max(input_tokens - cache_read_tokens - cache_write_tokens, 0)
+    return (
+        uncached_tokens * COST_PER_INPUT_TOKEN
+        + cache_read_tokens * COST_PER_CACHE_READ_TOKEN
+        + cache_write_tokens * COST_PER_CACHE_WRITE_TOKEN
+        + output_tokens * COST_PER_OUTPUT_TOKEN
+    )
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)"""
+    return len(text) // 4
+
+
+def with_prompt_cache(messages: List[BaseMessage]) -> List[BaseMessage]:
+    """
+    Mark a leading system prompt as a prompt-cache breakpoint, so calls that
+    share it are billed for it at the cache read price. Anthropic only
+    caches prefixes above a model-specific minimum length, so a system
+    prompt estimated below PROMPT_CACHE_MIN_TOKENS is left unmarked.
+    """
+    if not messages or not isinstance(messages[0], SystemMessage) or not isinstance(messages[0].content, str):
+        return messages
+    if estimate_tokens(messages[0].content) < settings.PROMPT_CACHE_MIN_TOKENS:
+        return messages
+    system = SystemMessage(content=[
+        {"type": "text", "text": messages[0].content, "cache_control": {"type": "ephemeral"}}
+    ])
+    return [system, *messages[1:]]
+
+
+class ModelLimiter:
+    """Per-model concurrency cap with utilization and wait-time counters"""
+
+    def __init__(self, model: str, limit: int):
+        self.model = model
+        self.limit = limit
+        self.semaphore = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.waiting = 0
+        self.calls = 0
+        self.wait_s_total = 0.0
+        self.wait_s_max = 0.0
+
+    @asynccontextmanager
+    async def slot(self):
+        start = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        wait_s = time.perf_counter() - start
+
+        self.calls += 1
+        self.wait_s_total += wait_s
+        self.wait_s_max = max(self.wait_s_max, wait_s)
+        self.in_flight += 1
+        prometheus.llm_pool_wait_seconds.observe(wait_s, model=self.model)
+        tracing.annotate(pool_wait_ms=round(wait_s * 1000, 2))
+        self._report()
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.semaphore.release()
+            self._report()
+
+    def _report(self):
+        prometheus.llm_pool_in_flight.set(self.in_flight, model=self.model)
+        prometheus.llm_pool_utilization.set(self.in_flight / self.limit, model=self.model)
+
+    def stats(self) -> Dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "utilization": self.in_flight / self.limit,
+            "calls": self.calls,
+            "avg_wait_ms": self.wait_s_total / self.calls * 1000 if self.calls else 0.0,
+            "max_wait_ms": self.wait_s_max * 1000,
+        }
+
+
+class LLMPool:
+    """
+    Shared, pooled LLM clients for all agents.
+
+    ChatAnthropic builds a fresh Anthropic client (and httpx connection
+    pool) per instance, so constructing one per LLM call paid connection
+    setup and TLS on every step. Here one ChatAnthropic is kept per model
+    and parameters, and all of them send through a single keep-alive
+    httpx.AsyncClient with configurable pool limits. Calls are capped per
+    model by a semaphore so a burst of runs queues in-process instead of
+    exhausting the connection pool or the provider's rate limit.
+    """
+
+    def __init__(
+        self,
+        max_connections: int,
+        max_keepalive_connections: int,
+        keepalive_expiry: float,
+        max_concurrency_per_model: int,
+        timeout: float
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.max_concurrency_per_model = max_concurrency_per_model
+        self.timeout = timeout
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._models: Dict[Tuple, ChatAnthropic] = {}
+        self._limiters: Dict[str, ModelLimiter] = {}
+
+    def _bind_loop(self):
+        # httpx connections and asyncio semaphores belong to one event loop;
+        # start over if we're called from a different one (tests, scripts)
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._http_client = None
+            self._models.clear()
+            self._limiters.clear()
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._http_client is None:
+            self._http_client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+        return self._http_client
+
+    def get(self, model: str = DEFAULT_MODEL, **params) -> ChatAnthropic:
+        """The shared chat model for a model name and parameters (max_tokens, temperature, ...)"""
+        self._bind_loop()
+        key = (model, tuple(sorted(params.items())))
+        llm = self._models.get(key)
+        if llm is None:
+            kwargs = {"base_url": settings.ANTHROPIC_BASE_URL} if settings.ANTHROPIC_BASE_URL else {}
+            llm = ChatAnthropic(model=model, api_key=settings.ANTHROPIC_API_KEY, **kwargs, **params)
+            # Replace the per-instance client with one on the shared connection pool
+            llm._async_client = anthropic.AsyncAnthropic(
+                api_key=settings.ANTHROPIC_API_KEY,
+                base_url=llm.anthropic_api_url,
+                max_retries=llm.max_retries,
+                timeout=self.timeout,
+                default_headers=llm.default_headers or None,
+                http_client=self._client(),
+            )
+            self._models[key] = llm
+        return llm
+
+    def limiter(self, model: str) -> ModelLimiter:
+        self._bind_loop()
+        limiter = self._limiters.get(model)
+        if limiter is None:
+            limiter = self._limiters[model] = ModelLimiter(model, self.max_concurrency_per_model)
+        return limiter
+
+    async def ainvoke(self, messages: List[BaseMessage], model: str = DEFAULT_MODEL, **params) -> AIMessage:
+        """Invoke a model through the pool, waiting for a slot if the model is at its cap"""
+        llm = self.get(model, **params)
+        if settings.PROMPT_CACHE_ENABLED:
+            messages = with_prompt_cache(messages)
+        async with self.limiter(model).slot():
+            start = time.perf_counter()
+            try:
+                return await llm.ainvoke(messages)
+            finally:
+                prometheus.llm_request_duration_seconds.observe(time.perf_counter() - start, model=model)
+
+    async def astream(
+        self,
+        messages: List[BaseMessage],
+        model: str = DEFAULT_MODEL,
+        **params
+    ) -> AsyncIterator[AIMessageChunk]:
+        """
+        Stream a model's reply through the pool; the slot is held until the
+        stream ends. The time to the first token is recorded.
+        """
+        llm = self.get(model, **params)
+        if settings.PROMPT_CACHE_ENABLED:
+            messages = with_prompt_cache(messages)
+        async with self.limiter(model).slot():
+            start = time.perf_counter()
+            first_token = True
+            try:
+                async for chunk in llm.astream(messages):
+                    if first_token and chunk.content:
+                        first_token = False
+                        ttft_s = time.perf_counter() - start
+                        prometheus.llm_time_to_first_token_seconds.observe(ttft_s, model=model)
+                        tracing.annotate(ttft_ms=round(ttft_s * 1000, 2))
+                    yield chunk
+            finally:
+                prometheus.llm_request_duration_seconds.observe(time.perf_counter() - start, model=model)
+
+    def stats(self) -> Dict:
+        return {
+            "clients": len(self._models),
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "models": {model: limiter.stats() for model, limiter in self._limiters.items()},
+        }
+
+    async def aclose(self):
+        if self._http_client is not None:
+            await self._http_client.aclose()
+        self._http_client = None
+        self._loop = None
+        self._models.clear()
+        self._limiters.clear()
+
+
+llm_pool = LLMPool(
+    max_connections=settings.LLM_MAX_CONNECTIONS,
+    max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY_S,
+    max_concurrency_per_model=settings.LLM_MAX_CONCURRENCY_PER_MODEL,
+    timeout=settings.LLM_TIMEOUT_S,
+)
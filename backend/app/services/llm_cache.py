@@ -0,0 +1,226 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.engine import Connection
+
+from app.core.config import settings
+from app.core.database import engine
+from app.models import LLMCacheEntry
+
+
+@dataclass
+class CachedResponse:
+    content: str
+    input_tokens: int
+    output_tokens: int
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self.content.encode())
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class LLMResponseCache:
+    """
+    Exact-match cache of LLM replies, keyed by a hash of the model, the
+    messages (system prompt included) and call parameters such as max_tokens.
+
+    Lookups go to an in-memory LRU first, then to the llm_cache_entries
+    table, which survives restarts and is shared between processes. Entries
+    expire after ``ttl_s``; the table is kept under ``max_bytes`` of reply
+    text by evicting the least recently used entries. Database access runs
+    in a worker thread so it doesn't block the event loop.
+    """
+
+    # Least recently used entries deleted per eviction round
+    EVICTION_BATCH = 100
+
+    def __init__(self, memory_entries: int, ttl_s: float, max_bytes: int):
+        self.memory_entries = memory_entries
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+
+        self._memory: "OrderedDict[str, Tuple[CachedResponse, float]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._db_bytes: Optional[int] = None  # loaded on first write
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()  # serializes writes, which maintain _db_bytes
+
+        # Counters
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.bytes_served = 0
+
+    @staticmethod
+    def key(model: str, messages: List, **params) -> str:
+        payload = {
+            "model": model,
+            "messages": [[message.type, message.content] for message in messages],
+            "params": params,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    def enabled_for(self, agent_id: str) -> bool:
+        return settings.LLM_CACHE_ENABLED and agent_id not in settings.llm_cache_disabled_agents
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        response = self._get_memory(key)
+        if response is None:
+            found = await asyncio.to_thread(self._get_db, key)
+            if found is not None:
+                response, ttl_left_s = found
+                self._put_memory(key, response, time.monotonic() + ttl_left_s)
+        if response is None:
+            self.misses += 1
+        else:
+            self.bytes_served += response.size_bytes
+        return response
+
+    async def put(self, key: str, model: str, response: CachedResponse):
+        self._put_memory(key, response, time.monotonic() + self.ttl_s)
+        await asyncio.to_thread(self._put_db, key, model, response)
+        self.stores += 1
+
+    def _get_memory(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            response, expires_at = entry
+            if time.monotonic() >= expires_at:
+                self._pop_memory(key)
+                return None
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return response
+
+    def _put_memory(self, key: str, response: CachedResponse, expires_at: float):
+        with self._lock:
+            self._pop_memory(key)
+            self._memory[key] = (response, expires_at)
+            self._memory_bytes += response.size_bytes
+            while len(self._memory) > self.memory_entries:
+                self._pop_memory(next(iter(self._memory)))
+
+    def _pop_memory(self, key: str):
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= entry[0].size_bytes
+
+    def _get_db(self, key: str) -> Optional[Tuple[CachedResponse, float]]:
+        """The stored response and its remaining TTL in seconds"""
+        now = _utcnow()
+        with engine.begin() as conn:
+            row = conn.execute(
+                select(
+                    LLMCacheEntry.content, LLMCacheEntry.input_tokens,
+                    LLMCacheEntry.output_tokens, LLMCacheEntry.expires_at
+                )
+                .where(LLMCacheEntry.key == key, LLMCacheEntry.expires_at > now)
+            ).first()
+            if row is None:
+                return None
+            conn.execute(
+                update(LLMCacheEntry).where(LLMCacheEntry.key == key)
+                .values(hits=LLMCacheEntry.hits + 1, last_used_at=now)
+            )
+        self.db_hits += 1
+        response = CachedResponse(row.content, row.input_tokens, row.output_tokens)
+        return response, (row.expires_at - now).total_seconds()
+
+    def _put_db(self, key: str, model: str, response: CachedResponse):
+        now = _utcnow()
+        with self._db_lock, engine.begin() as conn:
+            if self._db_bytes is None:
+                self._db_bytes = self._total_bytes(conn)
+            old_size = conn.execute(
+                select(LLMCacheEntry.size_bytes).where(LLMCacheEntry.key == key)
+            ).scalar()
+            if old_size is not None:
+                conn.execute(delete(LLMCacheEntry).where(LLMCacheEntry.key == key))
+                self._db_bytes -= old_size
+            conn.execute(LLMCacheEntry.__table__.insert().values(
+                key=key,
+                model=model,
+                content=response.content,
+                input_tokens=response.input_tokens,
+                output_tokens=response.output_tokens,
+                size_bytes=response.size_bytes,
+                hits=0,
+                created_at=now,
+                last_used_at=now,
+                expires_at=now + timedelta(seconds=self.ttl_s),
+            ))
+            self._db_bytes += response.size_bytes
+            if self._db_bytes > self.max_bytes:
+                self._evict(conn, now)
+
+    def _total_bytes(self, conn: Connection) -> int:
+        return conn.execute(select(func.coalesce(func.sum(LLMCacheEntry.size_bytes), 0))).scalar()
+
+    def _evict(self, conn: Connection, now: datetime):
+        """Drop expired entries, then least recently used ones until under max_bytes"""
+        self.evictions += conn.execute(delete(LLMCacheEntry).where(LLMCacheEntry.expires_at <= now)).rowcount
+        self._db_bytes = self._total_bytes(conn)
+        while self._db_bytes > self.max_bytes:
+            oldest = conn.execute(
+                select(LLMCacheEntry.key, LLMCacheEntry.size_bytes)
+                .order_by(LLMCacheEntry.last_used_at).limit(self.EVICTION_BATCH)
+            ).all()
+            if not oldest:
+                break
+            # Only as many as needed to get back under the limit
+            keys = []
+            for row in oldest:
+                keys.append(row.key)
+                self._db_bytes -= row.size_bytes
+                if self._db_bytes <= self.max_bytes:
+                    break
+            conn.execute(delete(LLMCacheEntry).where(LLMCacheEntry.key.in_(keys)))
+            self.evictions += len(keys)
+
+    def clear(self):
+        """Empty both tiers"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        with self._db_lock, engine.begin() as conn:
+            conn.execute(delete(LLMCacheEntry))
+            self._db_bytes = 0
+
+    def stats(self) -> Dict:
+        hits = self.memory_hits + self.db_hits
+        lookups = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "bytes_served": self.bytes_served,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "db_bytes": self._db_bytes or 0,
+        }
+
+
+llm_cache = LLMResponseCache(
+    memory_entries=settings.LLM_CACHE_MEMORY_ENTRIES,
+    ttl_s=settings.LLM_CACHE_TTL_S,
+    max_bytes=settings.LLM_CACHE_MAX_BYTES,
+)
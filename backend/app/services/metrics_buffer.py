@@ -0,0 +1,148 @@
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.core.database import engine
+from app.services import partitions, rollups
+from app.services.routes import to_raw_rows
+
+
+class MetricsBuffer:
+    """
+    Write-behind buffer for request metrics.
+
+    Rows are queued from the request path without touching the database.
+    A background task drains the queue and inserts rows in bulk, either
+    when a batch fills up or when the oldest queued row reaches the flush
+    interval. When the queue is full new rows are dropped and counted.
+
+    Each flush also folds the batch into the minute/hour rollup tables in
+    the same transaction. Rollups see every row; rows sampled out by
+    RequestSampler are only left out of the raw table.
+    """
+
+    def __init__(self, max_size: int, batch_size: int, flush_interval: float):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self._task: Optional[asyncio.Task] = None
+        self._writing: Optional[asyncio.Future] = None
+        self._pending: List[Dict] = []
+
+        # Counters
+        self.enqueued = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.batches = 0
+        self.flush_errors = 0
+        self.sampled_out = 0
+
+    def put(self, row: Dict) -> bool:
+        """Queue a row for persistence. Returns False if it was dropped."""
+        try:
+            self._queue.put_nowait((time.monotonic(), row))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    def start(self):
+        """Start the background flush task on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task and flush everything still queued"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        # Let an in-flight batch finish before draining the rest
+        if self._writing is not None:
+            try:
+                await self._writing
+            except Exception:
+                pass
+            self._writing = None
+
+        await self.flush()
+
+    async def flush(self):
+        """Write all currently queued rows, in batches"""
+        # Rows already pulled by a cancelled collector go first
+        batch, self._pending = self._pending, []
+        while batch or not self._queue.empty():
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait()[1])
+            await asyncio.to_thread(self._write, batch)
+            batch = []
+
+    def stats(self) -> Dict:
+        return {
+            "queued": self._queue.qsize(),
+            "max_size": self.max_size,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "flush_errors": self.flush_errors,
+            "sampled_out": self.sampled_out,
+        }
+
+    async def _run(self):
+        while True:
+            batch = await self._collect_batch()
+            self._pending = []
+            self._writing = asyncio.ensure_future(asyncio.to_thread(self._write, batch))
+            await asyncio.shield(self._writing)
+            self._writing = None
+
+    async def _collect_batch(self) -> List[Dict]:
+        """Wait for a full batch or for the oldest row to reach the flush interval"""
+        queued_at, row = await self._queue.get()
+        batch = self._pending = [row]
+        deadline = queued_at + self.flush_interval
+
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                _, row = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            batch.append(row)
+
+        return batch
+
+    def _write(self, rows: List[Dict]):
+        """Insert a batch with a single executemany and update rollups, in one transaction"""
+        if not rows:
+            return
+        try:
+            with engine.begin() as conn:
+                raw_rows = to_raw_rows(conn, rows)
+                partitions.request_metrics.insert(conn, raw_rows)
+                rollups.apply(conn, rollups.aggregate(rows))
+            self.flushed += len(rows)
+            self.sampled_out += len(rows) - len(raw_rows)
+            self.batches += 1
+        except Exception as e:
+            self.flush_errors += 1
+            self.dropped += len(rows)
+            print(f"Failed to flush {len(rows)} request metrics: {e}")
+
+
+metrics_buffer = MetricsBuffer(
+    max_size=settings.METRICS_BUFFER_MAX_SIZE,
+    batch_size=settings.METRICS_BATCH_SIZE,
+    flush_interval=settings.METRICS_FLUSH_INTERVAL_S,
+)
@@ -0,0 +1,228 @@
+import asyncio
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import Index, MetaData, Table, event, inspect, select, union_all
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateIndex, CreateTable, DropTable
+from sqlalchemy.sql.expression import Subquery
+
+from app.core.config import settings
+from app.core.database import engine
+from app.services.cache import overview_cache
+from app.models.metrics import RequestMetric, TokenUsage
+
+# How often the list of partitions is re-read from the database, so that
+# partitions created by other processes become visible to reads
+DISCOVERY_INTERVAL_S = 60.0
+
+
+class PartitionedTable:
+    """
+    Time-partitioned storage for an append-only table.
+
+    Rows are routed by timestamp into per-day or per-week tables named
+    ``<base>_pYYYYMMDD`` (the period's first day) that share the base table's
+    columns. Range reads only UNION the partitions overlapping the range, and
+    retention drops whole partitions with a single DROP TABLE instead of
+    deleting rows. The base table itself holds rows written before
+    partitioning and is always included in reads.
+    """
+
+    def __init__(self, model, granularity: str = "week", time_column: str = "timestamp"):
+        if granularity not in ("day", "week"):
+            raise ValueError(f"Unknown partition granularity: {granularity}")
+        self.base: Table = model.__table__
+        self.granularity = granularity
+        self.time_column = time_column
+        self.prefix = f"{self.base.name}_p"
+
+        self._metadata = MetaData()
+        self._tables: Dict[date, Table] = {}
+        self._discovered_at = 0.0
+        # Writes happen on the metrics buffer's worker thread, reads on the event loop
+        self._lock = threading.RLock()
+
+    # Naming
+
+    def period_start(self, ts: datetime) -> date:
+        day = ts.date()
+        if self.granularity == "week":
+            day -= timedelta(days=day.weekday())
+        return day
+
+    def period_end(self, start: date) -> date:
+        return start + timedelta(days=7 if self.granularity == "week" else 1)
+
+    def partition_name(self, start: date) -> str:
+        return f"{self.prefix}{start:%Y%m%d}"
+
+    def _parse_name(self, name: str) -> Optional[date]:
+        if not name.startswith(self.prefix):
+            return None
+        try:
+            return datetime.strptime(name[len(self.prefix):], "%Y%m%d").date()
+        except ValueError:
+            return None
+
+    def _table(self, start: date) -> Table:
+        with self._lock:
+            table = self._tables.get(start)
+            if table is None:
+                name = self.partition_name(start)
+                table = self._metadata.tables.get(name)
+                if table is None:
+                    table = Table(
+                        name,
+                        self._metadata,
+                        *[column._copy() for column in self.base.columns],
+                        Index(f"ix_{name}_{self.time_column}", self.time_column),
+                    )
+                self._tables[start] = table
+            return table
+
+    # Partition management
+
+    def discover(self, conn: Connection, force: bool = False):
+        """Refresh the set of existing partitions from the database"""
+        if not force and time.monotonic() - self._discovered_at < DISCOVERY_INTERVAL_S:
+            return
+        existing = set()
+        for name in inspect(conn).get_table_names():
+            start = self._parse_name(name)
+            if start is not None:
+                existing.add(start)
+        with self._lock:
+            for start in existing:
+                self._table(start)
+            for start in list(self._tables):
+                if start not in existing:
+                    del self._tables[start]
+            self._discovered_at = time.monotonic()
+
+    def invalidate(self, *args):
+        """Forget known partitions; they are re-read from the database on next use"""
+        with self._lock:
+            self._tables.clear()
+            self._discovered_at = 0.0
+
+    def _watch_rollback(self, conn: Connection):
+        # DDL runs inside the caller's transaction; if that rolls back, the
+        # created partitions / added columns are gone and the caches are stale
+        if not event.contains(conn, "rollback", self.invalidate):
+            event.listen(conn, "rollback", self.invalidate)
+
+    def ensure(self, conn: Connection, start: date) -> Table:
+        """Create the partition for a period if it doesn't exist yet"""
+        known = start in self._tables
+        table = self._table(start)
+        if not known:
+            self._watch_rollback(conn)
+            conn.execute(CreateTable(table, if_not_exists=True))
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+        return table
+
+    def partitions(self, conn: Connection) -> List[date]:
+        self.discover(conn)
+        with self._lock:
+            return sorted(self._tables)
+
+    def tables(self, conn: Connection) -> List[Table]:
+        """The base table and every existing partition, oldest first"""
+        self.discover(conn, force=True)
+        with self._lock:
+            return [self.base] + [self._tables[start] for start in sorted(self._tables)]
+
+    # Writes
+
+    def insert(self, conn: Connection, rows: Iterable[Dict]):
+        """Insert rows into their partitions, one executemany per partition"""
+        grouped: Dict[date, List[Dict]] = {}
+        for row in rows:
+            ts = row.get(self.time_column)
+            if ts is None:
+                ts = row[self.time_column] = datetime.now(timezone.utc)
+            grouped.setdefault(self.period_start(_to_utc(ts)), []).append(row)
+
+        for start, batch in grouped.items():
+            conn.execute(self.ensure(conn, start).insert(), batch)
+
+    # Reads
+
+    def select_range(
+        self,
+        conn: Connection,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        name: Optional[str] = None
+    ) -> Subquery:
+        """
+        A subquery over every partition overlapping [start, end), plus the
+        base table. Callers still filter on the time column; this only prunes
+        partitions that can't contain matching rows.
+        """
+        selects = [select(self.base)]
+        for period in self.partitions(conn):
+            if start is not None and self.period_end(period) <= _to_utc(start).date():
+                continue
+            if end is not None and period > _to_utc(end).date():
+                continue
+            selects.append(select(self._table(period)))
+
+        query = selects[0] if len(selects) == 1 else union_all(*selects)
+        return query.subquery(name or self.base.name)
+
+    # Retention
+
+    def drop_before(self, conn: Connection, cutoff: datetime) -> List[str]:
+        """Drop every partition that ends on or before the cutoff"""
+        dropped = []
+        for period in self.partitions(conn):
+            if self.period_end(period) <= _to_utc(cutoff).date():
+                with self._lock:
+                    table = self._tables.pop(period)
+                    self._metadata.remove(table)
+                self._watch_rollback(conn)
+                conn.execute(DropTable(table, if_exists=True))
+                dropped.append(table.name)
+        return dropped
+
+
+def _to_utc(ts: datetime) -> datetime:
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+request_metrics = PartitionedTable(RequestMetric, settings.METRICS_PARTITION_GRANULARITY)
+token_usage = PartitionedTable(TokenUsage, settings.METRICS_PARTITION_GRANULARITY)
+
+
+def apply_retention(retention_days: int = None) -> List[str]:
+    """Drop request_metrics and token_usage partitions older than the retention window"""
+    retention_days = settings.METRICS_RETENTION_DAYS if retention_days is None else retention_days
+    if retention_days <= 0:
+        return []
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    dropped = []
+    with engine.begin() as conn:
+        for table in (request_metrics, token_usage):
+            table.discover(conn, force=True)
+            dropped += table.drop_before(conn, cutoff)
+    return dropped
+
+
+async def retention_loop(interval_s: float = 3600.0):
+    """Apply retention periodically; started from the app lifespan"""
+    while True:
+        try:
+            dropped = await asyncio.to_thread(apply_retention)
+            if dropped:
+                overview_cache.invalidate()
+                print(f"Dropped expired partitions: {', '.join(dropped)}")
+        except Exception as e:
+            print(f"Failed to apply metrics retention: {e}")
+        await asyncio.sleep(interval_s)
@@ -0,0 +1,373 @@
+import bisect
+import math
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.services.cache import overview_cache
+from app.services.llm_cache import llm_cache
+from app.services.metrics_buffer import metrics_buffer
+
+# Default latency buckets in seconds (Prometheus client defaults plus 30s/60s for LLM calls)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric(ABC):
+    """Common bookkeeping for a labelled metric family"""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """The family's sample lines in exposition format"""
+        pass
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class _ValueMetric(_Metric):
+    """
+    Single value per label set. An unlabelled metric can instead be bound to
+    a callback with ``set_function``, which is evaluated at scrape time.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def _add(self, amount: float, labels: Dict[str, str]):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def set_function(self, function: Callable[[], float]):
+        if self.labelnames:
+            raise ValueError("Callback metrics can't have labels")
+        self._function = function
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            return [f"{self.name} {_format_value(float(self._function()))}"]
+        with self._lock:
+            values = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Counter(_ValueMetric):
+    """Monotonically increasing value per label set"""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        self._add(amount, labels)
+
+
+class Gauge(_ValueMetric):
+    """Value per label set that can go up and down"""
+
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels):
+        self._add(amount, labels)
+
+    def dec(self, amount: float = 1.0, **labels):
+        self._add(-amount, labels)
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram rendered with cumulative ``le`` buckets, _sum and _count"""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts..., +Inf count], sum
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = [(key, list(counts), total[0]) for key, (counts, total) in self._values.items()]
+
+        lines = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    In-process metric registry rendered in the Prometheus text format.
+
+    Metrics are updated in memory on the hot path (middleware, agents, vector
+    store) so a scrape only formats the current values and never touches the
+    database; its cost depends on the number of series, not on data volume.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Duplicate metric: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+registry = Registry()
+
+# HTTP
+http_requests_total = registry.counter(
+    "http_requests_total", "HTTP requests by route template, method and status code",
+    ("route", "method", "status")
+)
+http_request_errors_total = registry.counter(
+    "http_request_errors_total", "HTTP requests that returned a 4xx or 5xx status",
+    ("route", "method")
+)
+http_request_duration_seconds = registry.histogram(
+    "http_request_duration_seconds", "HTTP request duration in seconds",
+    ("route", "method")
+)
+
+# Agents
+agent_runs_total = registry.counter(
+    "agent_runs_total", "Agent runs by agent and final status", ("agent", "status")
+)
+agent_run_duration_seconds = registry.histogram(
+    "agent_run_duration_seconds", "Agent run duration in seconds", ("agent",)
+)
+
+# LLM usage
+llm_tokens_total = registry.counter(
+    "llm_tokens_total",
+    "LLM tokens by model and type (input/output; cache_read/cache_write are parts of input)",
+    ("model", "type")
+)
+llm_cost_usd_total = registry.counter(
+    "llm_cost_usd_total", "Estimated LLM cost in USD by model", ("model",)
+)
+
+# Pooled LLM clients
+llm_pool_in_flight = registry.gauge(
+    "llm_pool_in_flight", "LLM calls holding a per-model concurrency slot", ("model",)
+)
+llm_pool_utilization = registry.gauge(
+    "llm_pool_utilization", "Fraction of the per-model concurrency cap in use", ("model",)
+)
+llm_pool_wait_seconds = registry.histogram(
+    "llm_pool_wait_seconds", "Time LLM calls waited for a per-model concurrency slot", ("model",)
+)
+llm_request_duration_seconds = registry.histogram(
+    "llm_request_duration_seconds", "LLM call duration in seconds, excluding pool wait", ("model",)
+)
+llm_time_to_first_token_seconds = registry.histogram(
+    "llm_time_to_first_token_seconds", "Time from sending an LLM call to its first streamed token", ("model",)
+)
+
+# /chat admission control
+admission_in_flight = registry.gauge(
+    "admission_in_flight", "Admitted agent runs in progress", ("agent",)
+)
+admission_queue_depth = registry.gauge(
+    "admission_queue_depth", "Requests waiting for an agent run slot", ("agent",)
+)
+admission_wait_seconds = registry.histogram(
+    "admission_wait_seconds", "Time admitted requests waited for an agent run slot", ("agent",)
+)
+admission_shed_total = registry.counter(
+    "admission_shed_total", "Requests rejected with 429 by reason (queue_full/timeout)", ("agent", "reason")
+)
+
+# POST /chat/jobs runner
+agent_jobs_total = registry.counter(
+    "agent_jobs_total", "Finished agent jobs by agent and status (completed/failed)", ("agent", "status")
+)
+agent_job_queue_seconds = registry.histogram(
+    "agent_job_queue_seconds", "Time agent jobs waited for a worker", ("agent",)
+)
+agent_job_latency_seconds = registry.histogram(
+    "agent_job_latency_seconds", "Agent job latency from submission to result", ("agent",)
+)
+agent_job_queue_depth = registry.gauge(
+    "agent_job_queue_depth", "Agent jobs waiting for a worker"
+)
+agent_job_workers_busy = registry.gauge(
+    "agent_job_workers_busy", "Job workers running an agent job"
+)
+agent_job_worker_utilization = registry.gauge(
+    "agent_job_worker_utilization", "Fraction of job workers running an agent job"
+)
+agent_job_callbacks_total = registry.counter(
+    "agent_job_callbacks_total", "Job completion callbacks by outcome (delivered/failed/skipped)", ("status",)
+)
+
+# Database (SQLAlchemy session flushes and commits)
+db_operation_duration_seconds = registry.histogram(
+    "db_operation_duration_seconds", "Duration of ORM session flushes and commits", ("operation",)
+)
+
+# Vector store
+vector_queries_total = registry.counter(
+    "vector_queries_total", "Vector store queries by collection and outcome", ("collection", "status")
+)
+vector_query_duration_seconds = registry.histogram(
+    "vector_query_duration_seconds", "Vector store query duration in seconds", ("collection",)
+)
+
+# DocAgent semantic answer cache
+semantic_cache_lookups_total = registry.counter(
+    "semantic_cache_lookups_total", "Semantic answer cache lookups by collection and result (hit/miss/error)",
+    ("collection", "result")
+)
+semantic_cache_lookup_duration_seconds = registry.histogram(
+    "semantic_cache_lookup_duration_seconds", "Semantic answer cache lookup duration in seconds, embedding included",
+    ("collection",)
+)
+
+# IncidentAgent tiers
+incident_tier_total = registry.counter(
+    "incident_tier_total", "IncidentAgent nodes by the tier that answered (rules/template/keywords/llm)",
+    ("node", "tier")
+)
+
+
+# Write-behind buffer, read from its own counters at scrape time
+metrics_buffer_queued = registry.gauge(
+    "metrics_buffer_queued", "Request metric rows waiting to be written"
+)
+metrics_buffer_queued.set_function(lambda: metrics_buffer.stats()["queued"])
+for _key, _documentation in (
+    ("enqueued", "Request metric rows accepted by the write-behind buffer"),
+    ("dropped", "Request metric rows dropped (queue full or failed write)"),
+    ("flushed", "Request metric rows written to the database"),
+    ("flush_errors", "Failed request metric batch writes"),
+    ("sampled_out", "Request metric rows aggregated into rollups but not stored raw"),
+):
+    registry.counter(f"metrics_buffer_{_key}_total", _documentation).set_function(
+        lambda key=_key: metrics_buffer.stats()[key]
+    )
+
+# Overview cache
+for _key in ("hits", "misses", "invalidations"):
+    registry.counter(f"overview_cache_{_key}_total", f"/metrics/overview cache {_key}").set_function(
+        lambda key=_key: overview_cache.stats()[key]
+    )
+
+# LLM response cache
+for _key, _documentation in (
+    ("memory_hits", "LLM calls answered from the in-memory response cache"),
+    ("db_hits", "LLM calls answered from the database response cache"),
+    ("misses", "LLM calls not found in the response cache"),
+    ("stores", "LLM responses written to the response cache"),
+    ("evictions", "Cached LLM responses evicted from the database (expired or over size)"),
+    ("bytes_served", "Bytes of LLM response text served from the cache"),
+):
+    registry.counter(f"llm_cache_{_key}_total", _documentation).set_function(
+        lambda key=_key: llm_cache.stats()[key]
+    )
+for _key, _documentation in (
+    ("memory_entries", "Responses in the in-memory LLM response cache"),
+    ("memory_bytes", "Bytes of response text in the in-memory LLM response cache"),
+    ("db_bytes", "Bytes of response text in the database LLM response cache"),
+):
+    registry.gauge(f"llm_cache_{_key}", _documentation).set_function(
+        lambda key=_key: llm_cache.stats()[key]
+    )
@@ -0,0 +1,150 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, select
+from sqlalchemy.engine import Connection
+
+from app.core.config import settings
+from app.models.metrics import RequestMetricRollup
+from app.services.latency import LatencyHistogram, status_class
+
+# Bucket width in seconds for each rollup resolution
+RESOLUTIONS = {
+    "minute": 60,
+    "hour": 3600,
+}
+
+RollupKey = Tuple[str, datetime, str, str]  # (resolution, bucket_start, route, status_class)
+
+
+@dataclass
+class RollupDelta:
+    """Aggregated change to one rollup row"""
+    count: int = 0
+    error_count: int = 0
+    latency_sum_ms: float = 0.0
+    histogram: LatencyHistogram = field(
+        default_factory=lambda: LatencyHistogram(settings.LATENCY_RELATIVE_ACCURACY)
+    )
+
+
+def to_naive_utc(ts: datetime) -> datetime:
+    """Timestamps are stored as naive UTC (SQLite drops tzinfo)"""
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def bucket_start(ts: datetime, resolution: str) -> datetime:
+    """Truncate a timestamp to the start of its rollup bucket"""
+    ts = to_naive_utc(ts)
+    if resolution == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(second=0, microsecond=0)
+
+
+def aggregate(
+    rows: Iterable[Dict],
+    deltas: Optional[Dict[RollupKey, RollupDelta]] = None,
+    weighted: bool = False
+) -> Dict[RollupKey, RollupDelta]:
+    """
+    Fold request metric rows into per-bucket deltas for every resolution.
+
+    Each row needs ``timestamp``, ``route``, ``status_code`` and ``duration_ms``.
+    Pass ``deltas`` to keep accumulating into an existing result. With
+    ``weighted`` each row counts ``sample_weight`` times (sampled raw rows);
+    live rows are aggregated before sampling and count once.
+    """
+    deltas = {} if deltas is None else deltas
+    for row in rows:
+        status = row["status_code"]
+        route = row["route"]
+        klass = status_class(status)
+        weight = (row.get("sample_weight") or 1) if weighted else 1
+        for resolution in RESOLUTIONS:
+            key = (resolution, bucket_start(row["timestamp"], resolution), route, klass)
+            delta = deltas.get(key)
+            if delta is None:
+                delta = deltas[key] = RollupDelta()
+            delta.count += weight
+            delta.error_count += weight if status >= 400 else 0
+            delta.latency_sum_ms += row["duration_ms"] * weight
+            delta.histogram.record(row["duration_ms"], weight)
+    return deltas
+
+
+def apply(conn: Connection, deltas: Dict[RollupKey, RollupDelta]):
+    """
+    Merge deltas into the rollup table within the caller's transaction.
+
+    Existing rows in the touched time range are read once, merged in memory and
+    written back with one executemany UPDATE; new rows use one executemany
+    INSERT. The metrics buffer is the only live writer, so there is no race
+    between the read and the write.
+    """
+    if not deltas:
+        return
+
+    table = RequestMetricRollup.__table__
+    starts = [key[1] for key in deltas]
+    existing_rows = conn.execute(
+        select(table).where(
+            table.c.bucket_start >= min(starts),
+            table.c.bucket_start <= max(starts)
+        )
+    ).mappings().all()
+    existing = {
+        (r["resolution"], r["bucket_start"], r["route"], r["status_class"]): r
+        for r in existing_rows
+    }
+
+    inserts: List[Dict] = []
+    updates: List[Dict] = []
+    for key, delta in deltas.items():
+        current = existing.get(key)
+        if current is None:
+            inserts.append({
+                "resolution": key[0],
+                "bucket_start": key[1],
+                "route": key[2],
+                "status_class": key[3],
+                "count": delta.count,
+                "error_count": delta.error_count,
+                "latency_sum_ms": delta.latency_sum_ms,
+                "latency_histogram": delta.histogram.to_dict(),
+            })
+            continue
+
+        histogram = delta.histogram
+        if current["latency_histogram"]:
+            histogram = LatencyHistogram.from_dict(current["latency_histogram"]).merge(histogram)
+        updates.append({
+            "row_id": current["id"],
+            "new_count": current["count"] + delta.count,
+            "new_error_count": current["error_count"] + delta.error_count,
+            "new_latency_sum_ms": current["latency_sum_ms"] + delta.latency_sum_ms,
+            "new_latency_histogram": histogram.to_dict(),
+        })
+
+    if inserts:
+        conn.execute(table.insert(), inserts)
+    if updates:
+        conn.execute(
+            table.update().where(table.c.id == bindparam("row_id")).values(
+                count=bindparam("new_count"),
+                error_count=bindparam("new_error_count"),
+                latency_sum_ms=bindparam("new_latency_sum_ms"),
+                latency_histogram=bindparam("new_latency_histogram"),
+            ),
+            updates
+        )
+
+
+def resolution_for(bucket_seconds: int) -> str:
+    """Coarsest rollup resolution that evenly divides the requested bucket"""
+    for resolution, width in sorted(RESOLUTIONS.items(), key=lambda item: -item[1]):
+        if bucket_seconds % width == 0:
+            return resolution
+    return "minute"
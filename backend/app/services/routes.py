@@ -0,0 +1,85 @@
+import threading
+from typing import Dict, Iterable, List
+
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+
+from app.core.config import settings
+from app.models import RouteTemplate
+
+# Keys carried on queued rows that aren't columns of request_metrics
+_ROW_ONLY_KEYS = ("route",)
+
+
+class RouteInterner:
+    """
+    Interns route templates into the small route_templates lookup table.
+
+    Request metric rows store the template's integer id in an indexed
+    column instead of the raw path, so per-route aggregations are an indexed
+    GROUP BY on route_id. The set of templates is bounded by the app's
+    routes, so ids are cached for the life of the process and the table is
+    only touched the first time a template is seen.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def ids(self, conn: Connection, templates: Iterable[str]) -> Dict[str, int]:
+        """Ids for the given templates, creating rows for new ones"""
+        templates = set(templates)
+        missing = templates - set(self._ids)
+        if missing:
+            self._load(conn, missing)
+            new = missing - set(self._ids)
+            if new:
+                self._insert(conn, sorted(new))
+                self._load(conn, new)
+        return {template: self._ids[template] for template in templates}
+
+    def _load(self, conn: Connection, templates: Iterable[str]):
+        rows = conn.execute(
+            select(RouteTemplate.template, RouteTemplate.id).where(RouteTemplate.template.in_(templates))
+        ).all()
+        with self._lock:
+            self._ids.update({row.template: row.id for row in rows})
+
+    def _insert(self, conn: Connection, templates: List[str]):
+        rows = [{"template": template} for template in templates]
+        # Another process may intern the same template concurrently
+        if conn.dialect.name == "postgresql":
+            stmt = postgresql.insert(RouteTemplate).on_conflict_do_nothing(index_elements=["template"])
+        elif conn.dialect.name == "sqlite":
+            stmt = sqlite.insert(RouteTemplate).on_conflict_do_nothing(index_elements=["template"])
+        else:
+            stmt = insert(RouteTemplate)
+        conn.execute(stmt, rows)
+
+    def clear(self):
+        """Forget cached ids (e.g. after the lookup table was emptied)"""
+        with self._lock:
+            self._ids.clear()
+
+
+route_interner = RouteInterner()
+
+
+def to_raw_rows(conn: Connection, rows: List[Dict]) -> List[Dict]:
+    """
+    Turn queued request rows into request_metrics rows: rows sampled out
+    (sample_weight 0) are skipped, the route template becomes its interned
+    route_id, and the raw path is dropped unless METRICS_STORE_RAW_PATH is
+    enabled.
+    """
+    rows = [row for row in rows if row.get("sample_weight", 1)]
+    ids = route_interner.ids(conn, {row["route"] for row in rows if row.get("route")})
+    raw_rows = []
+    for row in rows:
+        raw = {k: v for k, v in row.items() if k not in _ROW_ONLY_KEYS}
+        raw["route_id"] = ids.get(row.get("route"))
+        if not settings.METRICS_STORE_RAW_PATH:
+            raw["path"] = None
+        raw_rows.append(raw)
+    return raw_rows
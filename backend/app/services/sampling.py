@@ -0,0 +1,75 @@
+import random
+import threading
+from fnmatch import fnmatchcase
+from typing import Dict, List, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.sql.expression import ColumnElement
+
+from app.core.config import settings
+
+
+class RequestSampler:
+    """
+    Per-route head sampling for raw request metric rows.
+
+    Rules map ``"<route glob>"`` or ``"<METHOD> <route glob>"`` to the share
+    of successful, fast requests to keep (first matching rule wins, then
+    the default rate). Errors and slow requests are always kept. A kept row
+    stands for ``1 / rate`` requests and carries that as an integer
+    ``sample_weight``, so weighted sums over the raw rows stay unbiased.
+
+    Only raw rows are sampled: rollups, latency histograms and Prometheus
+    counters still see every request.
+    """
+
+    def __init__(self, rules: Dict[str, float], default_rate: float = 1.0, slow_ms: float = 1000.0):
+        self.rules: List[Tuple[str, str, int]] = []
+        for pattern, rate in rules.items():
+            method, route = pattern.split(" ", 1) if " " in pattern else ("*", pattern)
+            self.rules.append((method.upper(), route, self._every(rate)))
+        self.default_every = self._every(default_rate)
+        self.slow_ms = slow_ms
+        self._cache: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _every(rate: float) -> int:
+        """Keep 1 in N; N is an integer so weights stay exact counts"""
+        if not 0 < rate <= 1:
+            raise ValueError(f"Sample rate must be in (0, 1], got {rate}")
+        return max(1, round(1 / rate))
+
+    def every(self, route: str, method: str) -> int:
+        key = (method, route)
+        every = self._cache.get(key)
+        if every is None:
+            every = self.default_every
+            for rule_method, pattern, rule_every in self.rules:
+                if rule_method in ("*", method) and fnmatchcase(route, pattern):
+                    every = rule_every
+                    break
+            with self._lock:
+                self._cache[key] = every
+        return every
+
+    def weight(self, route: str, method: str, status_code: int, duration_ms: float) -> int:
+        """Sample weight for a request; 0 means the raw row is not stored"""
+        if status_code >= 400 or duration_ms >= self.slow_ms:
+            return 1
+        every = self.every(route, method)
+        if every == 1:
+            return 1
+        return every if random.random() * every < 1 else 0
+
+
+def weight_of(columns) -> ColumnElement:
+    """Row weight for reads; rows written before sampling count once"""
+    return func.coalesce(columns.sample_weight, 1)
+
+
+request_sampler = RequestSampler(
+    rules=settings.metrics_sampling_rules,
+    default_rate=settings.METRICS_SAMPLE_RATE,
+    slow_ms=settings.METRICS_SLOW_REQUEST_MS,
+)
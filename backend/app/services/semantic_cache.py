@@ -0,0 +1,177 @@
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services import prometheus, vector_store
+
+
+@dataclass
+class SemanticHit:
+    answer: str
+    similarity: float
+    cached_query: str
+
+
+@dataclass
+class _CollectionStats:
+    lookups: int = 0
+    hits: int = 0
+    errors: int = 0
+    near_misses: int = 0
+    lookup_s_total: float = 0.0
+    hit_similarity_total: float = 0.0
+    hit_runs: int = 0
+    hit_run_ms_total: float = 0.0
+    miss_runs: int = 0
+    miss_run_ms_total: float = 0.0
+    stores: int = 0
+    invalidations: int = 0
+
+
+class SemanticCache:
+    """
+    Semantic cache of DocAgent answers, one Chroma index per knowledge
+    collection (see vector_store.get_answer_cache).
+
+    The incoming question is embedded and matched against previously
+    answered questions; if the closest one's cosine similarity reaches the
+    collection's threshold, its answer is reused and both retrieval and the
+    LLM call are skipped. A collection's cache is dropped whenever the
+    collection is (re-)ingested, so answers never outlive their sources.
+
+    Per-collection counters feed ``report()``, which weighs the run time
+    saved on hits against the lookup time added to every miss, and counts
+    near misses just below the threshold to show whether it is too strict.
+    """
+
+    # Misses this close below the threshold count as near misses
+    NEAR_MISS_MARGIN = 0.05
+
+    def __init__(self, default_threshold: float, thresholds: Dict[str, float]):
+        self.default_threshold = default_threshold
+        self.thresholds = thresholds
+        self._stats: Dict[str, _CollectionStats] = {}
+        self._lock = threading.Lock()
+
+    def threshold(self, collection: str) -> float:
+        return self.thresholds.get(collection, self.default_threshold)
+
+    def _collection_stats(self, collection: str) -> _CollectionStats:
+        with self._lock:
+            stats = self._stats.get(collection)
+            if stats is None:
+                stats = self._stats[collection] = _CollectionStats()
+            return stats
+
+    def lookup(self, collection: str, query: str) -> Tuple[Optional[SemanticHit], List[float]]:
+        """The cached answer for a question if one is similar enough, and the question's embedding"""
+        stats = self._collection_stats(collection)
+        start = time.perf_counter()
+        result = "error"
+        try:
+            embedding = vector_store.embed([query])[0]
+            cache = vector_store.get_answer_cache(collection)
+            hit = None
+            similarity = None
+            if cache.count():
+                matches = cache.query(
+                    query_embeddings=[embedding],
+                    n_results=1,
+                    include=["documents", "metadatas", "distances"]
+                )
+                # Cosine distance
+                similarity = 1.0 - matches["distances"][0][0]
+                if similarity >= self.threshold(collection):
+                    hit = SemanticHit(
+                        answer=matches["metadatas"][0][0]["answer"],
+                        similarity=similarity,
+                        cached_query=matches["documents"][0][0],
+                    )
+            result = "hit" if hit else "miss"
+        finally:
+            duration = time.perf_counter() - start
+            with self._lock:
+                stats.lookups += 1
+                stats.lookup_s_total += duration
+                if result == "hit":
+                    stats.hits += 1
+                    stats.hit_similarity_total += similarity
+                elif result == "miss" and similarity is not None \
+                        and similarity >= self.threshold(collection) - self.NEAR_MISS_MARGIN:
+                    stats.near_misses += 1
+                elif result == "error":
+                    stats.errors += 1
+            prometheus.semantic_cache_lookups_total.inc(collection=collection, result=result)
+            prometheus.semantic_cache_lookup_duration_seconds.observe(duration, collection=collection)
+        return hit, embedding
+
+    def store(self, collection: str, query: str, embedding: List[float], answer: str):
+        """Cache the answer to a question"""
+        vector_store.get_answer_cache(collection).upsert(
+            ids=[hashlib.sha256(query.encode()).hexdigest()],
+            embeddings=[embedding],
+            documents=[query],
+            metadatas=[{"answer": answer, "created_at": datetime.now(timezone.utc).isoformat()}]
+        )
+        stats = self._collection_stats(collection)
+        with self._lock:
+            stats.stores += 1
+
+    def record_run(self, collection: str, hit: bool, duration_ms: float):
+        """Record the duration of a whole agent run that did (not) hit the cache"""
+        stats = self._collection_stats(collection)
+        with self._lock:
+            if hit:
+                stats.hit_runs += 1
+                stats.hit_run_ms_total += duration_ms
+            else:
+                stats.miss_runs += 1
+                stats.miss_run_ms_total += duration_ms
+
+    def invalidate(self, collection: str):
+        """Drop all cached answers for a knowledge collection"""
+        vector_store.delete_answer_cache(collection)
+        stats = self._collection_stats(collection)
+        with self._lock:
+            stats.invalidations += 1
+
+    def report(self) -> List[Dict]:
+        with self._lock:
+            items = [(collection, _CollectionStats(**vars(stats))) for collection, stats in self._stats.items()]
+
+        report = []
+        for collection, s in sorted(items):
+            misses = s.lookups - s.hits - s.errors
+            avg_lookup_ms = s.lookup_s_total / s.lookups * 1000 if s.lookups else 0.0
+            avg_hit_run_ms = s.hit_run_ms_total / s.hit_runs if s.hit_runs else 0.0
+            avg_miss_run_ms = s.miss_run_ms_total / s.miss_runs if s.miss_runs else 0.0
+            # Hits save a full run minus the hit run; every miss pays for the lookup
+            saved_ms = s.hits * max(avg_miss_run_ms - avg_hit_run_ms, 0.0) if s.miss_runs else 0.0
+            overhead_ms = (misses + s.errors) * avg_lookup_ms
+            report.append({
+                "collection": collection,
+                "threshold": self.threshold(collection),
+                "lookups": s.lookups,
+                "hits": s.hits,
+                "misses": misses,
+                "errors": s.errors,
+                "hit_rate": s.hits / s.lookups if s.lookups else 0.0,
+                "near_misses": s.near_misses,
+                "avg_hit_similarity": s.hit_similarity_total / s.hits if s.hits else 0.0,
+                "avg_lookup_ms": round(avg_lookup_ms, 2),
+                "avg_hit_run_ms": round(avg_hit_run_ms, 2),
+                "avg_miss_run_ms": round(avg_miss_run_ms, 2),
+                "saved_ms": round(saved_ms, 1),
+                "overhead_ms": round(overhead_ms, 1),
+                "net_saved_ms": round(saved_ms - overhead_ms, 1),
+                "stores": s.stores,
+                "invalidations": s.invalidations,
+            })
+        return report
+
+
+semantic_cache = SemanticCache(settings.SEMANTIC_CACHE_THRESHOLD, settings.semantic_cache_thresholds)
@@ -0,0 +1,216 @@
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Integer, cast, func, literal, or_, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import ColumnElement, FunctionElement
+
+from app.models import RequestMetricRollup
+from app.services import partitions, rollups
+from app.services.sampling import weight_of
+from app.services.latency import LatencyHistogram
+
+EPOCH = datetime(1970, 1, 1)
+
+# Metrics served from request data (rollups when the bucket allows it)
+REQUEST_METRICS = {"requests", "errors", "latency"}
+# Metrics served from token_usage
+TOKEN_METRICS = {"tokens", "cost"}
+# Latency percentiles, e.g. p95_latency, merged from rollup histograms
+PERCENTILE_METRIC = re.compile(r"^p(\d{1,2}(?:\.\d+)?)_latency$")
+
+_DURATION = re.compile(r"^(\d+)([smhd])$")
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+class epoch_seconds(FunctionElement):
+    """Seconds since the Unix epoch for a (naive UTC) DateTime column"""
+    type = Integer()
+    inherit_cache = True
+
+
+@compiles(epoch_seconds)
+def _epoch_seconds_default(element, compiler, **kw):
+    return "CAST(EXTRACT(EPOCH FROM %s) AS BIGINT)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(epoch_seconds, "sqlite")
+def _epoch_seconds_sqlite(element, compiler, **kw):
+    return "CAST(strftime('%%s', %s) AS INTEGER)" % compiler.process(element.clauses, **kw)
+
+
+def parse_duration(value: str) -> timedelta:
+    """Parse durations like 30s, 5m, 1h or 7d"""
+    match = _DURATION.match(value.strip().lower())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid duration: {value}")
+    return timedelta(seconds=int(match.group(1)) * _UNITS[match.group(2)])
+
+
+def default_bucket(period: timedelta) -> timedelta:
+    """Pick a bucket that gives roughly 12-30 points for the period"""
+    for bucket in (
+        timedelta(minutes=1), timedelta(minutes=5), timedelta(minutes=15),
+        timedelta(hours=1), timedelta(hours=6), timedelta(days=1)
+    ):
+        if period / bucket <= 30:
+            return bucket
+    return timedelta(days=7)
+
+
+def _bucket_expr(column, start: int, step: int) -> ColumnElement:
+    """Integer bucket start (epoch seconds) for a DateTime column"""
+    return (epoch_seconds(column) - start) // step * step + start
+
+
+def sent_usage(columns) -> ColumnElement:
+    """
+    token_usage rows of LLM calls actually made. Replays from the response
+    cache are stored with the tokens they avoided, so they are left out of
+    usage sums; rows written before the cache existed have ``cached`` NULL.
+    """
+    return or_(columns.cached.is_(None), columns.cached.is_(False))
+
+
+def query_timeseries(
+    db: Session,
+    metrics: Sequence[str],
+    period: timedelta,
+    bucket: timedelta,
+    now: Optional[datetime] = None
+) -> Dict[str, List[Tuple[datetime, float]]]:
+    """
+    Bucketed aggregation for several metrics in one SQL statement.
+
+    A recursive CTE generates every bucket in the range (server-side gap
+    filling) and each source table is scanned once with a GROUP BY on the
+    bucket, then LEFT JOINed onto the bucket series. Request metrics are read
+    from the rollup tables whenever the bucket is a multiple of a rollup
+    resolution, falling back to the raw request_metrics partitions otherwise.
+    Percentile metrics need the rollup histograms and cost one extra query.
+    """
+    step = int(bucket.total_seconds())
+    now = rollups.to_naive_utc(now or datetime.now(timezone.utc))
+    end = int((now - EPOCH).total_seconds())
+    start = (end - int(period.total_seconds())) // step * step
+    start_dt = EPOCH + timedelta(seconds=start)
+
+    percentiles = {m: float(PERCENTILE_METRIC.match(m).group(1)) / 100 for m in metrics if PERCENTILE_METRIC.match(m)}
+    unknown = set(metrics) - REQUEST_METRICS - TOKEN_METRICS - set(percentiles)
+    if unknown:
+        raise ValueError(f"Unknown metrics: {', '.join(sorted(unknown))}")
+
+    buckets = select(literal(start, Integer).label("b")).cte("buckets", recursive=True)
+    buckets = buckets.union_all(select(buckets.c.b + step).where(buckets.c.b + step < end))
+
+    columns = [buckets.c.b]
+    stmt_from = buckets
+
+    if REQUEST_METRICS & set(metrics):
+        if step % rollups.RESOLUTIONS["minute"] == 0:
+            source = RequestMetricRollup
+            request_agg = select(
+                _bucket_expr(source.bucket_start, start, step).label("b"),
+                func.sum(source.count).label("requests"),
+                func.sum(source.error_count).label("errors"),
+                func.sum(source.latency_sum_ms).label("latency_sum"),
+            ).where(
+                source.resolution == rollups.resolution_for(step),
+                source.bucket_start >= start_dt,
+                source.bucket_start < now,
+            )
+            timestamp = source.bucket_start
+        else:
+            # Raw rows may be sampled; weighted sums keep totals and means unbiased
+            source = partitions.request_metrics.select_range(db.connection(), start_dt, now).c
+            weight = weight_of(source)
+            request_agg = select(
+                _bucket_expr(source.timestamp, start, step).label("b"),
+                func.sum(weight).label("requests"),
+                func.sum(cast(source.status_code >= 400, Integer) * weight).label("errors"),
+                func.sum(source.duration_ms * weight).label("latency_sum"),
+            ).where(source.timestamp >= start_dt, source.timestamp < now)
+            timestamp = source.timestamp
+        request_agg = request_agg.group_by(_bucket_expr(timestamp, start, step)).subquery("r")
+
+        stmt_from = stmt_from.outerjoin(request_agg, request_agg.c.b == buckets.c.b)
+        columns += [
+            func.coalesce(request_agg.c.requests, 0).label("requests"),
+            func.coalesce(request_agg.c.errors, 0).label("errors"),
+            func.coalesce(
+                request_agg.c.latency_sum / func.nullif(request_agg.c.requests, 0), 0
+            ).label("latency"),
+        ]
+
+    if TOKEN_METRICS & set(metrics):
+        usage = partitions.token_usage.select_range(db.connection(), start_dt, now).c
+        token_agg = select(
+            _bucket_expr(usage.timestamp, start, step).label("b"),
+            func.sum(usage.total_tokens).label("tokens"),
+            func.sum(usage.cost_usd).label("cost"),
+        ).where(
+            usage.timestamp >= start_dt,
+            usage.timestamp < now,
+            sent_usage(usage),
+        ).group_by(_bucket_expr(usage.timestamp, start, step)).subquery("t")
+
+        stmt_from = stmt_from.outerjoin(token_agg, token_agg.c.b == buckets.c.b)
+        columns += [
+            func.coalesce(token_agg.c.tokens, 0).label("tokens"),
+            func.coalesce(token_agg.c.cost, 0).label("cost"),
+        ]
+
+    series: Dict[str, List[Tuple[datetime, float]]] = {}
+    plain = [metric for metric in metrics if metric not in percentiles]
+    rows = db.execute(select(*columns).select_from(stmt_from).order_by(buckets.c.b)).all() if plain else []
+
+    for metric in plain:
+        series[metric] = [
+            (EPOCH + timedelta(seconds=row.b), float(getattr(row, metric) or 0))
+            for row in rows
+        ]
+
+    if percentiles:
+        series.update(_percentile_series(db, percentiles, start, end, step))
+
+    return {metric: series[metric] for metric in metrics}
+
+
+def _percentile_series(
+    db: Session,
+    percentiles: Dict[str, float],
+    start: int,
+    end: int,
+    step: int
+) -> Dict[str, List[Tuple[datetime, float]]]:
+    """Percentiles merged from rollup histograms (not expressible in portable SQL)"""
+    resolution = rollups.resolution_for(step) if step % 60 == 0 else "minute"
+    rows = db.query(
+        RequestMetricRollup.bucket_start,
+        RequestMetricRollup.latency_histogram
+    ).filter(
+        RequestMetricRollup.resolution == resolution,
+        RequestMetricRollup.bucket_start >= EPOCH + timedelta(seconds=start),
+        RequestMetricRollup.bucket_start < EPOCH + timedelta(seconds=end),
+        RequestMetricRollup.latency_histogram.isnot(None)
+    ).all()
+
+    merged: Dict[int, LatencyHistogram] = {}
+    for row in rows:
+        index = (int((row.bucket_start - EPOCH).total_seconds()) - start) // step
+        hist = LatencyHistogram.from_dict(row.latency_histogram)
+        if index in merged:
+            merged[index].merge(hist)
+        else:
+            merged[index] = hist
+
+    timestamps = range(start, end, step)
+    return {
+        metric: [
+            (EPOCH + timedelta(seconds=ts), merged[i].quantile(q) if i in merged else 0.0)
+            for i, ts in enumerate(timestamps)
+        ]
+        for metric, q in percentiles.items()
+    }
@@ -0,0 +1,311 @@
+import os
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.services import prometheus
+
+# W3C Trace Context: version-traceid-parentid-flags
+TRACEPARENT_RE = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+def new_trace_id() -> str:
+    return os.urandom(16).hex()
+
+
+def new_span_id() -> str:
+    return os.urandom(8).hex()
+
+
+@dataclass(frozen=True)
+class TraceContext:
+    """The trace being served and the span new spans are children of"""
+    trace_id: str
+    span_id: Optional[str] = None
+    sampled: bool = True
+
+    @classmethod
+    def parse(cls, traceparent: Optional[str]) -> Optional["TraceContext"]:
+        """Parse a ``traceparent`` header; None if it is missing or invalid"""
+        match = TRACEPARENT_RE.match((traceparent or "").strip().lower())
+        if match is None:
+            return None
+        trace_id, span_id, flags = match.groups()
+        if trace_id == "0" * 32 or span_id == "0" * 16:
+            return None
+        return cls(trace_id, span_id, bool(int(flags, 16) & 1))
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id or new_span_id()}-{'01' if self.sampled else '00'}"
+
+
+@dataclass
+class Span:
+    span_id: str
+    parent_id: Optional[str]
+    name: str
+    kind: str
+    start: float
+    end: Optional[float] = None
+    attributes: Dict = field(default_factory=dict)
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def finish(self):
+        if self.end is None:
+            self.end = time.perf_counter()
+
+
+class SpanRecorder:
+    """
+    Spans of one agent run, kept in memory and stored with its AgentRun.
+
+    Span times are offsets from the start of the run, in milliseconds, so
+    a run's spans serialize to a short list of small dicts.
+    """
+
+    def __init__(self, trace_id: str, max_spans: int):
+        self.trace_id = trace_id
+        self.max_spans = max_spans
+        self.origin = time.perf_counter()
+        self.spans: List[Span] = []
+        self.dropped = 0
+
+    def start(self, name: str, kind: str, parent_id: Optional[str], **attributes) -> Span:
+        span = Span(new_span_id(), parent_id, name, kind, time.perf_counter(), attributes=attributes)
+        if len(self.spans) < self.max_spans:
+            self.spans.append(span)
+        else:
+            # Still returned so callers don't have to care, just not stored
+            self.dropped += 1
+        return span
+
+    def to_json(self) -> List[Dict]:
+        now = time.perf_counter()
+        rows = []
+        for span in self.spans:
+            row = {
+                "id": span.span_id,
+                "parent": span.parent_id,
+                "name": span.name,
+                "kind": span.kind,
+                "start_ms": round((span.start - self.origin) * 1000, 2),
+                "ms": round(((span.end or now) - span.start) * 1000, 2),
+            }
+            attributes = dict(span.attributes)
+            if span.end is None:
+                attributes["unfinished"] = True
+            if attributes:
+                row["attrs"] = attributes
+            rows.append(row)
+        return rows
+
+
+# Set by TraceContextMiddleware per request, or from a job's stored traceparent
+_trace_context: ContextVar[Optional[TraceContext]] = ContextVar("trace_context", default=None)
+
+# Set by BaseAgent.run; graph node tasks inherit it, so their spans land in the run
+_recorder: ContextVar[Optional[SpanRecorder]] = ContextVar("span_recorder", default=None)
+
+# Innermost span() block, for annotate()
+_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current() -> Optional[TraceContext]:
+    return _trace_context.get()
+
+
+def current_traceparent() -> Optional[str]:
+    context = _trace_context.get()
+    return context.traceparent if context is not None else None
+
+
+def annotate(**attributes):
+    """Add attributes to the innermost span, e.g. from code that doesn't open spans itself"""
+    current_span = _span.get()
+    if current_span is not None:
+        current_span.set(**attributes)
+
+
+@contextmanager
+def use(context: Optional[TraceContext]) -> Iterator[Optional[TraceContext]]:
+    """Serve the block as part of a trace"""
+    token = _trace_context.set(context)
+    try:
+        yield context
+    finally:
+        _trace_context.reset(token)
+
+
+@contextmanager
+def recording(recorder: Optional[SpanRecorder]) -> Iterator[Optional[SpanRecorder]]:
+    """Record the spans started in the block (and in tasks it creates) with ``recorder``"""
+    context = _trace_context.get()
+    if recorder is not None and (context is None or context.trace_id != recorder.trace_id):
+        context = TraceContext(recorder.trace_id)
+    token = _recorder.set(recorder)
+    context_token = _trace_context.set(context)
+    try:
+        yield recorder
+    finally:
+        _trace_context.reset(context_token)
+        _recorder.reset(token)
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes) -> Iterator[Span]:
+    """
+    Time the block as a child of the current span. Spans started inside it
+    are its children. Outside a recorded run the span is not stored.
+    """
+    recorder = _recorder.get()
+    context = _trace_context.get()
+    parent_id = context.span_id if context is not None else None
+    if recorder is None:
+        current_span = Span(new_span_id(), parent_id, name, kind, time.perf_counter(), attributes=attributes)
+    else:
+        current_span = recorder.start(name, kind, parent_id, **attributes)
+    token = _trace_context.set(TraceContext(
+        context.trace_id if context is not None else new_trace_id(),
+        current_span.span_id,
+        context.sampled if context is not None else True
+    ))
+    span_token = _span.set(current_span)
+    try:
+        yield current_span
+    except BaseException as e:
+        current_span.set(error=type(e).__name__)
+        raise
+    finally:
+        _span.reset(span_token)
+        _trace_context.reset(token)
+        current_span.finish()
+
+
+# Database flushes and commits. Session events have no block to wrap, so the
+# open spans are kept in session.info; a flush during a commit is its child.
+# Their durations are also observed outside of recorded runs (e.g. the
+# commits /chat makes around a run), as db_operation_duration_seconds.
+
+def _begin_db_span(session: Session, name: str, **attributes):
+    open_spans = session.info.setdefault("trace_spans", {})
+    recorder = _recorder.get()
+    if recorder is None:
+        open_spans[name] = Span("", None, name, "db", time.perf_counter())
+        return
+    commit = open_spans.get("db.commit")
+    context = _trace_context.get()
+    parent_id = commit.span_id if commit is not None else (context.span_id if context is not None else None)
+    open_spans[name] = recorder.start(name, "db", parent_id, **attributes)
+
+
+def _end_db_span(session: Session, name: str, error: Optional[str] = None):
+    current_span = session.info.get("trace_spans", {}).pop(name, None)
+    if current_span is not None:
+        if error:
+            current_span.set(error=error)
+        current_span.finish()
+        prometheus.db_operation_duration_seconds.observe(
+            current_span.end - current_span.start, operation=name.split(".")[1]
+        )
+
+
+@event.listens_for(Session, "before_flush")
+def _before_flush(session, flush_context, instances):
+    _begin_db_span(
+        session, "db.flush",
+        new=len(session.new), dirty=len(session.dirty), deleted=len(session.deleted)
+    )
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _after_flush(session, flush_context):
+    _end_db_span(session, "db.flush")
+
+
+@event.listens_for(Session, "before_commit")
+def _before_commit(session):
+    _begin_db_span(session, "db.commit")
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    _end_db_span(session, "db.commit")
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session):
+    _end_db_span(session, "db.flush", error="rollback")
+    _end_db_span(session, "db.commit", error="rollback")
+
+
+def _merged_ms(intervals: List[Tuple[float, float]]) -> float:
+    """Total length of a set of possibly overlapping intervals"""
+    total, end = 0.0, None
+    for start, stop in sorted(intervals):
+        if end is None or start > end:
+            total += stop - start
+            end = stop
+        elif stop > end:
+            total += stop - end
+            end = stop
+    return total
+
+
+def waterfall(spans: List[Dict]) -> Tuple[List[Dict], Dict[str, float]]:
+    """
+    Order stored spans depth-first (children by start time) with their
+    depth and self time, the time not covered by their children. Also
+    returns the self time summed per kind: where the run's time went.
+    Concurrent children (parallel LLM calls) overlap, so per-kind totals
+    can exceed the run's wall time.
+    """
+    by_id = {row["id"]: row for row in spans}
+    children: Dict[Optional[str], List[Dict]] = {}
+    for row in spans:
+        parent = row.get("parent") if row.get("parent") in by_id else None
+        children.setdefault(parent, []).append(row)
+
+    rows: List[Dict] = []
+    breakdown: Dict[str, float] = {}
+
+    def visit(row: Dict, depth: int):
+        kids = sorted(children.get(row["id"], []), key=lambda r: r["start_ms"])
+        start, stop = row["start_ms"], row["start_ms"] + row["ms"]
+        covered = _merged_ms([
+            (max(kid["start_ms"], start), min(kid["start_ms"] + kid["ms"], stop)) for kid in kids
+            if kid["start_ms"] < stop and kid["start_ms"] + kid["ms"] > start
+        ])
+        self_ms = round(max(row["ms"] - covered, 0.0), 2)
+        breakdown[row["kind"]] = round(breakdown.get(row["kind"], 0.0) + self_ms, 2)
+        rows.append({**row, "depth": depth, "self_ms": self_ms})
+        for kid in kids:
+            visit(kid, depth + 1)
+
+    for root in sorted(children.get(None, []), key=lambda r: r["start_ms"]):
+        visit(root, 0)
+    return rows, breakdown
+
+
+def render_waterfall(rows: List[Dict], width: int = 60) -> str:
+    """Plain-text waterfall of waterfall() rows, one bar per span"""
+    if not rows:
+        return ""
+    total_ms = max(row["start_ms"] + row["ms"] for row in rows) or 1.0
+    label_width = max(len("  " * row["depth"] + row["name"]) for row in rows)
+    lines = []
+    for row in rows:
+        offset = int(row["start_ms"] / total_ms * width)
+        length = max(1, int(round(row["ms"] / total_ms * width)))
+        bar = " " * offset + "█" * min(length, width - offset if offset < width else 1)
+        label = ("  " * row["depth"] + row["name"]).ljust(label_width)
+        lines.append(f"{label}  {bar.ljust(width)}  {row['ms']:9.2f} ms  {row['kind']}")
+    return "\n".join(lines)
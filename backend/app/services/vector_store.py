@@ -1,13 +1,21 @@
 import os
+import hashlib
+import time
 import chromadb
 from chromadb.config import Settings
 from chromadb.api import ClientAPI
+from chromadb.utils import embedding_functions
 from typing import List, Dict, Optional
 
+from app.services import prometheus, tracing
+
 # Initialize ChromaDB client
 CHROMA_DB_PATH = "./chroma_db"
 client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
 
+# Chroma's default model, also used implicitly by the knowledge collections
+embedding_function = embedding_functions.DefaultEmbeddingFunction()
+
 
 def get_or_create_collection(name: str):
     """Get or create a ChromaDB collection"""
@@ -26,11 +34,19 @@ def add_documents(collection_name: str, documents: List[str], metadatas: List[Di
 
 def query_collection(collection_name: str, query_text: str, n_results: int = 3) -> List[Dict]:
     """Query a collection for relevant documents"""
-    collection = get_or_create_collection(collection_name)
-    results = collection.query(
-        query_texts=[query_text],
-        n_results=n_results
-    )
+    start = time.perf_counter()
+    status = "error"
+    try:
+        with tracing.span("vector.query", kind="vector", collection=collection_name, n_results=n_results):
+            collection = get_or_create_collection(collection_name)
+            results = collection.query(
+                query_texts=[query_text],
+                n_results=n_results
+            )
+        status = "ok"
+    finally:
+        prometheus.vector_queries_total.inc(collection=collection_name, status=status)
+        prometheus.vector_query_duration_seconds.observe(time.perf_counter() - start, collection=collection_name)
     
     # Process results into a cleaner format
     formatted_results = []
@@ -50,14 +66,44 @@ def query_collection(collection_name: str, query_text: str, n_results: int = 3)
 
 
 def delete_collection(name: str):
-    """Delete a collection"""
+    """Delete a collection, and the answers cached for it"""
     try:
         client.delete_collection(name=name)
     except ValueError:
         pass  # Collection doesn't exist
+    delete_answer_cache(name)
 
 
 def list_collections() -> List[str]:
     """List all collections"""
     return [c.name for c in client.list_collections()]
 
+
+def embed(texts: List[str]) -> List[List[float]]:
+    """Embed texts with the model the collections use"""
+    return [[float(x) for x in vector] for vector in embedding_function(texts)]
+
+
+def answer_cache_name(collection_name: str) -> str:
+    """Name of the Chroma collection caching answers to questions about a knowledge collection"""
+    name = f"{collection_name}-answer-cache"
+    if len(name) > 63:
+        name = f"answer-cache-{hashlib.sha256(collection_name.encode()).hexdigest()[:32]}"
+    return name
+
+
+def delete_answer_cache(collection_name: str):
+    """Drop all answers cached for a knowledge collection"""
+    try:
+        client.delete_collection(name=answer_cache_name(collection_name))
+    except ValueError:
+        pass  # Nothing cached yet
+
+
+def get_answer_cache(collection_name: str):
+    """The answer cache of a knowledge collection, indexed by cosine similarity of the questions"""
+    return client.get_or_create_collection(
+        name=answer_cache_name(collection_name),
+        embedding_function=embedding_function,
+        metadata={"hnsw:space": "cosine"}
+    )
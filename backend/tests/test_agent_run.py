@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.agents.base import BaseAgent
+from app.core.database import Base
+from app.models import AgentRun
+from app.services import partitions
+
+
+class EchoAgent(BaseAgent):
+    def __init__(self, fail: bool = False):
+        super().__init__("echo", "EchoAgent")
+        self.fail = fail
+
+    def _create_graph(self):
+        return None
+
+    async def _execute(self, input_text, conversation_id, db):
+        self._track_tokens("claude-sonnet", 10, 5)
+        if self.fail:
+            raise ValueError("agent failed")
+        return input_text
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    partitions.token_usage.invalidate()
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    partitions.token_usage.invalidate()
+
+
+def test_run_saves_the_run(db):
+    result = asyncio.run(EchoAgent().run("hello", None, db))
+    assert result["response"] == "hello"
+    assert result["usage"]["total_tokens"] == 15
+    assert [run.status for run in db.query(AgentRun).all()] == ["completed"]
+
+
+def test_failed_run_is_saved_with_its_error(db):
+    with pytest.raises(ValueError, match="agent failed"):
+        asyncio.run(EchoAgent(fail=True).run("hello", None, db))
+    run = db.query(AgentRun).one()
+    assert (run.status, run.error) == ("failed", "agent failed")
+
+
+def test_failed_commit_of_the_completed_run(db, monkeypatch):
+    insert = partitions.token_usage.insert
+    calls = []
+
+    def flaky_insert(conn, rows):
+        calls.append(len(rows))
+        if len(calls) == 1:
+            raise RuntimeError("disk I/O error")
+        insert(conn, rows)
+
+    monkeypatch.setattr(partitions.token_usage, "insert", flaky_insert)
+    # The original error surfaces, not PendingRollbackError, and the failed run is saved
+    with pytest.raises(RuntimeError, match="disk I/O error"):
+        asyncio.run(EchoAgent().run("hello", None, db))
+    run = db.query(AgentRun).one()
+    assert (run.status, run.error) == ("failed", "disk I/O error")
+
+
+def test_failed_save_of_the_failed_run_keeps_the_original_error(db, monkeypatch):
+    def broken_insert(conn, rows):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(partitions.token_usage, "insert", broken_insert)
+    with pytest.raises(ValueError, match="agent failed"):
+        asyncio.run(EchoAgent(fail=True).run("hello", None, db))
+    assert db.query(AgentRun).count() == 0
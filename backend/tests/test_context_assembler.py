@@ -0,0 +1,71 @@
+from app.services.context_assembler import ContextAssembler, SEPARATOR, _overlap, _truncate
+from app.services.llm import estimate_tokens
+
+
+def _chunk(content, source="guide.md", index=0, distance=None):
+    return {"content": content, "source_file": source, "chunk_index": index, "similarity_score": distance}
+
+
+def test_overlap():
+    assert _overlap("alpha beta gamma delta epsilon", "gamma delta epsilon zeta") == len("gamma delta epsilon")
+    assert _overlap("alpha beta", "beta gamma") == 0  # shorter than MIN_OVERLAP_CHARS
+
+
+def test_truncate_at_word_boundary():
+    text = "word " * 100
+    truncated = _truncate(text, 10)
+    assert truncated.endswith(" …")
+    assert len(truncated) <= 10 * 4 + 2
+    assert _truncate("short text", 10) == "short text"
+
+
+def test_merges_overlapping_chunks_of_a_file():
+    shared = "the deploy pipeline runs the migrations first"
+    chunks = [
+        _chunk("Intro to deploys. " + shared, index=0, distance=0.3),
+        _chunk(shared + " and then restarts the pods.", index=1, distance=0.2),
+        _chunk("Unrelated chunk far away in the file.", index=5, distance=0.4),
+    ]
+    result = ContextAssembler(token_budget=1000, duplicate_threshold=0.9).assemble(chunks)
+    assert result.merged == 1
+    assert len(result.blocks) == 2
+    first = result.blocks[0]
+    assert first.text == "Intro to deploys. " + shared + " and then restarts the pods."
+    assert (first.first_index, first.last_index, first.chunks, first.distance) == (0, 1, 2, 0.2)
+    assert result.text.count(shared) == 1
+    assert result.tokens_after < result.tokens_before
+
+
+def test_drops_near_duplicates_across_files():
+    text = "Set DATABASE_URL to the Postgres connection string before starting the backend service."
+    chunks = [_chunk(text, "a.md", distance=0.1), _chunk(text + " Really.", "b.md", distance=0.2)]
+    result = ContextAssembler(token_budget=1000, duplicate_threshold=0.9).assemble(chunks)
+    assert result.duplicates == 1
+    assert [block.source_file for block in result.blocks] == ["a.md"]
+
+
+def test_orders_by_relevance_and_keeps_to_the_budget():
+    chunks = [
+        _chunk("less relevant " + "lorem ipsum " * 20, "a.md", distance=0.5),
+        _chunk("most relevant " + "dolor sit amet " * 20, "b.md", distance=0.1),
+        _chunk("no distance " + "consectetur " * 20, "c.md"),
+    ]
+    first_cost = estimate_tokens(chunks[1]["content"])
+    result = ContextAssembler(token_budget=first_cost + 10, duplicate_threshold=0.9).assemble(chunks)
+    assert [block.source_file for block in result.blocks] == ["b.md"]
+    assert result.dropped == 2
+    assert result.tokens_after <= first_cost + 10
+    assert result.summary()["passages"] == 1
+
+
+def test_truncates_the_most_relevant_passage_if_it_alone_is_over_budget():
+    result = ContextAssembler(token_budget=20, duplicate_threshold=0.9).assemble([_chunk("word " * 200)])
+    assert result.truncated
+    assert len(result.blocks) == 1
+    assert estimate_tokens(result.text) <= 21
+    assert SEPARATOR not in result.text
+
+
+def test_empty():
+    result = ContextAssembler(token_budget=100, duplicate_threshold=0.9).assemble([])
+    assert result.text == "" and result.blocks == [] and result.tokens_saved == 0
@@ -0,0 +1,33 @@
+from app.services.fingerprint import fingerprint, normalize_log
+
+
+def test_normalize_log_placeholders():
+    assert normalize_log(
+        "2024-01-15T10:30:00.123Z ERROR request 3f2a9c1e-5b7d-4e8f-9a0b-1c2d3e4f5a6b "
+        "from 10.0.0.12:5432 took 350ms at 0x7ffd42"
+    ) == "<ts> error request <id> from <ip> took <n>ms at <hex>"
+    assert normalize_log("Jan 15 10:30:00 host sshd[812]: Failed password") == "<ts> host sshd[<n>]: failed password"
+    assert normalize_log("container  deadbeef1234 \n exited") == "container <id> exited"
+
+
+def test_fingerprint_ignores_variable_parts():
+    first = fingerprint("2024-01-15 10:30:00,123 ERROR Connection to 10.0.0.5:5432 refused after 3 retries")
+    second = fingerprint("2024-02-01 08:00:01,999 ERROR Connection to 10.0.0.9:5432 refused after 5 retries")
+    assert first == second
+    assert len(first) == 16
+
+
+def test_fingerprint_keeps_distinct_messages_apart():
+    assert fingerprint("ERROR Connection refused") != fingerprint("ERROR Permission denied")
+    # Words made of hex letters only are not ids
+    assert fingerprint("cache added entry") != fingerprint("cache faced entry")
+
+
+def test_fingerprint_keeps_status_and_error_codes():
+    assert fingerprint("2024-01-15 10:30:00 HTTP 500 on /api/v1/chat") != fingerprint(
+        "2024-01-15 10:30:00 HTTP 401 on /api/v1/chat"
+    )
+    assert fingerprint('10.0.0.1 "GET /health HTTP/1.1" 500 512') != fingerprint('10.0.0.1 "GET /health HTTP/1.1" 401 512')
+    assert fingerprint("upstream returned 502 Bad Gateway") != fingerprint("upstream returned 504 Gateway Timeout")
+    assert fingerprint("worker exited with exit code 137") != fingerprint("worker exited with exit code 1")
+    assert normalize_log("status=401 after 35ms, 3 retries") == "status=401 after <n>ms, <n> retries"
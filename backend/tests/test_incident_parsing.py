@@ -0,0 +1,37 @@
+from app.agents.incident_agent import parse_actions, parse_classification, parse_fused_reply
+
+
+def test_parse_classification():
+    reply = "SEVERITY: High\nCATEGORY: Security\nANALYSIS: Repeated failed logins."
+    assert parse_classification(reply) == {
+        "severity": "high", "category": "security", "analysis": "Repeated failed logins."
+    }
+
+
+def test_parse_actions_strips_numbering_and_bullets():
+    assert parse_actions("1. Restart the pod\n2) Check limits\n- Page on-call\n• Open a ticket") == [
+        "Restart the pod", "Check limits", "Page on-call", "Open a ticket"
+    ]
+    assert parse_actions("Nothing to do") == ["Nothing to do"]
+
+
+def test_parse_fused_reply():
+    reply = (
+        "SEVERITY: critical\nCATEGORY: error\nANALYSIS: The pod was OOM killed.\n"
+        "ACTIONS:\n1. Raise the memory limit\n2. Look for leaks"
+    )
+    classification, actions = parse_fused_reply(reply)
+    assert classification["severity"] == "critical"
+    assert classification["analysis"] == "The pod was OOM killed."
+    assert actions == ["Raise the memory limit", "Look for leaks"]
+
+
+def test_parse_fused_reply_without_actions_section():
+    classification, actions = parse_fused_reply(
+        "SEVERITY: medium\nCATEGORY: performance\nANALYSIS: Slow queries.\n1. Add an index\n2. Check the plan"
+    )
+    assert classification["category"] == "performance"
+    assert actions == ["Add an index", "Check the plan"]
+
+    _, actions = parse_fused_reply("SEVERITY: low\nCATEGORY: info\nANALYSIS: Routine startup message.")
+    assert actions == []
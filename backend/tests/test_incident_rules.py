@@ -0,0 +1,85 @@
+import asyncio
+
+from app.agents.base import RunContext, _run_context
+from app.agents.incident_agent import IncidentAgent
+from app.core.config import settings
+from app.services.incident_rules import DEFAULT_RULES, Rule, RuleClassifier, rule_classifier
+
+
+def test_classify_best_rule():
+    match = rule_classifier.classify("2024-05-01 12:00:01 kernel: api-7 OOMKilled")
+    assert match.rule.name == "out_of_memory"
+    assert match.matched_text == "OOMKilled"
+    assert match.confidence == 0.95
+    assert match.actions[0] == "Identify the process that ran out of memory (OOMKilled) and check its memory limits"
+
+
+def test_classify_no_match():
+    assert rule_classifier.classify("user clicked the checkout button") is None
+
+
+def test_classify_http_auth_statuses():
+    for log in (
+        "GET /admin 403 Forbidden user=guest",
+        '10.0.0.1 - - "POST /login HTTP/1.1" 401 512',
+        "auth proxy returned status=401 for /api/v1/chat",
+    ):
+        match = rule_classifier.classify(log)
+        assert match.rule.name == "auth_failure", log
+        assert match.confidence >= settings.INCIDENT_RULES_MIN_CONFIDENCE
+
+
+def test_classify_ignores_bare_401_and_403():
+    for log in ("processed 401 records in batch 403", "order 403 shipped to user 401"):
+        match = rule_classifier.classify(log)
+        assert match is None or match.rule.name != "auth_failure", log
+
+
+def test_classify_lowers_confidence_when_rules_disagree():
+    classifier = RuleClassifier([
+        Rule("disk", [r"disk full"], "critical", "performance", 0.9),
+        Rule("auth", [r"login failed"], "high", "security", 0.8),
+        Rule("noise", [r"retrying"], "low", "performance", 0.5),
+    ])
+    match = classifier.classify("login failed after disk full, retrying")
+    assert match.rule.name == "disk"
+    assert match.confidence == round(0.9 - RuleClassifier.AMBIGUITY_PENALTY, 3)
+    assert match.matched_rules == ["disk", "auth", "noise"]
+
+    # A close rule of the same category is no ambiguity
+    assert classifier.classify("disk full, retrying").confidence == 0.9
+
+
+def test_default_rules_compile():
+    assert RuleClassifier(DEFAULT_RULES).classify("Segmentation fault (core dumped)").rule.name == "crash"
+
+
+def test_classify_sees_overlapping_rules():
+    # Both rules match at the same position; a single alternation would only report the first
+    classifier = RuleClassifier([
+        Rule("disk", [r"write failed: no space left"], "critical", "performance", 0.9),
+        Rule("auth", [r"write failed"], "high", "security", 0.8),
+    ])
+    match = classifier.classify("write failed: no space left on /var")
+    assert match.rule.name == "disk"
+    assert match.matched_rules == ["disk", "auth"]
+    assert match.confidence == round(0.9 - RuleClassifier.AMBIGUITY_PENALTY, 3)
+
+
+def test_templated_actions_need_the_classification_confidence(monkeypatch):
+    monkeypatch.setattr(settings, "ANTHROPIC_API_KEY", "")
+    monkeypatch.setattr(settings, "INCIDENT_RULES_MIN_CONFIDENCE", 0.85)
+    monkeypatch.setattr(settings, "INCIDENT_RULES_ACTIONS_CONFIDENCE", 0.7)
+    agent = IncidentAgent()
+    token = _run_context.set(RunContext(db=None, conversation_id=None))
+    try:
+        state = {
+            "severity": "high", "category": "error", "log_snippet": "ERROR disk write failed",
+            "rule": "error", "rule_confidence": 0.75, "rule_actions": ["Templated action"],
+        }
+        assert asyncio.run(agent._propose_actions(state))["recommended_actions"] != ["Templated action"]
+
+        state["rule_confidence"] = 0.9
+        assert asyncio.run(agent._propose_actions(state))["recommended_actions"] == ["Templated action"]
+    finally:
+        _run_context.reset(token)
@@ -0,0 +1,51 @@
+import asyncio
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.config import settings
+from app.core.database import Base
+from app.models import AgentJob
+from app.services import jobs
+from app.services.jobs import JobRunner, check_callback_url
+
+
+def test_callbacks_refused_without_allowed_hosts(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_JOB_CALLBACK_HOSTS", "")
+    assert check_callback_url("https://hooks.example.com/done") is not None
+
+
+def test_callback_hosts(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_JOB_CALLBACK_HOSTS", "hooks.example.com, *.internal.example.com")
+    assert check_callback_url("https://hooks.example.com/done") is None
+    assert check_callback_url("http://HOOKS.example.com:8080/done") is None
+    assert check_callback_url("https://ci.internal.example.com/done") is None
+    assert check_callback_url("https://internal.example.com/done") is not None
+    assert check_callback_url("http://169.254.169.254/latest/meta-data") is not None
+    # The host is what follows the userinfo
+    assert check_callback_url("http://hooks.example.com@localhost:8000/") is not None
+
+
+def test_callback_schemes(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_JOB_CALLBACK_HOSTS", "hooks.example.com")
+    for url in ("file:///etc/passwd", "gopher://hooks.example.com/", "hooks.example.com/done", "https:///done"):
+        assert check_callback_url(url) == "callback_url must be an http or https URL", url
+
+
+def test_callback_skipped_without_attempts(monkeypatch):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(jobs, "SessionLocal", sessionmaker(bind=engine))
+    monkeypatch.setattr(settings, "CHAT_JOB_CALLBACK_HOSTS", "hooks.example.com")
+    db = jobs.SessionLocal()
+    job = AgentJob(agent_id="chat", message="hi", status="completed", callback_url="https://hooks.example.com/done")
+    db.add(job)
+    db.commit()
+
+    runner = JobRunner(workers=1, max_attempts=1, callback_timeout=1.0, callback_retries=0)
+    asyncio.run(runner._deliver(job.id, job.callback_url))
+    db.refresh(job)
+    assert job.callback_status == "skipped"
+    assert runner.callbacks_failed == 0
+    db.close()
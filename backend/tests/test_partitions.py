@@ -0,0 +1,95 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, func, inspect, select
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.models import TokenUsage
+from app.services.partitions import PartitionedTable
+
+# A Wednesday
+NOW = datetime(2024, 5, 15, 12, 0)
+
+
+@pytest.fixture
+def conn():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        yield connection
+
+
+def _rows(*timestamps):
+    return [
+        {"model": "claude-sonnet", "input_tokens": 10, "output_tokens": 5, "total_tokens": 15,
+         "cost_usd": 0.001, "timestamp": ts}
+        for ts in timestamps
+    ]
+
+
+def test_period_start():
+    weekly = PartitionedTable(TokenUsage, "week")
+    daily = PartitionedTable(TokenUsage, "day")
+    assert weekly.period_start(NOW) == date(2024, 5, 13)
+    assert weekly.partition_name(weekly.period_start(NOW)) == "token_usage_p20240513"
+    assert daily.period_start(NOW) == date(2024, 5, 15)
+    assert weekly.period_end(date(2024, 5, 13)) == date(2024, 5, 20)
+    with pytest.raises(ValueError):
+        PartitionedTable(TokenUsage, "month")
+
+
+def test_insert_routes_rows_by_week(conn):
+    table = PartitionedTable(TokenUsage, "week")
+    table.insert(conn, _rows(NOW, NOW - timedelta(days=7), NOW - timedelta(days=14), NOW - timedelta(days=15)))
+    assert table.partitions(conn) == [date(2024, 4, 29), date(2024, 5, 6), date(2024, 5, 13)]
+    assert {"token_usage_p20240429", "token_usage_p20240506", "token_usage_p20240513"} <= set(
+        inspect(conn).get_table_names()
+    )
+
+
+def test_select_range_prunes_partitions(conn):
+    table = PartitionedTable(TokenUsage, "week")
+    table.insert(conn, _rows(NOW, NOW - timedelta(days=7), NOW - timedelta(days=14), NOW - timedelta(days=15)))
+
+    def read(start=None, end=None):
+        usage = table.select_range(conn, start, end)
+        sql = str(select(usage).compile())
+        return conn.execute(select(func.count()).select_from(usage)).scalar(), sql
+
+    count, sql = read()
+    assert count == 4
+    assert all(name in sql for name in ("token_usage_p20240429", "token_usage_p20240506", "token_usage_p20240513"))
+
+    # Only the current week's partition (and the base table) is read
+    count, sql = read(NOW - timedelta(days=1))
+    assert count == 1
+    assert "token_usage_p20240513" in sql
+    assert "token_usage_p20240506" not in sql and "token_usage_p20240429" not in sql
+
+    count, sql = read(NOW - timedelta(days=8), NOW - timedelta(days=6))
+    assert count == 1
+    assert "token_usage_p20240506" in sql
+    assert "token_usage_p20240513" not in sql and "token_usage_p20240429" not in sql
+
+
+def test_select_range_accepts_aware_datetimes(conn):
+    table = PartitionedTable(TokenUsage, "week")
+    table.insert(conn, _rows(NOW.replace(tzinfo=timezone.utc)))
+    usage = table.select_range(conn, NOW.replace(tzinfo=timezone.utc) - timedelta(hours=1))
+    assert conn.execute(select(func.count()).select_from(usage)).scalar() == 1
+
+
+def test_select_range_includes_base_table_rows(conn):
+    table = PartitionedTable(TokenUsage, "week")
+    conn.execute(TokenUsage.__table__.insert(), _rows(NOW - timedelta(days=30)))
+    table.insert(conn, _rows(NOW))
+    assert conn.execute(select(func.count()).select_from(table.select_range(conn))).scalar() == 2
+
+
+def test_drop_before(conn):
+    table = PartitionedTable(TokenUsage, "week")
+    table.insert(conn, _rows(NOW, NOW - timedelta(days=7), NOW - timedelta(days=14)))
+    assert table.drop_before(conn, datetime(2024, 5, 13)) == ["token_usage_p20240429", "token_usage_p20240506"]
+    assert table.partitions(conn) == [date(2024, 5, 13)]
+    assert "token_usage_p20240506" not in inspect(conn).get_table_names()
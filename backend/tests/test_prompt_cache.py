@@ -0,0 +1,18 @@
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from app.core.config import settings
+from app.services.llm import with_prompt_cache
+
+
+def test_short_system_prompt_is_not_marked(monkeypatch):
+    monkeypatch.setattr(settings, "PROMPT_CACHE_MIN_TOKENS", 1024)
+    messages = [SystemMessage(content="You are a helpful assistant."), HumanMessage(content="hi")]
+    assert with_prompt_cache(messages) == messages
+
+
+def test_long_system_prompt_is_marked(monkeypatch):
+    monkeypatch.setattr(settings, "PROMPT_CACHE_MIN_TOKENS", 1024)
+    system = "Follow the runbook. " * 300
+    messages = with_prompt_cache([SystemMessage(content=system), HumanMessage(content="hi")])
+    assert messages[0].content == [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]
+    assert messages[1].content == "hi"
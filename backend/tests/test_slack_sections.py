@@ -0,0 +1,49 @@
+from app.agents.slack_agent import parse_sections, split_segments
+
+
+def test_parse_sections():
+    reply = (
+        "SUMMARY: The team reviewed the release.\n"
+        "Action items were assigned to owners.\n\n"
+        "ACTION ITEMS:\n"
+        "- Update the runbook\n"
+        "• Schedule the release\n\n"
+        "KEY DECISIONS:\n"
+        "- Ship on Friday"
+    )
+    assert parse_sections(reply) == {
+        "summary": "The team reviewed the release.\nAction items were assigned to owners.",
+        "action_items": ["Update the runbook", "Schedule the release"],
+        "key_decisions": ["Ship on Friday"],
+    }
+
+
+def test_parse_sections_keeps_summary_sentences_mentioning_headers():
+    reply = (
+        "SUMMARY: The team met on Monday.\n"
+        "Several decisions were made about the rollout.\n"
+        "The key decisions and action items are listed below.\n"
+        "ACTION ITEMS:\n"
+        "- Tag the release"
+    )
+    sections = parse_sections(reply)
+    assert sections["summary"].count("\n") == 2
+    assert sections["action_items"] == ["Tag the release"]
+    assert sections["key_decisions"] == []
+
+
+def test_parse_sections_markdown_headers():
+    reply = "**Summary**: Short sync.\n## Action Items\n- Follow up\nDecisions:\n- Keep the flag off"
+    assert parse_sections(reply) == {
+        "summary": "Short sync.",
+        "action_items": ["Follow up"],
+        "key_decisions": ["Keep the flag off"],
+    }
+
+
+def test_split_segments_keeps_lines_whole():
+    text = "\n".join(f"alice: message number {i}" for i in range(100))
+    segments = split_segments(text, max_tokens=50)
+    assert len(segments) > 1
+    assert "".join(segments) == text
+    assert all(len(segment) <= 50 * 4 for segment in segments)
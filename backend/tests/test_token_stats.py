@@ -0,0 +1,53 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api.v1.metrics import _compute_overview, get_token_stats
+from app.core.database import Base
+from app.services import partitions, timeseries
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    partitions.token_usage.invalidate()
+    session = sessionmaker(bind=engine)()
+    now = datetime.utcnow()
+    rows = [
+        # A call that was sent, and its replay from the response cache
+        {"model": "claude-sonnet", "input_tokens": 100, "output_tokens": 50, "total_tokens": 150,
+         "cost_usd": 0.01, "cached": False, "timestamp": now - timedelta(minutes=2)},
+        {"model": "claude-sonnet", "input_tokens": 100, "output_tokens": 50, "total_tokens": 150,
+         "cost_usd": 0.0, "cached": True, "timestamp": now - timedelta(minutes=1)},
+        # Written before the response cache existed
+        {"model": "claude-haiku", "input_tokens": 20, "output_tokens": 10, "total_tokens": 30,
+         "cost_usd": 0.001, "cached": None, "timestamp": now - timedelta(minutes=1)},
+    ]
+    partitions.token_usage.insert(session.connection(), rows)
+    session.commit()
+    yield session
+    session.close()
+    partitions.token_usage.invalidate()
+
+
+def test_token_stats_exclude_cache_replays(db):
+    stats = asyncio.run(get_token_stats(db))
+    assert stats.total_tokens == 180
+    assert stats.by_model["claude-sonnet"]["tokens"] == 150
+    assert stats.by_model["claude-haiku"]["tokens"] == 30
+    assert stats.cached_calls == 1
+    assert stats.cached_tokens == 150
+
+
+def test_overview_excludes_cache_replays(db):
+    assert _compute_overview(db).tokens_used == 180
+
+
+def test_token_timeseries_excludes_cache_replays(db):
+    series = timeseries.query_timeseries(db, ["tokens"], timedelta(hours=1), timedelta(minutes=5))
+    assert sum(value for _, value in series["tokens"]) == 180
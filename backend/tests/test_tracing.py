@@ -0,0 +1,80 @@
+import asyncio
+
+from app.services import tracing
+
+
+def _span(span_id, parent, name, kind, start_ms, ms):
+    return {"id": span_id, "parent": parent, "name": name, "kind": kind, "start_ms": start_ms, "ms": ms}
+
+
+def test_waterfall_orders_depth_first_with_self_time():
+    spans = [
+        _span("llm2", "node", "llm", "llm", 30.0, 50.0),
+        _span("root", None, "incident", "agent", 0.0, 100.0),
+        _span("node", "root", "classify", "node", 10.0, 80.0),
+        _span("llm1", "node", "llm", "llm", 20.0, 50.0),
+        _span("db", "root", "db.commit", "db", 92.0, 5.0),
+    ]
+    rows, breakdown = tracing.waterfall(spans)
+    assert [(row["id"], row["depth"]) for row in rows] == [
+        ("root", 0), ("node", 1), ("llm1", 2), ("llm2", 2), ("db", 1)
+    ]
+    self_ms = {row["id"]: row["self_ms"] for row in rows}
+    # The parallel LLM calls cover 20-80 ms of classify's 10-90 ms
+    assert self_ms == {"root": 15.0, "node": 20.0, "llm1": 50.0, "llm2": 50.0, "db": 5.0}
+    assert breakdown == {"agent": 15.0, "node": 20.0, "llm": 100.0, "db": 5.0}
+
+
+def test_waterfall_treats_spans_with_unknown_parents_as_roots():
+    rows, _ = tracing.waterfall([_span("b", "gone", "late", "node", 5.0, 1.0), _span("a", None, "run", "agent", 0.0, 2.0)])
+    assert [(row["id"], row["depth"]) for row in rows] == [("a", 0), ("b", 0)]
+
+
+def test_render_waterfall():
+    rows, _ = tracing.waterfall([
+        _span("root", None, "slack", "agent", 0.0, 10.0), _span("x", "root", "map", "node", 5.0, 5.0)
+    ])
+    lines = tracing.render_waterfall(rows, width=10).split("\n")
+    assert lines[0].startswith("slack  ██████████")
+    assert lines[1].startswith("  map       █████")
+    assert tracing.render_waterfall([]) == ""
+
+
+def test_traceparent_parsing():
+    context = tracing.TraceContext.parse("00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01")
+    assert (context.trace_id, context.span_id, context.sampled) == (
+        "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7", True
+    )
+    assert context.traceparent == "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+    assert tracing.TraceContext.parse("00-" + "0" * 32 + "-00f067aa0ba902b7-01") is None
+    assert tracing.TraceContext.parse("garbage") is None
+    assert tracing.TraceContext.parse(None) is None
+
+
+def test_spans_nest_across_tasks():
+    recorder = tracing.SpanRecorder(tracing.new_trace_id(), max_spans=10)
+
+    async def run():
+        async def child(name):
+            with tracing.span(name, kind="llm"):
+                await asyncio.sleep(0)
+
+        with tracing.recording(recorder), tracing.span("agent", kind="agent"):
+            await asyncio.gather(child("a"), child("b"))
+
+    asyncio.run(run())
+    spans = recorder.to_json()
+    root = spans[0]
+    assert root["name"] == "agent" and root["parent"] is None
+    assert {span["name"] for span in spans[1:]} == {"a", "b"}
+    assert all(span["parent"] == root["id"] for span in spans[1:])
+
+
+def test_recorder_keeps_at_most_max_spans():
+    recorder = tracing.SpanRecorder(tracing.new_trace_id(), max_spans=2)
+    with tracing.recording(recorder):
+        for i in range(4):
+            with tracing.span(f"s{i}"):
+                pass
+    assert len(recorder.to_json()) == 2
+    assert recorder.dropped == 2
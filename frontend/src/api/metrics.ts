@@ -35,6 +35,12 @@ export interface TimeseriesResponse {
   data: TimeseriesPoint[];
 }
 
+export interface MultiTimeseriesResponse {
+  period: string;
+  bucket_seconds: number;
+  series: Record<string, TimeseriesPoint[]>;
+}
+
 // Transform snake_case response to camelCase
 const transformMetrics = (data: OverviewMetricsResponse): OverviewMetrics => ({
   totalConversations: data.total_conversations,
@@ -52,6 +58,12 @@ export const metricsApi = {
     .then(res => ({ ...res, data: transformMetrics(res.data) })),
 
   getTimeseries: (metric: string, period: string) =>
-    apiClient.get<TimeseriesResponse>(`/metrics/timeseries?metric=${metric}&period=${period}`)
+    apiClient.get<TimeseriesResponse>(`/metrics/timeseries?metric=${metric}&period=${period}`),
+
+  // Several metrics over the same buckets in a single request
+  getTimeseriesMulti: (metrics: string[], period: string) =>
+    apiClient.get<MultiTimeseriesResponse>(
+      `/metrics/timeseries/multi?${metrics.map(m => `metric=${m}`).join('&')}&period=${period}`
+    )
 };
 
@@ -12,3 +12,8 @@ export const useTimeseries = (metric: string, period: string) => useQuery({
   queryFn: () => metricsApi.getTimeseries(metric, period).then(r => r.data)
 });
 
+
+export const useTimeseriesMulti = (metrics: string[], period: string) => useQuery({
+  queryKey: ['metrics', 'timeseries', 'multi', ...metrics, period],
+  queryFn: () => metricsApi.getTimeseriesMulti(metrics, period).then(r => r.data)
+});
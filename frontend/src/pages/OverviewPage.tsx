@@ -21,24 +21,23 @@ import {
 
 import { KPICard } from '../components/dashboard/KPICard';
 import { MetricsChart } from '../components/dashboard/MetricsChart';
-import { useOverviewMetrics, useTimeseries } from '../hooks/useMetrics';
+import { useOverviewMetrics, useTimeseriesMulti } from '../hooks/useMetrics';
 
 const OverviewPage: React.FC = () => {
   // Real API data
   const { data: metrics, isLoading: metricsLoading, error: metricsError, refetch } = useOverviewMetrics();
-  const { data: requestsTimeseries, isLoading: requestsLoading } = useTimeseries('requests', '24h');
-  const { data: errorsTimeseries, isLoading: errorsLoading } = useTimeseries('errors', '24h');
+  const { data: timeseries, isLoading: timeseriesLoading } = useTimeseriesMulti(['requests', 'errors'], '24h');
 
-  const loading = metricsLoading || requestsLoading || errorsLoading;
+  const loading = metricsLoading || timeseriesLoading;
   const error = metricsError;
 
   // Transform timeseries data for charts
-  const requestsData = requestsTimeseries?.data?.map(p => ({
+  const requestsData = timeseries?.series?.requests?.map(p => ({
     timestamp: new Date(p.timestamp).toLocaleTimeString([], { hour: 'numeric', hour12: true }),
     value: p.value
   })) || [];
 
-  const errorsData = errorsTimeseries?.data?.map(p => ({
+  const errorsData = timeseries?.series?.errors?.map(p => ({
     timestamp: new Date(p.timestamp).toLocaleTimeString([], { hour: 'numeric', hour12: true }),
     value: p.value
   })) || [];